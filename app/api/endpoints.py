@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.services import (
     get_licenses_by_diagnostico,
     get_licenses_by_folio,
@@ -10,7 +11,11 @@ from app.core.services import (
     get_licenses_without_fundamento, 
     get_fundamento_indicator, 
     get_licenses_by_diagnosis, 
-    get_licenses_by_region
+    get_licenses_by_region,
+    stream_licenses_by_diagnostico,
+    stream_licenses_by_doctor,
+    stream_licenses_by_trabajador,
+    stream_licenses_without_fundamento,
 )
 from app.models.request_models import DiagnosticoLicenseByRangeDateRequest, DoctorLicenseByRangeDateRequest, LicenseByRangeDateRequest, LicenseRequest, DoctorLicenseRequest, NoFundamentoRequest, FundamentoIndicatorRequest, DiagnosisRequest, RegionRequest, TrabajadorLicenseByRangeDateRequest
 from fastapi import APIRouter, HTTPException
@@ -19,10 +24,14 @@ from app.models.response_models import LicenseDetail, LicenseListResponse
 from fastapi import APIRouter, HTTPException
 from app.models.request_models import ETLRequest
 from app.core.etl_services import ETLService
-from app.core.ports.adapters import InMemoryTaskRepository
+from app.core.ports.adapters import build_task_repository
+from app.core.db_executor import iterate_in_db, run_in_db
+from app.core.license_export import encode_licenses, stream_media_type
+from app.core.query_catalog import catalog
+from app.core.result_cache import result_cache
 
 # Instanciar el repositorio y el servicio
-task_repository = InMemoryTaskRepository("etl_api.log")
+task_repository = build_task_repository("etl_api.log")
 etl_service = ETLService(task_repository)
 
 
@@ -41,42 +50,87 @@ def set_default_dates(fecha_inicio: Optional[str], fecha_fin: Optional[str]) ->
     return fecha_inicio, fecha_fin
 
 
+async def license_stream_response(media_type: str, stream, *args) -> StreamingResponse:
+    """Respuesta NDJSON o CSV de un listado, leida por bloques desde un cursor de servidor.
+
+    El primer bloque se lee antes de responder, asi un error de la consulta o de los parametros
+    todavia se informa con su codigo HTTP y no como un stream cortado.
+    """
+    body = iterate_in_db(encode_licenses(media_type, stream(*args)))
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def chunks():
+        yield first
+        async for chunk in body:
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type=media_type)
+
+
 router = APIRouter()
 
 @router.post("/lm/doctor/licenses", response_model=LicenseListResponse)
-async def licenses_by_doctor(data: DoctorLicenseByRangeDateRequest):
+async def licenses_by_doctor(data: DoctorLicenseByRangeDateRequest, accept: Optional[str] = Header(None)):
     try:
         fecha_inicio, fecha_fin = set_default_dates(data.fecha_inicio, data.fecha_fin)
-        
-        result = get_licenses_by_doctor(data.rut_medico, fecha_inicio, fecha_fin)
+        media_type = stream_media_type(accept)
+        if media_type:
+            return await license_stream_response(
+                media_type, stream_licenses_by_doctor, data.rut_medico, fecha_inicio, fecha_fin, data.cursor, data.limit
+            )
+
+        result = await run_in_db(get_licenses_by_doctor, data.rut_medico, fecha_inicio, fecha_fin, data.cursor, data.limit)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     
 @router.post("/lm/trabajador/licenses", response_model=LicenseListResponse)
-async def licenses_by_trabajador(data: TrabajadorLicenseByRangeDateRequest):
+async def licenses_by_trabajador(data: TrabajadorLicenseByRangeDateRequest, accept: Optional[str] = Header(None)):
     try:
         fecha_inicio, fecha_fin = set_default_dates(data.fecha_inicio, data.fecha_fin)
-        
-        result = get_licenses_by_trabajador(data.rut_trabajador, fecha_inicio, fecha_fin)
+        media_type = stream_media_type(accept)
+        if media_type:
+            return await license_stream_response(
+                media_type, stream_licenses_by_trabajador, data.rut_trabajador, fecha_inicio, fecha_fin,
+                data.cursor, data.limit,
+            )
+
+        result = await run_in_db(get_licenses_by_trabajador, data.rut_trabajador, fecha_inicio, fecha_fin, data.cursor, data.limit)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
     
 @router.post("/lm/diagnostico/licenses", response_model=LicenseListResponse)
-async def licenses_by_diagnostico(data: DiagnosticoLicenseByRangeDateRequest):
+async def licenses_by_diagnostico(data: DiagnosticoLicenseByRangeDateRequest, accept: Optional[str] = Header(None)):
     try:
         fecha_inicio, fecha_fin = set_default_dates(data.fecha_inicio, data.fecha_fin)
-        
-        result = get_licenses_by_diagnostico(data.codigo_diagnostico_pronunciamiento, fecha_inicio, fecha_fin)
+        media_type = stream_media_type(accept)
+        if media_type:
+            return await license_stream_response(
+                media_type, stream_licenses_by_diagnostico, data.codigo_diagnostico_pronunciamiento,
+                fecha_inicio, fecha_fin, data.cursor, data.limit,
+            )
+
+        result = await run_in_db(
+            get_licenses_by_diagnostico, data.codigo_diagnostico_pronunciamiento, fecha_inicio, fecha_fin, data.cursor, data.limit
+        )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")    
 
 @router.post("/lm/dto/total")
 async def total_licenses(data: LicenseRequest):
     try:
-        result = get_total_licenses(data)
+        result = await run_in_db(get_total_licenses, data)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -84,10 +138,15 @@ async def total_licenses(data: LicenseRequest):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
-@router.post("/lm/no-fundamento")
-async def licenses_without_fundamento(data: NoFundamentoRequest):
+@router.post("/lm/no-fundamento", response_model=LicenseListResponse)
+async def licenses_without_fundamento(data: NoFundamentoRequest, accept: Optional[str] = Header(None)):
     try:
-        result = get_licenses_without_fundamento(data.fecha_inicio, data.fecha_fin)
+        media_type = stream_media_type(accept)
+        if media_type:
+            return await license_stream_response(
+                media_type, stream_licenses_without_fundamento, data.fecha_inicio, data.fecha_fin, data.cursor, data.limit
+            )
+        result = await run_in_db(get_licenses_without_fundamento, data.fecha_inicio, data.fecha_fin, data.cursor, data.limit)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -97,7 +156,7 @@ async def licenses_without_fundamento(data: NoFundamentoRequest):
 @router.get("/lm/folio/licenses/{folio}", response_model=LicenseDetail)
 async def licenses_by_folio(folio: str):
     try:
-        result = get_licenses_by_folio(folio)
+        result = await run_in_db(get_licenses_by_folio, folio)
         if result is None:
             raise HTTPException(status_code=404, detail=f"Lincencia no encontrada: {str(folio)}")    
         return result
@@ -110,7 +169,7 @@ async def licenses_by_folio(folio: str):
 @router.post("/lm/fundamento-indicator")
 async def fundamento_indicator(data: FundamentoIndicatorRequest):
     try:
-        result = get_fundamento_indicator(data.folio)
+        result = await run_in_db(get_fundamento_indicator, data.folio)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
@@ -118,7 +177,7 @@ async def fundamento_indicator(data: FundamentoIndicatorRequest):
 @router.post("/lm/diagnosis")
 async def licenses_by_diagnosis(data: DiagnosisRequest):
     try:
-        result = get_licenses_by_diagnosis(data.cod_diagnostico, data.fecha_inicio, data.fecha_fin)
+        result = await run_in_db(get_licenses_by_diagnosis, data.cod_diagnostico, data.fecha_inicio, data.fecha_fin)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -128,7 +187,7 @@ async def licenses_by_diagnosis(data: DiagnosisRequest):
 @router.post("/lm/region")
 async def licenses_by_region(data: RegionRequest):
     try:
-        result = get_licenses_by_region(data.comuna_reposo, data.fecha_inicio, data.fecha_fin)
+        result = await run_in_db(get_licenses_by_region, data.comuna_reposo, data.fecha_inicio, data.fecha_fin)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -136,11 +195,59 @@ async def licenses_by_region(data: RegionRequest):
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
+@router.get("/lm/queries/stats")
+async def query_stats():
+    """Llamadas, errores, filas y percentiles de latencia de cada consulta del catalogo."""
+    return catalog.stats()
+
+
+@router.get("/lm/cache/stats")
+async def cache_stats():
+    """Aciertos y fallos de la cache de resultados, en total y por consulta."""
+    return await run_in_db(result_cache.stats)
+
+
 @router.post("/lm/etl")
 async def upload_etl(data: ETLRequest):
     try:
-        return etl_service.start_etl_task(data)
+        return await run_in_db(etl_service.start_etl_task, data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@router.post("/lm/etl/{task_id}/resume")
+async def resume_etl(task_id: str):
+    try:
+        result = await run_in_db(etl_service.resume_etl_task, task_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Tarea sin checkpoints: {str(task_id)}")
+    return result
+
+
+@router.post("/lm/etl/{task_id}/cancel")
+async def cancel_etl(task_id: str):
+    try:
+        result = await run_in_db(etl_service.cancel_etl_task, task_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Tarea no esta en cola ni en ejecucion: {str(task_id)}")
+    return result
+
+
+@router.post("/lm/etl/{task_id}/replay")
+async def replay_etl(task_id: str):
+    try:
+        result = await run_in_db(etl_service.replay_dead_letters, task_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Tarea sin filas rechazadas: {str(task_id)}")
+    return result
@@ -17,8 +17,12 @@ DB_PASS = os.getenv("DB_ML_PASS")
 # Crear URL de conexión a la base de datos
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Conexiones del pool: pool_size permanentes y hasta max_overflow adicionales bajo carga
+DB_POOL_SIZE = int(os.getenv("DB_ML_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_ML_MAX_OVERFLOW", "20"))
+
 # Crear el motor de la base de datos
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=10, max_overflow=20, pool_timeout=30)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=30)
 
 # Crear una sesión para interactuar con la base de datos
 SessionML = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+### Acceso a la base de datos desde los endpoints async sin bloquear el event loop. ###
+
+# Hilos para las consultas de los endpoints; por defecto uno por conexion del pool, asi ningun hilo
+# espera una conexion libre (pool_timeout) y las consultas concurrentes escalan con el pool
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+_executor = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Executor acotado de las consultas de los endpoints, creado con la primera consulta."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _executor
+
+
+async def run_in_db(func, *args, **kwargs):
+    """Ejecuta func (sincrona, con SQLAlchemy) en el executor de base de datos y espera su resultado.
+
+    Mientras la consulta corre el event loop sigue atendiendo otras solicitudes; si todos los hilos
+    estan ocupados la llamada espera su turno en la cola del executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+_END = object()
+
+
+async def iterate_in_db(iterator):
+    """Recorre un iterador sincrono (p. ej. filas de un cursor de servidor) avanzandolo en el executor.
+
+    Cada elemento se pide en un hilo del executor y el event loop queda libre mientras tanto. Si
+    quien consume deja de iterar (p. ej. el cliente corta la respuesta) el iterador se cierra en el
+    executor, despues del elemento que este leyendo, para liberar la conexion.
+    """
+    executor = get_db_executor()
+    pending = None
+    try:
+        while True:
+            pending = executor.submit(next, iterator, _END)
+            item = await asyncio.wrap_future(pending)
+            pending = None
+            if item is _END:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            if pending is None:
+                executor.submit(close)
+            else:
+                pending.add_done_callback(lambda _: executor.submit(close))
+
+
+def shutdown_db_executor() -> None:
+    """Espera las consultas en curso y libera los hilos (al detener la aplicacion)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
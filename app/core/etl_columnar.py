@@ -0,0 +1,128 @@
+import io
+
+import psycopg2.extensions
+
+from app.core.etl_loader import STAGING_COLUMNS
+
+### Representacion columnar (Apache Arrow) de los bloques del ETL, sin un dict por fila. ###
+
+
+def require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("La carga columnar (ETL_COLUMNAR) requiere el paquete pyarrow")
+
+
+NUMERIC_OID = 1700
+# numeric como texto exacto: crear un Decimal por valor y luego inferir su tipo en Arrow cuesta mas que
+# el dict por fila que se quiere evitar. COPY lo vuelve a leer como numeric sin cambiar la escala
+NUMERIC_AS_TEXT = psycopg2.extensions.new_type((NUMERIC_OID,), "ETL_NUMERIC_AS_TEXT", lambda value, cursor: value)
+# Marca en el schema de las columnas numeric que viajan como texto
+NUMERIC_METADATA = {b"pg_type": b"numeric"}
+
+
+def register_numeric_as_text(cursor) -> None:
+    psycopg2.extensions.register_type(NUMERIC_AS_TEXT, cursor)
+
+
+def numeric_columns(description) -> tuple:
+    return tuple(column.name for column in description if column.type_code == NUMERIC_OID)
+
+
+def record_batch_from_rows(rows: list, columns: list, numeric_columns: tuple = ()):
+    """Convierte las tuplas del cursor en un RecordBatch, transponiendo por columna.
+
+    Las columnas de numeric_columns (texto, ver NUMERIC_AS_TEXT) quedan como string con NUMERIC_METADATA.
+    """
+    import pyarrow as pa
+
+    fields = [
+        pa.field(name, pa.string(), metadata=NUMERIC_METADATA) if name in numeric_columns else None
+        for name in columns
+    ]
+    arrays = [
+        pa.array(values, type=field.type if field is not None else None)
+        for field, values in zip(fields, zip(*rows) if rows else [[] for _ in columns])
+    ]
+    schema = pa.schema([field or pa.field(name, array.type) for name, field, array in zip(columns, fields, arrays)])
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def transform_record_batch(batch):
+    """Mismas transformaciones que ETLService.transform_batch, como operaciones sobre columnas."""
+    import pyarrow.compute as pc
+
+    empleador = batch.column(batch.schema.get_field_index("empleador_adscrito"))
+    # 0 solo para "No"; NULL y cualquier otro valor quedan en 1, igual que la version por fila
+    adscrito = pc.if_else(pc.fill_null(pc.equal(empleador, "No"), False), 0, 1)
+    return batch.set_column(batch.schema.get_field_index("empleador_adscrito"), "empleador_adscrito", adscrito)
+
+
+def concat_batches(batches: list):
+    """Une los bloques pendientes en una tabla; los tipos inferidos por bloque se unifican."""
+    import pyarrow as pa
+
+    return pa.concat_tables([pa.Table.from_batches([batch]) for batch in batches], promote_options="permissive")
+
+
+def distinct_descriptions(column, normalizar) -> dict:
+    """Valores distintos de la columna -> descripcion normalizada; se normaliza una vez por valor."""
+    encoded = column.combine_chunks().dictionary_encode(null_encoding="encode")
+    return {value: normalizar(value) for value in encoded.dictionary.to_pylist()}
+
+
+def map_column(column, mapping: dict, value_type):
+    """Reemplaza cada valor de la columna por mapping[valor] sin recorrer las filas en Python.
+
+    Se codifica como diccionario (pocos cientos de valores distintos) y se toma el valor mapeado de
+    cada entrada por su indice.
+    """
+    import pyarrow as pa
+
+    encoded = column.combine_chunks().dictionary_encode(null_encoding="encode")
+    mapped = pa.array([mapping.get(value) for value in encoded.dictionary.to_pylist()], type=value_type)
+    return mapped.take(encoded.indices)
+
+
+def first_claimed_mask(ids, reclamadas: set):
+    """True en la primera fila de cada id_lic reclamado, como la marca reclamada del modo staging."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not reclamadas:
+        return pa.repeat(pa.scalar(False), len(ids))
+    # Numero de fila 0..n-1 sin crear enteros de Python
+    filas = pc.subtract(pc.cumulative_sum(pa.repeat(pa.scalar(1, pa.int64()), len(ids))), 1)
+    indexed = pa.table({"id_lic": ids, "fila": filas})
+    first_rows = indexed.group_by("id_lic", use_threads=False).aggregate([("fila", "min")]).column("fila_min")
+    is_first = pc.is_in(indexed.column("fila"), value_set=first_rows.combine_chunks())
+    is_claimed = pc.is_in(ids, value_set=pa.array(list(reclamadas), type=ids.type))
+    return pc.and_(is_first, is_claimed)
+
+
+def staging_table(table, id_especialidad, id_profesionalidad, reclamada, lote: str):
+    """Tabla con las columnas de STAGING_COLUMNS en orden, lista para copiar a staging."""
+    import pyarrow as pa
+
+    extra = {
+        "id_especialidad_profesional": id_especialidad,
+        "id_profesionalidad": id_profesionalidad,
+        "reclamada": reclamada,
+        "lote": pa.repeat(pa.scalar(lote), table.num_rows),
+    }
+    return pa.table({name: extra[name] if name in extra else table.column(name) for name in STAGING_COLUMNS})
+
+
+def copy_csv_buffer(table) -> io.BytesIO:
+    """Serializa la tabla en CSV sin encabezado para COPY ... WITH (FORMAT csv).
+
+    NULL queda como campo vacio sin comillas y el texto siempre entre comillas, de modo que un
+    string vacio no se confunde con NULL.
+    """
+    import pyarrow.csv as pacsv
+
+    buffer = io.BytesIO()
+    pacsv.write_csv(table, buffer, pacsv.WriteOptions(include_header=False))
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,154 @@
+import os
+from dataclasses import dataclass, field
+
+from app.core.etl_dedup import DEDUP_BLOOM, DEDUP_KINDS
+from app.core.etl_rules import RULES_MODES
+from app.core.etl_snapshot import SNAPSHOT_PARQUET
+
+### Configuracion del ETL: se lee una vez de las variables ETL_* y se pasa a ETLService. ###
+
+# Modo de carga: "row" (una transaccion por licencia), "batch" (carga masiva por lotes) o
+# "staging" (lotes por COPY a una tabla UNLOGGED y merge set-based a las tablas ml.*)
+LOAD_MODE_ROW = "row"
+LOAD_MODE_BATCH = "batch"
+LOAD_MODE_STAGING = "staging"
+LOAD_MODES = (LOAD_MODE_ROW, LOAD_MODE_BATCH, LOAD_MODE_STAGING)
+
+
+def _env_bool(environ, name: str, default: str = "false") -> bool:
+    return environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class EtlConfig:
+    """Modos y limites de una instancia de ETLService.
+
+    Los valores por defecto son los de las variables de entorno sin definir; en pruebas se construye
+    directamente (EtlConfig(load_mode="batch")) sin tocar el entorno. Las combinaciones que no se
+    admiten se rechazan al construirla con ValueError.
+    """
+
+    load_mode: str = LOAD_MODE_ROW
+    batch_size: int = 1000
+    # Metodo de carga masiva de ml.licencias: "copy" (COPY FROM STDIN) o "values" (execute_values)
+    load_method: str = "copy"
+    # Filas por viaje al cursor de servidor de la extraccion (itersize / fetchmany)
+    fetch_size: int = 5000
+    # Extraccion con sentencia preparada (planificada una vez por conexion) en vez de un cursor de servidor
+    # por ventana; cada ventana llega completa al cliente, conviene junto a window_target_rows
+    extract_prepared: bool = False
+    # Carga columnar: bloques como RecordBatch de pyarrow, transformaciones por columna y COPY en CSV a
+    # staging, sin un dict por fila (requiere pyarrow y load_mode staging)
+    columnar: bool = False
+    # Carga delta: las licencias ya cargadas se comparan por hash de contenido (ml.licencias_hash) y se
+    # actualizan solo las que cambiaron, en vez de ON CONFLICT DO NOTHING (requiere load_mode staging)
+    delta: bool = False
+    # Extraccion directa: cada ventana pasa del origen a la base ML con COPY TO STDOUT -> COPY FROM STDIN y el
+    # mapeo en el SELECT; a Python solo llegan bloques de bytes y los id_lic (requiere load_mode staging)
+    passthrough: bool = False
+    # Bytes del CSV de una ventana que se guardan en memoria antes de pasar a un archivo temporal; la
+    # ventana se agrega al snapshot solo despues de confirmarla
+    passthrough_spool_bytes: int = 16 * 1024 * 1024
+
+    # Ejecucion paralela: cantidad de workers y tamaño (en horas) de cada particion del rango
+    workers: int = 1
+    partition_hours: int = 24
+    # Filas objetivo por ventana de extraccion: con un COUNT por hora se unen las horas tranquilas y se
+    # dividen las muy cargadas (0 = ventanas fijas de una hora)
+    window_target_rows: int = 0
+
+    # Snapshot de las filas extraidas: csv, csv.gz, csv.zst o parquet (row group en filas)
+    snapshot_format: str = "csv"
+    snapshot_row_group_size: int = 100000
+
+    # Directorio de checkpoints por ventana, usados para reanudar tareas con error
+    checkpoint_dir: str = field(default_factory=lambda: os.path.join(os.getcwd(), "etl", "checkpoints"))
+
+    # Filas que fallan al cargar: el lote se divide hasta aislarlas y quedan en dead_letter_dir para
+    # reprocesarlas; pasado max_rejected_rows filas por tarea la tarea termina en error (0 = sin aislar)
+    dead_letter_dir: str = field(default_factory=lambda: os.path.join(os.getcwd(), "etl", "dead_letter"))
+    max_rejected_rows: int = 1000
+
+    # Deduplicacion por tarea: exact (set), lru (ultimas dedup_lru_size claves) o bloom (filtro de Bloom
+    # para id_lic con confirmacion en ml.licencias ante un positivo)
+    dedup_kind: str = "exact"
+    dedup_lru_size: int = 1000000
+    dedup_bloom_capacity: int = 10000000
+    dedup_bloom_error_rate: float = 0.001
+
+    # Segundos entre cada registro de metricas de una tarea en el log (0 = solo al terminar)
+    metrics_log_interval: float = 30
+
+    # Pipeline: extraccion, transformacion y carga en hilos distintos, con colas de pipeline_queue_size bloques
+    pipeline: bool = False
+    pipeline_queue_size: int = 4
+
+    # Reglas de negocio: "final" (una llamada con todo el rango al terminar) o "windows" (una llamada cada
+    # rules_windows ventanas confirmadas, en paralelo con la carga). Reintentos con backoff exponencial
+    rules_mode: str = "final"
+    rules_windows: int = 24
+    rules_concurrency: int = 2
+    rules_max_retries: int = 3
+    rules_backoff_seconds: float = 1
+    rules_timeout_seconds: float = 300
+
+    # Tareas ETL simultaneas por proceso; el resto queda en estado "queued" hasta que se libere un cupo
+    max_concurrent_tasks: int = 2
+
+    def __post_init__(self):
+        if self.load_mode not in LOAD_MODES:
+            raise ValueError(f"Modo de carga no soportado: {self.load_mode}")
+        if self.columnar and self.load_mode != LOAD_MODE_STAGING:
+            raise ValueError(f"La carga columnar requiere el modo de carga {LOAD_MODE_STAGING}")
+        if (self.delta or self.passthrough) and self.load_mode != LOAD_MODE_STAGING:
+            raise ValueError(f"La carga {'delta' if self.delta else 'directa'} requiere el modo de carga {LOAD_MODE_STAGING}")
+        if self.passthrough and (self.columnar or self.pipeline or self.extract_prepared):
+            raise ValueError("La extraccion directa no se combina con la carga columnar, el pipeline ni la sentencia preparada")
+        if self.passthrough and self.snapshot_format == SNAPSHOT_PARQUET:
+            raise ValueError("La extraccion directa requiere un snapshot csv, csv.gz o csv.zst")
+        if self.dedup_kind not in DEDUP_KINDS:
+            raise ValueError(f"Deduplicacion no soportada: {self.dedup_kind}")
+        if self.delta and self.dedup_kind == DEDUP_BLOOM:
+            # bloom descarta los id_lic que ya estan en ml.licencias, justo los que delta debe comparar
+            raise ValueError("La carga delta no admite la deduplicacion bloom, use exact o lru")
+        if self.rules_mode not in RULES_MODES:
+            raise ValueError(f"Modo de reglas no soportado: {self.rules_mode}")
+
+    @classmethod
+    def from_env(cls, environ=None) -> "EtlConfig":
+        """Lee las variables ETL_* de environ (por defecto os.environ); las que faltan toman el valor por defecto."""
+        environ = os.environ if environ is None else environ
+        defaults = cls()
+        return cls(
+            load_mode=environ.get("ETL_LOAD_MODE", defaults.load_mode),
+            batch_size=int(environ.get("ETL_BATCH_SIZE", defaults.batch_size)),
+            load_method=environ.get("ETL_LOAD_METHOD", defaults.load_method),
+            fetch_size=int(environ.get("ETL_FETCH_SIZE", defaults.fetch_size)),
+            extract_prepared=_env_bool(environ, "ETL_EXTRACT_PREPARED"),
+            columnar=_env_bool(environ, "ETL_COLUMNAR"),
+            delta=_env_bool(environ, "ETL_DELTA"),
+            passthrough=_env_bool(environ, "ETL_PASSTHROUGH"),
+            passthrough_spool_bytes=int(environ.get("ETL_PASSTHROUGH_SPOOL_BYTES", defaults.passthrough_spool_bytes)),
+            workers=int(environ.get("ETL_WORKERS", defaults.workers)),
+            partition_hours=int(environ.get("ETL_PARTITION_HOURS", defaults.partition_hours)),
+            window_target_rows=int(environ.get("ETL_WINDOW_TARGET_ROWS", defaults.window_target_rows)),
+            snapshot_format=environ.get("ETL_SNAPSHOT_FORMAT", defaults.snapshot_format),
+            snapshot_row_group_size=int(environ.get("ETL_SNAPSHOT_ROW_GROUP_SIZE", defaults.snapshot_row_group_size)),
+            checkpoint_dir=environ.get("ETL_CHECKPOINT_DIR", defaults.checkpoint_dir),
+            dead_letter_dir=environ.get("ETL_DEAD_LETTER_DIR", defaults.dead_letter_dir),
+            max_rejected_rows=int(environ.get("ETL_MAX_REJECTED_ROWS", defaults.max_rejected_rows)),
+            dedup_kind=environ.get("ETL_DEDUP", defaults.dedup_kind),
+            dedup_lru_size=int(environ.get("ETL_DEDUP_LRU_SIZE", defaults.dedup_lru_size)),
+            dedup_bloom_capacity=int(environ.get("ETL_DEDUP_BLOOM_CAPACITY", defaults.dedup_bloom_capacity)),
+            dedup_bloom_error_rate=float(environ.get("ETL_DEDUP_BLOOM_ERROR_RATE", defaults.dedup_bloom_error_rate)),
+            metrics_log_interval=float(environ.get("ETL_METRICS_LOG_INTERVAL", defaults.metrics_log_interval)),
+            pipeline=_env_bool(environ, "ETL_PIPELINE"),
+            pipeline_queue_size=int(environ.get("ETL_PIPELINE_QUEUE_SIZE", defaults.pipeline_queue_size)),
+            rules_mode=environ.get("ETL_RULES_MODE", defaults.rules_mode),
+            rules_windows=int(environ.get("ETL_RULES_WINDOWS", defaults.rules_windows)),
+            rules_concurrency=int(environ.get("ETL_RULES_CONCURRENCY", defaults.rules_concurrency)),
+            rules_max_retries=int(environ.get("ETL_RULES_MAX_RETRIES", defaults.rules_max_retries)),
+            rules_backoff_seconds=float(environ.get("ETL_RULES_BACKOFF_SECONDS", defaults.rules_backoff_seconds)),
+            rules_timeout_seconds=float(environ.get("ETL_RULES_TIMEOUT_SECONDS", defaults.rules_timeout_seconds)),
+            max_concurrent_tasks=int(environ.get("ETL_MAX_CONCURRENT_TASKS", defaults.max_concurrent_tasks)),
+        )
@@ -0,0 +1,42 @@
+import psycopg2
+from sqlalchemy import exc as sa_exc
+
+### Aislamiento de filas con error en la carga: biseccion del lote y envio a dead letter. ###
+
+# Errores de la conexion o del servidor, no de los datos: dividir el lote no los evita y enviaria
+# filas validas a dead letter, la tarea se detiene como antes
+FATAL_ERRORS = (
+    psycopg2.OperationalError, psycopg2.InterfaceError,
+    sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError,
+    MemoryError,
+)
+
+
+def is_row_error(error: Exception) -> bool:
+    """Indica si el error puede deberse a las filas cargadas (y no a la conexion)."""
+    return not isinstance(error, FATAL_ERRORS)
+
+
+def load_isolating(rows, load, reject, records=list) -> int:
+    """Carga rows con load; si falla por un error de datos divide el bloque en mitades y reintenta.
+
+    Cada carga parcial es una transaccion propia, de modo que las mitades sin error quedan
+    confirmadas y solo las filas que fallan solas llegan a reject(row, error). rows es cualquier
+    secuencia con len y cortes (lista de dicts o tabla de pyarrow); records la convierte en la lista
+    de filas que se registran. Retorna la cantidad de filas rechazadas.
+    """
+    if len(rows) == 0:
+        return 0
+    try:
+        load(rows)
+        return 0
+    except Exception as e:
+        if not is_row_error(e):
+            raise
+        if len(rows) == 1:
+            reject(records(rows)[0], e)
+            return 1
+    # Fuera del except, para no encadenar el error en las cargas de cada mitad
+    middle = len(rows) // 2
+    return (load_isolating(rows[:middle], load, reject, records)
+            + load_isolating(rows[middle:], load, reject, records))
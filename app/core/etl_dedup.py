@@ -0,0 +1,269 @@
+import hashlib
+import math
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+### Deduplicacion en memoria acotada de las claves procesadas por una tarea ETL. ###
+
+DEDUP_EXACT = "exact"
+DEDUP_LRU = "lru"
+DEDUP_BLOOM = "bloom"
+DEDUP_KINDS = (DEDUP_EXACT, DEDUP_LRU, DEDUP_BLOOM)
+
+
+def _key_size(key) -> int:
+    """Bytes aproximados que ocupa una clave (str o tupla de str/int) en memoria."""
+    if isinstance(key, tuple):
+        return sys.getsizeof(key) + sum(sys.getsizeof(item) for item in key)
+    return sys.getsizeof(key)
+
+
+class DedupFilter(ABC):
+    """Reclama claves la primera vez que se ven en la tarea.
+
+    Flujo: claim() antes de cargar, confirm() tras el commit y release() si la carga falla, para
+    que las claves puedan reintentarse. Todas las implementaciones son seguras entre workers.
+    """
+
+    kind = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def claim(self, keys) -> list:
+        """Retorna, en el orden recibido y sin repetir, las claves que no se habian reclamado."""
+        with self._lock:
+            return self._claim(list(dict.fromkeys(keys)))
+
+    def confirm(self, keys) -> None:
+        pass
+
+    def release(self, keys) -> None:
+        with self._lock:
+            self._release(keys)
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def memory_bytes(self) -> int:
+        pass
+
+    def detail(self) -> dict:
+        with self._lock:
+            return {"kind": self.kind, "entries": len(self), "memory_bytes": self.memory_bytes()}
+
+    @abstractmethod
+    def _claim(self, keys: list) -> list:
+        """Reclama keys (sin repetidas) con el lock tomado."""
+        pass
+
+    @abstractmethod
+    def _release(self, keys) -> None:
+        """Libera keys con el lock tomado."""
+        pass
+
+
+class ExactDedup(DedupFilter):
+    """Set exacto, vive solo mientras dura la tarea: la memoria crece con las claves distintas del rango."""
+
+    kind = DEDUP_EXACT
+
+    def __init__(self):
+        super().__init__()
+        self._keys = set()
+        self._keys_bytes = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._keys) + self._keys_bytes
+
+    def _claim(self, keys: list) -> list:
+        nuevas = [key for key in keys if key not in self._keys]
+        self._keys.update(nuevas)
+        self._keys_bytes += sum(_key_size(key) for key in nuevas)
+        return nuevas
+
+    def _release(self, keys) -> None:
+        for key in keys:
+            if key in self._keys:
+                self._keys.discard(key)
+                self._keys_bytes -= _key_size(key)
+
+
+class LruDedup(DedupFilter):
+    """Recuerda solo las max_entries claves mas recientes.
+
+    Una clave expulsada que vuelve a aparecer se reclama de nuevo; las cargas siguen siendo
+    idempotentes por ON CONFLICT / NOT EXISTS en ml.*, solo se repite el trabajo.
+    """
+
+    kind = DEDUP_LRU
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        self._keys_bytes = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._keys) + self._keys_bytes
+
+    def _claim(self, keys: list) -> list:
+        nuevas = []
+        for key in keys:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                continue
+            self._keys[key] = None
+            self._keys_bytes += _key_size(key)
+            nuevas.append(key)
+        while len(self._keys) > self.max_entries:
+            expulsada, _ = self._keys.popitem(last=False)
+            self._keys_bytes -= _key_size(expulsada)
+        return nuevas
+
+    def _release(self, keys) -> None:
+        for key in keys:
+            if key in self._keys:
+                del self._keys[key]
+                self._keys_bytes -= _key_size(key)
+
+
+class BloomDedup(DedupFilter):
+    """Filtro de Bloom de tamaño fijo para capacity claves con tasa de falsos positivos error_rate.
+
+    Un positivo del filtro puede ser falso, por eso se confirma con exists(claves) -> set de las
+    que ya estan en la base. Las claves reclamadas y aun sin commit se guardan aparte (exactas),
+    ya que la base todavia no las ve. Sin exists los positivos se tratan como duplicados.
+
+    La consulta a exists se hace sin el lock, para no detener a los demas workers; luego se
+    revisa de nuevo bajo el lock que otro worker no haya reclamado la clave mientras tanto.
+    """
+
+    kind = DEDUP_BLOOM
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, exists=None):
+        super().__init__()
+        self.bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.exists = exists
+        self._array = bytearray((self.bits + 7) // 8)
+        self._in_flight = set()
+        self._count = 0
+        # Consultas a exists en curso y claves reclamadas mientras tanto, para la revision final
+        self._pending_queries = 0
+        self._claimed_during_queries = set()
+
+    def __len__(self):
+        return self._count
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._array) + sys.getsizeof(self._in_flight) + sum(
+            _key_size(key) for key in self._in_flight
+        ) + sum(_key_size(key) for key in self._claimed_during_queries)
+
+    def confirm(self, keys) -> None:
+        with self._lock:
+            self._in_flight.difference_update(keys)
+            if not self._in_flight:
+                # Un set no devuelve memoria al vaciarse
+                self._in_flight = set()
+
+    def _positions(self, key) -> list:
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _might_contain(self, positions) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def _add(self, key, positions) -> None:
+        for position in positions:
+            self._array[position >> 3] |= 1 << (position & 7)
+        self._in_flight.add(key)
+        self._count += 1
+        if self._pending_queries:
+            self._claimed_during_queries.add(key)
+
+    def claim(self, keys) -> list:
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            claimed, sospechosas = self._claim_filter(keys)
+            if not sospechosas or self.exists is None:
+                return [key for key in keys if key in claimed]
+            self._pending_queries += 1
+        try:
+            # Fallback a la base solo para los positivos del filtro, fuera del lock
+            existentes = self.exists([key for key, _ in sospechosas])
+        except Exception:
+            with self._lock:
+                self._end_query()
+            raise
+        with self._lock:
+            for key, positions in sospechosas:
+                # Otro worker pudo reclamarla (y confirmarla) durante la consulta
+                if key not in existentes and key not in self._in_flight and key not in self._claimed_during_queries:
+                    self._add(key, positions)
+                    claimed.add(key)
+            self._end_query()
+        return [key for key in keys if key in claimed]
+
+    def _end_query(self) -> None:
+        self._pending_queries -= 1
+        if not self._pending_queries:
+            self._claimed_during_queries = set()
+
+    def _claim_filter(self, keys: list) -> tuple:
+        """Reclama las claves que el filtro no contiene; retorna (reclamadas, positivos por confirmar)."""
+        claimed = set()
+        sospechosas = []
+        for key in keys:
+            if key in self._in_flight:
+                continue
+            positions = self._positions(key)
+            if self._might_contain(positions):
+                sospechosas.append((key, positions))
+            else:
+                self._add(key, positions)
+                claimed.add(key)
+        return claimed, sospechosas
+
+    def _claim(self, keys: list) -> list:
+        claimed, _ = self._claim_filter(keys)
+        return [key for key in keys if key in claimed]
+
+    def _release(self, keys) -> None:
+        # Los bits no se pueden borrar; al reintentar la clave el positivo se resuelve con exists
+        self._in_flight.difference_update(keys)
+
+
+class TaskDedup:
+    """Filtros de una tarea: id_lic de ml.licencias y pares (rut_medico, id_especialidad) de medicos."""
+
+    def __init__(self, licencias: DedupFilter, medicos: DedupFilter):
+        self.licencias = licencias
+        self.medicos = medicos
+
+    def detail(self) -> dict:
+        return {"licencias": self.licencias.detail(), "medicos": self.medicos.detail()}
+
+
+def build_dedup_filter(kind: str, lru_size: int = 1000000, bloom_capacity: int = 10000000,
+                       bloom_error_rate: float = 0.001, exists=None) -> DedupFilter:
+    if kind == DEDUP_EXACT:
+        return ExactDedup()
+    if kind == DEDUP_LRU:
+        return LruDedup(lru_size)
+    if kind == DEDUP_BLOOM:
+        return BloomDedup(bloom_capacity, bloom_error_rate, exists)
+    raise ValueError(f"Deduplicacion no soportada: {kind}, use una de {DEDUP_KINDS}")
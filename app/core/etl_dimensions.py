@@ -0,0 +1,91 @@
+import threading
+
+from sqlalchemy import text
+
+### Cache en memoria de las tablas de dimension usadas por el ETL (especialidad y profesionalidad). ###
+
+
+def normalizar_especialidad(especialidad) -> str:
+    """Descripcion con la que se guarda la especialidad en ml.especialidad_profesional."""
+    if especialidad is None or especialidad == '-':
+        descripcion = 'No informada'
+    else:
+        descripcion = especialidad
+    return descripcion.title()
+
+
+def normalizar_profesionalidad(tipo_profesional) -> str:
+    """Descripcion con la que se guarda el tipo profesional en ml.profesionalidad."""
+    if tipo_profesional is None or tipo_profesional == '-' or str(tipo_profesional).strip() == '':
+        descripcion = 'No informada'
+    else:
+        #TODO: Tema pendiente, no hay una descripcion del tipo profesional
+        descripcion = str(tipo_profesional)
+    return descripcion.title()
+
+
+class DimensionCache:
+    """Mapa descripcion -> id de una tabla de dimension.
+
+    Se carga completo una vez al inicio de la tarea (son pocos cientos de valores) y solo
+    inserta las descripciones que no conoce, con un unico INSERT ... RETURNING por llamada.
+    """
+
+    def __init__(self, table: str, id_column: str, description_column: str):
+        self.table = table
+        self.id_column = id_column
+        self.description_column = description_column
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def get(self, descripcion: str):
+        return self._ids.get(descripcion)
+
+    def load(self, session) -> None:
+        """Lee la tabla completa, reemplazando lo que hubiera en memoria."""
+        result = session.execute(text(f"""
+            SELECT {self.id_column}, {self.description_column} FROM {self.table}
+        """))
+        with self._lock:
+            self._ids = {descripcion: id_dimension for id_dimension, descripcion in result}
+
+    def resolve(self, session, descripciones) -> dict:
+        """Retorna los ids de las descripciones, insertando en un solo lote las que no existan.
+
+        No hace commit, la transaccion es de quien llama: los ids nuevos no se agregan a la cache
+        hasta que quien llama confirme y llame a remember(). Si la transaccion se revierte no quedan
+        en memoria ids que no existen, y otros hilos no ven ids sin confirmar.
+        """
+        with self._lock:
+            ids = {d: self._ids[d] for d in descripciones if d in self._ids}
+        nuevas = sorted({d for d in descripciones if d not in ids})
+        if nuevas:
+            # NOT EXISTS cubre descripciones insertadas por otro proceso despues de load() y ON CONFLICT
+            # las que otra transaccion inserta en paralelo (espera su commit y las lee abajo)
+            result = session.execute(text(f"""
+                INSERT INTO {self.table} ({self.description_column})
+                SELECT d FROM unnest(CAST(:descripciones AS text[])) AS d
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {self.table} t WHERE t.{self.description_column} = d
+                )
+                ON CONFLICT DO NOTHING
+                RETURNING {self.id_column}, {self.description_column}
+            """), {'descripciones': nuevas})
+            ids.update({descripcion: id_dimension for id_dimension, descripcion in result})
+
+            faltantes = [d for d in nuevas if d not in ids]
+            if faltantes:
+                result = session.execute(text(f"""
+                    SELECT {self.id_column}, {self.description_column} FROM {self.table}
+                    WHERE {self.description_column} = ANY(CAST(:descripciones AS text[]))
+                """), {'descripciones': faltantes})
+                ids.update({descripcion: id_dimension for id_dimension, descripcion in result})
+        return {d: ids.get(d) for d in descripciones}
+
+    def remember(self, ids: dict) -> None:
+        """Agrega a la cache los ids que retorno resolve(), una vez confirmada su transaccion."""
+        with self._lock:
+            self._ids.update({d: id_dimension for d, id_dimension in ids.items() if id_dimension is not None})
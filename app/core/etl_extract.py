@@ -0,0 +1,71 @@
+import json
+
+### Sentencia preparada de extraccion y captura de su plan (EXPLAIN) en el origen. ###
+
+PREPARED_NAME = "etl_extraccion"
+# Nodos del plan que leen la tabla por un indice en vez de recorrerla completa
+INDEX_NODE_TYPES = ("Index Scan", "Index Only Scan", "Bitmap Heap Scan", "Bitmap Index Scan")
+
+
+class PreparedExtraction:
+    """Prepara la consulta de extraccion una vez por conexion y la ejecuta por ventana con parametros.
+
+    query usa los parametros %(start_time)s y %(end_time)s; en la sentencia preparada pasan a $1 y $2
+    (timestamp), de modo que PostgreSQL la analiza y planifica una sola vez por conexion. Un cursor
+    de servidor no puede declararse sobre un EXECUTE, por lo que las filas de cada ventana llegan
+    completas al cliente: la memoria queda acotada por el tamaño de la ventana, no por fetch_size.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+
+    def prepare(self, conn) -> None:
+        """Crea la sentencia en la sesion; llamar una vez por conexion, antes de execute."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"PREPARE {PREPARED_NAME} (timestamp, timestamp) AS "
+                + self.query % {"start_time": "$1", "end_time": "$2"}
+            )
+        finally:
+            cursor.close()
+
+    def execute(self, cursor, start_time, end_time) -> None:
+        cursor.execute(f"EXECUTE {PREPARED_NAME} (%s, %s)", (start_time, end_time))
+
+    def explain(self, conn, start_time, end_time) -> dict:
+        """Plan de la sentencia preparada (ya creada con prepare) para una ventana, resumido con summarize_plan."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) EXECUTE {PREPARED_NAME} (%s, %s)", (start_time, end_time))
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return summarize_plan(plan[0]["Plan"])
+
+
+def summarize_plan(plan: dict, table: str = "sabana_fiscalizador_lme") -> dict:
+    """Indica como se lee table en el plan: tipo de nodo, indice usado y costo total estimado."""
+    summary = {"total_cost": plan.get("Total Cost"), "scan": None, "index": None}
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if node.get("Relation Name") == table and summary["scan"] is None:
+            summary["scan"] = node["Node Type"]
+            summary["index"] = node.get("Index Name") or _bitmap_index(node)
+    summary["uses_index"] = summary["scan"] in INDEX_NODE_TYPES
+    return summary
+
+
+def _bitmap_index(node: dict) -> str:
+    # En un Bitmap Heap Scan el indice aparece en los Bitmap Index Scan hijos
+    for child in node.get("Plans", []):
+        if child.get("Index Name"):
+            return child["Index Name"]
+        index = _bitmap_index(child)
+        if index:
+            return index
+    return None
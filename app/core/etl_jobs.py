@@ -0,0 +1,96 @@
+import heapq
+import itertools
+import logging
+import threading
+
+### Cola de tareas ETL del proceso: limite de ejecuciones concurrentes, prioridades y cancelacion. ###
+
+
+class TaskCancelled(Exception):
+    """La tarea se detuvo porque fue cancelada."""
+
+
+class EtlJobQueue:
+    """Ejecuta a lo mas max_concurrent tareas a la vez; el resto espera en cola.
+
+    Sale primero la tarea de mayor prioridad y, a igual prioridad, la mas antigua (FIFO). Cada tarea
+    corre en su propio hilo y recibe un threading.Event que se activa al cancelarla; la tarea debe
+    revisarlo entre lotes y terminar por su cuenta. Una tarea en cola se cancela sin llegar a ejecutarse.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self._heap = []
+        self._counter = itertools.count()
+        # task_id -> entrada del heap, las canceladas se marcan y se descartan al salir
+        self._queued = {}
+        # task_id -> evento de cancelacion de las tareas en ejecucion
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def submit(self, task_id: str, target, args: tuple = (), priority: int = 0) -> int:
+        """Encola la tarea y retorna su posicion en la cola (0 si empezo de inmediato).
+
+        target se llama como target(*args, cancel_event).
+        """
+        with self._lock:
+            if task_id in self._queued or task_id in self._running:
+                raise ValueError(f"La tarea {task_id} ya esta en cola o en ejecucion")
+            entry = [-priority, next(self._counter), task_id, target, args]
+            self._queued[task_id] = entry
+            heapq.heappush(self._heap, entry)
+            self._start_next()
+            return self._position(task_id)
+
+    def cancel(self, task_id: str) -> str:
+        """Cancela la tarea y retorna "queued" o "running" segun donde estaba, o None si no la tiene."""
+        with self._lock:
+            entry = self._queued.pop(task_id, None)
+            if entry is not None:
+                entry[2] = None
+                return "queued"
+            cancel_event = self._running.get(task_id)
+            if cancel_event is not None:
+                cancel_event.set()
+                return "running"
+            return None
+
+    def position(self, task_id: str) -> int:
+        """Posicion en la cola (1 = la proxima), 0 si esta en ejecucion o None si no la tiene."""
+        with self._lock:
+            return self._position(task_id)
+
+    def detail(self) -> dict:
+        with self._lock:
+            return {"running": len(self._running), "queued": len(self._queued), "max_concurrent": self.max_concurrent}
+
+    def _position(self, task_id: str) -> int:
+        if task_id in self._running:
+            return 0
+        entry = self._queued.get(task_id)
+        if entry is None:
+            return None
+        return 1 + sum(1 for other in self._queued.values() if other[:2] < entry[:2])
+
+    def _start_next(self) -> None:
+        # Llamar con el lock tomado
+        while self._heap and len(self._running) < self.max_concurrent:
+            _, _, task_id, target, args = heapq.heappop(self._heap)
+            if task_id is None:
+                continue
+            del self._queued[task_id]
+            cancel_event = threading.Event()
+            self._running[task_id] = cancel_event
+            threading.Thread(
+                target=self._run, args=(task_id, target, args, cancel_event), name=f"etl_job_{task_id[:8]}"
+            ).start()
+
+    def _run(self, task_id: str, target, args: tuple, cancel_event: threading.Event) -> None:
+        try:
+            target(*args, cancel_event)
+        except Exception:
+            logging.exception(f"Error no controlado en la tarea ETL task_id {task_id}")
+        finally:
+            with self._lock:
+                del self._running[task_id]
+                self._start_next()
@@ -0,0 +1,277 @@
+import io
+
+from psycopg2.extras import execute_values
+
+### Carga masiva de ml.*, usada por los modos de carga por lotes (batch) y staging del ETL. ###
+
+# Columnas de ml.licencias en el mismo orden del INSERT por fila de ETLService.upload_to_lm
+LICENCIAS_COLUMNS = [
+    "id_lic", "operador", "ccaf", "entidad_pagadora", "folio", "fecha_emision", "empleador_adscrito",
+    "codigo_interno_prestador", "comuna_prestador", "fecha_ultimo_estado", "ultimo_estado",
+    "rut_trabajador", "sexo_trabajador", "edad_trabajador", "tipo_reposo", "dias_reposo",
+    "fecha_inicio_reposo", "comuna_reposo", "tipo_licencia", "rut_medico",
+    "tipo_licencia_pronunciamiento", "codigo_continuacion_pronunciamiento",
+    "dias_autorizados_pronunciamiento", "codigo_diagnostico_pronunciamiento",
+    "codigo_autorizacion_pronunciamiento", "causa_rechazo_pronunciamiento",
+    "tipo_reposo_pronunciamiento", "derecho_a_subsidio_pronunciamiento", "rut_empleador",
+    "calidad_trabajador", "actividad_laboral_trabajador", "ocupacion", "entidad_pagadora_zona_c",
+    "fecha_recepcion_empleador", "regimen_previsional", "entidad_pagadora_subsidio",
+    "comuna_laboral", "comuna_uso_compin", "cantidad_de_pronunciamientos", "cantidad_de_zonas_d",
+    "secuencia_estados", "cod_diagnostico_principal", "cod_diagnostico_secundario", "periodo",
+    "marca_otorgamiento",
+]
+
+LOAD_METHOD_COPY = "copy"
+LOAD_METHOD_VALUES = "values"
+LOAD_METHODS = (LOAD_METHOD_COPY, LOAD_METHOD_VALUES)
+
+_COLUMNS_SQL = ", ".join(LICENCIAS_COLUMNS)
+
+
+# Escape del formato text de COPY: \N es NULL y se escapan backslash, tab y saltos de linea
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value) -> str:
+    """Convierte un valor de Python a su representacion en el formato text de COPY."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def rows_to_copy_buffer(rows, columns=LICENCIAS_COLUMNS) -> io.StringIO:
+    """Serializa las filas (dicts) en un buffer listo para COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_value(row.get(column)) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+class LicenciasBulkLoader:
+    """Inserta lotes de filas en ml.licencias manteniendo ON CONFLICT (id_lic) DO NOTHING.
+
+    - copy: COPY FROM STDIN a una tabla temporal y luego INSERT ... SELECT ... ON CONFLICT.
+    - values: INSERT multi-fila con psycopg2.extras.execute_values (respaldo sin COPY).
+
+    No hace commit: la transaccion la maneja quien llama, una vez por lote.
+    """
+
+    def __init__(self, method: str = LOAD_METHOD_COPY):
+        if method not in LOAD_METHODS:
+            raise ValueError(f"Metodo de carga no soportado: {method}, use uno de {LOAD_METHODS}")
+        self.method = method
+
+    def load(self, dbapi_connection, rows: list) -> int:
+        """Carga las filas usando la conexion DBAPI (psycopg2) y retorna cuantas se insertaron."""
+        if not rows:
+            return 0
+        cursor = dbapi_connection.cursor()
+        try:
+            if self.method == LOAD_METHOD_COPY:
+                return self._load_copy(cursor, rows)
+            return self._load_values(cursor, rows)
+        finally:
+            cursor.close()
+
+    def _load_copy(self, cursor, rows: list) -> int:
+        # La tabla temporal vive en la conexion del pool, se reutiliza entre lotes
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS tmp_etl_licencias
+            (LIKE ml.licencias INCLUDING DEFAULTS)
+        """)
+        cursor.copy_expert(
+            f"COPY tmp_etl_licencias ({_COLUMNS_SQL}) FROM STDIN",
+            rows_to_copy_buffer(rows),
+        )
+        cursor.execute(f"""
+            INSERT INTO ml.licencias ({_COLUMNS_SQL})
+            SELECT {_COLUMNS_SQL} FROM tmp_etl_licencias
+            ON CONFLICT (id_lic) DO NOTHING
+        """)
+        inserted = cursor.rowcount
+        cursor.execute("TRUNCATE tmp_etl_licencias")
+        return inserted
+
+    def _load_values(self, cursor, rows: list) -> int:
+        values = [tuple(row.get(column) for column in LICENCIAS_COLUMNS) for row in rows]
+        execute_values(
+            cursor,
+            f"INSERT INTO ml.licencias ({_COLUMNS_SQL}) VALUES %s ON CONFLICT (id_lic) DO NOTHING",
+            values,
+            page_size=len(values),
+        )
+        return cursor.rowcount
+
+
+# Tabla de staging del modo "staging": sin WAL, las filas de un lote se insertan y borran en la misma transaccion
+STAGING_TABLE = "ml.etl_staging_licencias"
+STAGING_COLUMNS = LICENCIAS_COLUMNS + [
+    "especialidad_profesional", "id_especialidad_profesional", "id_profesionalidad", "reclamada", "lote",
+]
+
+_STAGING_COLUMNS_SQL = ", ".join(STAGING_COLUMNS)
+
+# Sentencias set-based que pueblan las tablas ml.* desde el lote :lote de la tabla de staging
+_MERGE_STATEMENTS = [
+    ("ml.medicos", f"""
+        INSERT INTO ml.medicos (rut_medico)
+        SELECT DISTINCT rut_medico FROM {STAGING_TABLE}
+        WHERE lote = %(lote)s AND rut_medico IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """),
+    ("ml.especialidad_profesional_medicos", f"""
+        INSERT INTO ml.especialidad_profesional_medicos (id_especialidad_profesional, rut_medico)
+        SELECT DISTINCT id_especialidad_profesional, rut_medico FROM {STAGING_TABLE}
+        WHERE lote = %(lote)s AND rut_medico IS NOT NULL AND id_especialidad_profesional IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """),
+    ("ml.profesionalidad_medicos", f"""
+        INSERT INTO ml.profesionalidad_medicos (id_profesionalidad, rut_medico)
+        SELECT DISTINCT id_profesionalidad, rut_medico FROM {STAGING_TABLE}
+        WHERE lote = %(lote)s AND rut_medico IS NOT NULL AND id_profesionalidad IS NOT NULL
+        ON CONFLICT (id_profesionalidad, rut_medico) DO NOTHING
+    """),
+    ("ml.licencias", f"""
+        INSERT INTO ml.licencias ({_COLUMNS_SQL})
+        SELECT {_COLUMNS_SQL} FROM {STAGING_TABLE}
+        WHERE lote = %(lote)s AND reclamada
+        ON CONFLICT (id_lic) DO NOTHING
+    """),
+    # Igual que save_diagnostico_especialidad: solo si la licencia no tiene registro
+    ("ml.licencia_diagnostico_especialidad", f"""
+        INSERT INTO ml.licencia_diagnostico_especialidad (id_licencia, cod_diagnostico, especialidad_medico)
+        SELECT s.id_lic, s.cod_diagnostico_principal, s.especialidad_profesional FROM {STAGING_TABLE} s
+        WHERE s.lote = %(lote)s AND s.reclamada AND NOT EXISTS (
+            SELECT 1 FROM ml.licencia_diagnostico_especialidad d WHERE d.id_licencia = s.id_lic
+        )
+    """),
+]
+
+
+# Modo delta: hash del contenido de cada licencia cargada, para actualizar solo las que cambiaron
+LICENCIAS_HASH_TABLE = "ml.licencias_hash"
+
+_UPDATE_SET_SQL = ", ".join(f"{column} = EXCLUDED.{column}" for column in LICENCIAS_COLUMNS if column != "id_lic")
+_CURRENT_ROW_SQL = ", ".join(f"l.{column}" for column in LICENCIAS_COLUMNS if column != "id_lic")
+_EXCLUDED_ROW_SQL = ", ".join(f"EXCLUDED.{column}" for column in LICENCIAS_COLUMNS if column != "id_lic")
+
+# Reemplaza el INSERT ... DO NOTHING de ml.licencias: se escriben las licencias cuyo hash cambio o que
+# faltan en ml.licencias (por ejemplo tras truncarla); la condicion del DO UPDATE evita reescribir las
+# que ya tienen el mismo contenido pero aun no tenian hash. Retorna insertadas, actualizadas y recibidas
+_DELTA_LICENCIAS = f"""
+    WITH entrantes AS (
+        SELECT {_COLUMNS_SQL}, decode(md5(ROW({_COLUMNS_SQL})::text), 'hex') AS hash
+        FROM {STAGING_TABLE}
+        WHERE lote = %(lote)s AND reclamada
+    ), cambios AS (
+        SELECT e.* FROM entrantes e
+        LEFT JOIN {LICENCIAS_HASH_TABLE} h ON h.id_lic = e.id_lic
+        WHERE h.hash IS DISTINCT FROM e.hash
+           OR NOT EXISTS (SELECT 1 FROM ml.licencias l WHERE l.id_lic = e.id_lic)
+    ), escritas AS (
+        INSERT INTO ml.licencias AS l ({_COLUMNS_SQL})
+        SELECT {_COLUMNS_SQL} FROM cambios
+        ON CONFLICT (id_lic) DO UPDATE SET {_UPDATE_SET_SQL}
+        WHERE ({_CURRENT_ROW_SQL}) IS DISTINCT FROM ({_EXCLUDED_ROW_SQL})
+        RETURNING xmax = 0 AS insertada
+    ), hashes AS (
+        INSERT INTO {LICENCIAS_HASH_TABLE} (id_lic, hash)
+        SELECT id_lic, hash FROM cambios
+        ON CONFLICT (id_lic) DO UPDATE SET hash = EXCLUDED.hash
+    )
+    SELECT
+        count(*) FILTER (WHERE insertada),
+        count(*) FILTER (WHERE NOT insertada),
+        (SELECT count(*) FROM entrantes)
+    FROM escritas
+"""
+
+
+class StagingMerger:
+    """Carga un lote con COPY a una tabla UNLOGGED y puebla las cinco tablas ml.* con INSERT ... SELECT.
+
+    Las filas deben traer las columnas de STAGING_COLUMNS: los ids de dimension ya resueltos,
+    reclamada (primera aparicion del id_lic en la tarea) y el lote, que separa las filas de
+    workers concurrentes. No hace commit: la transaccion la maneja quien llama.
+
+    Con delta las licencias ya cargadas se comparan por hash (LICENCIAS_HASH_TABLE) y se actualizan solo
+    las que cambiaron; el resultado incluye "delta" con inserted, updated y unchanged.
+    """
+
+    def __init__(self, delta: bool = False):
+        self.delta = delta
+
+    def ensure_table(self, dbapi_connection) -> None:
+        """Crea la tabla de staging si no existe; quien llama hace commit antes de cargar lotes."""
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"""
+                CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE}
+                (LIKE ml.licencias INCLUDING DEFAULTS)
+            """)
+            cursor.execute(f"""
+                ALTER TABLE {STAGING_TABLE}
+                    ADD COLUMN IF NOT EXISTS especialidad_profesional text,
+                    ADD COLUMN IF NOT EXISTS id_especialidad_profesional integer,
+                    ADD COLUMN IF NOT EXISTS id_profesionalidad integer,
+                    ADD COLUMN IF NOT EXISTS reclamada boolean,
+                    ADD COLUMN IF NOT EXISTS lote text,
+                    ADD COLUMN IF NOT EXISTS tipo_profesional text
+            """)
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS etl_staging_licencias_lote_idx ON {STAGING_TABLE} (lote)
+            """)
+            if self.delta:
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {LICENCIAS_HASH_TABLE} (
+                        id_lic text PRIMARY KEY,
+                        hash bytea NOT NULL
+                    )
+                """)
+        finally:
+            cursor.close()
+
+    def merge(self, dbapi_connection, rows: list, lote: str) -> dict:
+        """Retorna las filas insertadas por tabla destino."""
+        if not rows:
+            return {}
+        return self._merge(
+            dbapi_connection, f"COPY {STAGING_TABLE} ({_STAGING_COLUMNS_SQL}) FROM STDIN",
+            rows_to_copy_buffer(rows, STAGING_COLUMNS), lote,
+        )
+
+    def merge_csv(self, dbapi_connection, buffer, lote: str) -> dict:
+        """Igual que merge, con el lote ya serializado en CSV (columnas de STAGING_COLUMNS, sin encabezado)."""
+        return self._merge(
+            dbapi_connection, f"COPY {STAGING_TABLE} ({_STAGING_COLUMNS_SQL}) FROM STDIN WITH (FORMAT csv)",
+            buffer, lote,
+        )
+
+    def merge_staged(self, dbapi_connection, lote: str) -> dict:
+        """Igual que merge, con las filas del lote ya insertadas en la tabla de staging."""
+        return self._merge(dbapi_connection, None, None, lote)
+
+    def _merge(self, dbapi_connection, copy_sql: str, buffer, lote: str) -> dict:
+        cursor = dbapi_connection.cursor()
+        try:
+            if copy_sql is not None:
+                cursor.copy_expert(copy_sql, buffer)
+            inserted = {}
+            for table, statement in _MERGE_STATEMENTS:
+                if self.delta and table == "ml.licencias":
+                    cursor.execute(_DELTA_LICENCIAS, {"lote": lote})
+                    insertadas, actualizadas, recibidas = cursor.fetchone()
+                    inserted[table] = insertadas
+                    inserted["delta"] = {
+                        "inserted": insertadas, "updated": actualizadas,
+                        "unchanged": recibidas - insertadas - actualizadas,
+                    }
+                    continue
+                cursor.execute(statement, {"lote": lote})
+                inserted[table] = cursor.rowcount
+            cursor.execute(f"DELETE FROM {STAGING_TABLE} WHERE lote = %(lote)s", {"lote": lote})
+            return inserted
+        finally:
+            cursor.close()
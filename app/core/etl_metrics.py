@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from contextlib import contextmanager
+
+import psycopg2.extensions
+from sqlalchemy import event
+
+### Metricas de throughput del ETL y logging no bloqueante (QueueHandler + QueueListener). ###
+
+METRIC_STAGES = ("extract", "transform", "snapshot", "load")
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+metrics_logger = logging.getLogger("etl.metrics")
+
+# Metricas de la tarea que se ejecuta en el hilo actual, usadas por CountingCursor
+_current = threading.local()
+
+
+class EtlMetrics:
+    """Metricas agregadas en memoria de una tarea, compartidas por todos sus workers.
+
+    - stages: filas y segundos de extraccion, transformacion, snapshot (CSV/parquet) y carga.
+    - windows: cantidad, filas y duracion (promedio y maxima) de las ventanas de extraccion.
+    - round_trips: sentencias enviadas a la base ML y al origen.
+    - retries: reintentos por motivo.
+    - delta: licencias insertadas, actualizadas y sin cambios (solo con carga delta).
+    """
+
+    def __init__(self):
+        self._stages = {stage: [0, 0.0] for stage in METRIC_STAGES}
+        self._windows = {"count": 0, "rows": 0, "seconds": 0.0, "max_seconds": 0.0}
+        self._round_trips = {"ml": 0, "source": 0}
+        self._retries = {}
+        self._delta = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, rows: int, seconds: float) -> None:
+        with self._lock:
+            self._stages[stage][0] += rows
+            self._stages[stage][1] += seconds
+
+    def add_window(self, rows: int, seconds: float) -> None:
+        with self._lock:
+            self._windows["count"] += 1
+            self._windows["rows"] += rows
+            self._windows["seconds"] += seconds
+            self._windows["max_seconds"] = max(self._windows["max_seconds"], seconds)
+
+    def add_round_trips(self, database: str, count: int = 1) -> None:
+        with self._lock:
+            self._round_trips[database] += count
+
+    def add_retry(self, reason: str) -> None:
+        with self._lock:
+            self._retries[reason] = self._retries.get(reason, 0) + 1
+
+    def add_delta(self, delta: dict) -> None:
+        with self._lock:
+            if self._delta is None:
+                self._delta = {"inserted": 0, "updated": 0, "unchanged": 0}
+            for key in self._delta:
+                self._delta[key] += delta[key]
+
+    def detail(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    "rows": rows,
+                    "seconds": round(seconds, 3),
+                    "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else 0.0,
+                }
+                for stage, (rows, seconds) in self._stages.items()
+            }
+            count = self._windows["count"]
+            windows = {
+                "count": count,
+                "avg_rows": round(self._windows["rows"] / count, 1) if count else 0.0,
+                "avg_seconds": round(self._windows["seconds"] / count, 3) if count else 0.0,
+                "max_seconds": round(self._windows["max_seconds"], 3),
+            }
+            detail = {
+                "stages": stages,
+                "windows": windows,
+                "round_trips": dict(self._round_trips),
+                "retries": dict(self._retries),
+            }
+            if self._delta is not None:
+                detail["delta"] = dict(self._delta)
+            return detail
+
+
+@contextmanager
+def bind_metrics(metrics: EtlMetrics):
+    """Asocia las metricas al hilo actual, para contar las sentencias que ejecute contra la base ML."""
+    previous = getattr(_current, "metrics", None)
+    _current.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _current.metrics = previous
+
+
+def current_metrics() -> EtlMetrics:
+    """Metricas asociadas al hilo actual con bind_metrics, o None."""
+    return getattr(_current, "metrics", None)
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor psycopg2 que cuenta cada viaje a la base en las metricas del hilo actual.
+
+    Cubre tanto las sesiones SQLAlchemy como los cursores DBAPI (COPY, execute_values).
+    """
+
+    def execute(self, query, vars=None):
+        _count_round_trip()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _count_round_trip()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count_round_trip()
+        return super().copy_expert(sql, file, size)
+
+
+def _count_round_trip() -> None:
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.add_round_trips("ml")
+
+
+_instrumented_engines = set()
+
+
+def instrument_engine(engine) -> None:
+    """Hace que las conexiones nuevas del engine usen CountingCursor (una vez por engine)."""
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+
+    @event.listens_for(engine, "connect")
+    def _use_counting_cursor(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, psycopg2.extensions.connection):
+            dbapi_connection.cursor_factory = CountingCursor
+
+
+class MetricsReporter:
+    """Escribe las metricas de una tarea en el log cada interval segundos, desde su propio hilo."""
+
+    def __init__(self, task_id: str, metrics: EtlMetrics, interval: float):
+        self.task_id = task_id
+        self.metrics = metrics
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "MetricsReporter":
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name=f"etl_metrics_{self.task_id[:8]}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detiene el hilo y registra las metricas finales."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.log()
+
+    def log(self) -> None:
+        metrics_logger.info(f"Metricas task_id {self.task_id}: {json.dumps(self.metrics.detail())}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.log()
+
+
+_listener = None
+
+
+def setup_queue_logging(filename: str, level: int = logging.INFO) -> None:
+    """Configura el logger raiz con un QueueHandler; un QueueListener escribe en el archivo.
+
+    Los workers del ETL solo encolan los registros y no esperan la escritura a disco. Igual que
+    logging.basicConfig, no hace nada si el logger raiz ya tiene handlers.
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    file_handler = logging.FileHandler(filename, mode='a')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.Queue(-1)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
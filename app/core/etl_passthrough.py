@@ -0,0 +1,168 @@
+import queue
+import threading
+
+from app.core.etl_loader import LICENCIAS_COLUMNS, STAGING_COLUMNS, STAGING_TABLE
+
+### Extraccion directa origen -> base ML con COPY, sin convertir las filas en tuplas de Python. ###
+
+# Tabla temporal de la conexion ML donde llega cada ventana; se vacia sola al confirmar la transaccion
+PASSTHROUGH_TABLE = "tmp_etl_passthrough"
+
+_STAGING_COLUMNS_SQL = ", ".join(STAGING_COLUMNS)
+_LICENCIAS_COLUMNS_SQL = ", ".join(f"t.{column}" for column in LICENCIAS_COLUMNS)
+
+# Bytes por bloque entre el COPY del origen y el de la base ML (psycopg2 entrega una fila por write)
+COPY_CHUNK_BYTES = 256 * 1024
+
+
+def passthrough_query(extraction_query: str) -> str:
+    """La consulta de extraccion con el mapeo de empleador_adscrito de transform_batch hecho en el SELECT."""
+    column = "lic.empleador_adscrito,"
+    if extraction_query.count(column) != 1:
+        raise ValueError("La consulta de extraccion no tiene la columna lic.empleador_adscrito")
+    # 0 solo para "No"; NULL y cualquier otro valor quedan en 1, igual que la version por fila
+    # El ORDER BY de la consulta de extraccion se mantiene: la primera aparicion de cada id_lic
+    # repetido es la misma que en la extraccion por cursor
+    return extraction_query.replace(
+        column, "CASE WHEN lic.empleador_adscrito = 'No' THEN 0 ELSE 1 END AS empleador_adscrito,"
+    )
+
+
+class CopyAborted(Exception):
+    """El COPY de destino termino antes que el del origen (por un error), el origen debe detenerse."""
+
+
+class CopyStream:
+    """Une un COPY ... TO STDOUT del origen, que escribe desde otro hilo, con un COPY ... FROM STDIN.
+
+    Las filas se agrupan en bloques de chunk_bytes y la cola admite max_chunks bloques: si la carga
+    es lenta el origen se detiene, y la memoria queda acotada a max_chunks * chunk_bytes. tee recibe
+    cada bloque, por ejemplo para el snapshot.
+    """
+
+    def __init__(self, tee=None, chunk_bytes: int = COPY_CHUNK_BYTES, max_chunks: int = 8):
+        self.tee = tee
+        self.chunk_bytes = chunk_bytes
+        self.bytes = 0
+        self.error = None
+        self._queue = queue.Queue(max_chunks)
+        self._aborted = threading.Event()
+        self._pending = bytearray()
+        self._current = memoryview(b"")
+        self._finished = False
+
+    # Lado del origen (hilo productor)
+
+    def write(self, data) -> None:
+        self._pending += data
+        if len(self._pending) >= self.chunk_bytes:
+            self._put(bytes(self._pending))
+            self._pending = bytearray()
+
+    def produce(self, cursor, copy_sql: str) -> None:
+        """Ejecuta el COPY TO STDOUT del origen; el error, si lo hay, queda en self.error."""
+        try:
+            cursor.copy_expert(copy_sql, self)
+            if self._pending:
+                self._put(bytes(self._pending))
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._put(None)
+
+    def _put(self, chunk) -> None:
+        if chunk is not None:
+            if self.tee is not None:
+                self.tee(chunk)
+            self.bytes += len(chunk)
+        while not self._aborted.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        if chunk is not None:
+            raise CopyAborted()
+
+    # Lado de la base ML (hilo que llama a copy_expert con FROM STDIN)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._current:
+            if self._finished:
+                return b""
+            chunk = self._queue.get()
+            if chunk is None:
+                self._finished = True
+                return b""
+            self._current = memoryview(chunk)
+        if size is None or size < 0:
+            size = len(self._current)
+        data = bytes(self._current[:size])
+        self._current = self._current[size:]
+        return data
+
+    def abort(self) -> None:
+        """Detiene el productor cuando el COPY de destino falla."""
+        self._aborted.set()
+
+
+def ensure_temp_table(cursor) -> None:
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {PASSTHROUGH_TABLE}
+        (LIKE {STAGING_TABLE} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+    """)
+
+
+def copy_window(cursor, columns: list, stream: CopyStream) -> int:
+    """Copia el CSV del stream a la tabla temporal y retorna las filas copiadas."""
+    cursor.copy_expert(f"COPY {PASSTHROUGH_TABLE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+    return cursor.rowcount
+
+
+def window_keys(cursor) -> tuple:
+    """Valores distintos de especialidad y tipo profesional, e id_lic en el orden del origen, en un solo viaje."""
+    cursor.execute(f"""
+        SELECT
+            array_agg(DISTINCT especialidad_profesional),
+            array_agg(DISTINCT tipo_profesional),
+            array_agg(id_lic ORDER BY ctid)
+        FROM {PASSTHROUGH_TABLE}
+    """)
+    especialidades, profesionalidades, ids = cursor.fetchone()
+    return especialidades or [], profesionalidades or [], ids or []
+
+
+def stage_window(cursor, lote: str, especialidades: dict, profesionalidades: dict, reclamadas: list) -> None:
+    """Pasa la ventana de la tabla temporal a la de staging como el lote lote.
+
+    especialidades y profesionalidades mapean el valor del origen al id de dimension; reclamada
+    queda en la primera fila (en el orden del origen) de cada id_lic de reclamadas.
+    """
+    esp_valores = [valor for valor in especialidades if valor is not None]
+    prof_valores = [valor for valor in profesionalidades if valor is not None]
+    cursor.execute(f"""
+        INSERT INTO {STAGING_TABLE} ({_STAGING_COLUMNS_SQL})
+        SELECT
+            {_LICENCIAS_COLUMNS_SQL}, t.especialidad_profesional,
+            CASE WHEN t.especialidad_profesional IS NULL THEN %(esp_nulo)s ELSE e.id END,
+            CASE WHEN t.tipo_profesional IS NULL THEN %(prof_nulo)s ELSE p.id END,
+            f.ctid IS NOT NULL,
+            %(lote)s
+        FROM {PASSTHROUGH_TABLE} t
+        LEFT JOIN unnest(%(esp_valores)s::text[], %(esp_ids)s::integer[]) AS e (valor, id)
+            ON e.valor = t.especialidad_profesional
+        LEFT JOIN unnest(%(prof_valores)s::text[], %(prof_ids)s::integer[]) AS p (valor, id)
+            ON p.valor = t.tipo_profesional
+        LEFT JOIN (
+            SELECT DISTINCT ON (id_lic) id_lic, ctid FROM {PASSTHROUGH_TABLE}
+            WHERE id_lic = ANY(%(reclamadas)s::text[])
+            ORDER BY id_lic, ctid
+        ) f ON f.ctid = t.ctid
+    """, {
+        "lote": lote,
+        "esp_valores": esp_valores, "esp_ids": [especialidades[valor] for valor in esp_valores],
+        "esp_nulo": especialidades.get(None),
+        "prof_valores": prof_valores, "prof_ids": [profesionalidades[valor] for valor in prof_valores],
+        "prof_nulo": profesionalidades.get(None),
+        "reclamadas": list(reclamadas),
+    })
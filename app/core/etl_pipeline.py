@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+### Pipeline extraccion -> transformacion -> carga con colas acotadas entre etapas. ###
+
+STAGES = ("extract", "transform", "load")
+
+# Espera maxima en cada put/get antes de revisar si otra etapa fallo
+_POLL_SECONDS = 0.1
+_END = object()
+
+
+class Batch(NamedTuple):
+    """Bloque de filas que avanza por el pipeline; columns y numeric_columns solo los usa la transformacion."""
+    rows: list
+    columns: list = None
+    # Columnas numeric que llegan como texto (carga columnar)
+    numeric_columns: tuple = ()
+
+
+class WindowDone(NamedTuple):
+    """Marca el fin de una ventana de extraccion, pasa por las etapas sin transformarse."""
+    start: object
+    end: object
+    rows: int
+
+
+class PipelineStats:
+    """Filas por segundo de cada etapa y profundidad de cada cola, compartido por todos los workers.
+
+    rows_per_sec se calcula sobre el tiempo que la etapa estuvo trabajando (sin contar la espera en
+    las colas): la etapa con menor valor es el cuello de botella. Una cola llena indica que la
+    etapa siguiente no da abasto; una cola vacia, que la anterior es la lenta.
+    """
+
+    def __init__(self):
+        self._rows = {stage: 0 for stage in STAGES}
+        self._seconds = {stage: 0.0 for stage in STAGES}
+        # Colas de salida de extract y transform: profundidad actual, suma de muestras, muestras y maximo
+        self._depth = {stage: [0, 0, 0, 0] for stage in STAGES[:2]}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, rows: int, seconds: float) -> None:
+        with self._lock:
+            self._rows[stage] += rows
+            self._seconds[stage] += seconds
+
+    def sample_depth(self, stage: str, depth: int) -> None:
+        with self._lock:
+            sample = self._depth[stage]
+            sample[0] = depth
+            sample[1] += depth
+            sample[2] += 1
+            sample[3] = max(sample[3], depth)
+
+    def detail(self) -> dict:
+        with self._lock:
+            detail = {}
+            for stage in STAGES:
+                seconds = self._seconds[stage]
+                detail[stage] = {
+                    "rows": self._rows[stage],
+                    "rows_per_sec": round(self._rows[stage] / seconds, 1) if seconds > 0 else 0.0,
+                }
+                if stage in self._depth:
+                    depth, total, samples, maximum = self._depth[stage]
+                    detail[stage]["queue_depth"] = depth
+                    detail[stage]["queue_depth_avg"] = round(total / samples, 2) if samples else 0.0
+                    detail[stage]["queue_depth_max"] = maximum
+            return detail
+
+
+class EtlPipeline:
+    """Ejecuta extraccion, transformacion y carga en hilos distintos unidos por colas de queue_size bloques.
+
+    - extract: iterable de Batch y WindowDone, se recorre en su propio hilo.
+    - transform(batch) -> Batch: corre en otro hilo; los WindowDone pasan sin tocarse.
+    - load(item): corre en el hilo que llama a run(), recibe Batch y WindowDone en orden.
+
+    Las colas acotadas dan backpressure: si la carga es lenta la extraccion se detiene al llenarse
+    las colas, la memoria queda acotada a 2 * queue_size bloques. Si una etapa falla las otras se
+    detienen y run() propaga el primer error.
+    """
+
+    def __init__(self, queue_size: int, stats: PipelineStats = None):
+        self.stats = stats or PipelineStats()
+        self._queues = {stage: queue.Queue(maxsize=queue_size) for stage in STAGES[:2]}
+        self._failed = threading.Event()
+        self._error = None
+
+    def run(self, extract, transform, load) -> None:
+        threads = [
+            threading.Thread(target=self._extract, args=(extract,), name="etl_extract", daemon=True),
+            threading.Thread(target=self._transform, args=(transform,), name="etl_transform", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self._get("transform")
+                if item is _END:
+                    break
+                self._run_stage("load", load, item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _extract(self, extract) -> None:
+        try:
+            iterator = iter(extract)
+            while not self._failed.is_set():
+                start = time.perf_counter()
+                item = next(iterator, _END)
+                if item is _END:
+                    break
+                if isinstance(item, Batch):
+                    self.stats.add("extract", len(item.rows), time.perf_counter() - start)
+                self._put("extract", item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put("extract", _END)
+            # Cierra el generador en su hilo (libera cursor y conexion de origen)
+            if hasattr(extract, "close"):
+                extract.close()
+
+    def _transform(self, transform) -> None:
+        try:
+            while True:
+                item = self._get("extract")
+                if item is _END:
+                    break
+                if isinstance(item, Batch):
+                    item = self._run_stage("transform", transform, item)
+                self._put("transform", item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put("transform", _END)
+
+    def _run_stage(self, stage: str, function, item):
+        if not isinstance(item, Batch):
+            return function(item)
+        start = time.perf_counter()
+        result = function(item)
+        self.stats.add(stage, len(item.rows), time.perf_counter() - start)
+        return result
+
+    def _put(self, stage: str, item) -> None:
+        output = self._queues[stage]
+        while True:
+            # Con una etapa caida el fin de cola se entrega igual, descartando lo pendiente
+            if self._failed.is_set() and item is not _END:
+                return
+            try:
+                output.put(item, timeout=_POLL_SECONDS)
+                self.stats.sample_depth(stage, output.qsize())
+                return
+            except queue.Full:
+                if self._failed.is_set():
+                    _drain(output)
+
+    def _get(self, stage: str):
+        source = self._queues[stage]
+        while True:
+            try:
+                item = source.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if self._failed.is_set() and item is not _END:
+                continue
+            return item
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._failed.set()
+
+
+def _drain(source: queue.Queue) -> None:
+    while True:
+        try:
+            source.get_nowait()
+        except queue.Empty:
+            return
@@ -0,0 +1,133 @@
+import threading
+from datetime import timedelta
+
+from app.core.etl_dedup import TaskDedup
+from app.core.etl_metrics import EtlMetrics
+from app.core.etl_pipeline import PipelineStats
+from app.core.ports.etl import TaskRepository
+
+### Avance agregado de una tarea ETL y particion del rango de fechas en ventanas. ###
+
+
+def split_partitions(start_date, end_date, partition_hours: int) -> list:
+    """Divide [start_date, end_date] en particiones de partition_hours horas (la ultima puede ser menor)."""
+    partitions = []
+    current = start_date
+    while current < end_date:
+        partition_end = min(current + timedelta(hours=partition_hours), end_date)
+        partitions.append((current, partition_end))
+        current = partition_end
+    return partitions
+
+
+def hourly_windows(partition_start, partition_end) -> list:
+    """Ventanas de una hora que comienzan dentro de la particion, igual que el recorrido secuencial."""
+    windows = []
+    current = partition_start
+    while current < partition_end:
+        windows.append((current, current + timedelta(hours=1)))
+        current = current + timedelta(hours=1)
+    return windows
+
+
+def window_covered(window_start, window_end, completed_windows) -> bool:
+    """Indica si [window_start, window_end] queda cubierta por las ventanas ya completadas."""
+    intervals = sorted((start, end) for start, end, *_ in completed_windows)
+    covered_until = window_start
+    for start, end in intervals:
+        if start > covered_until:
+            break
+        covered_until = max(covered_until, end)
+        if covered_until >= window_end:
+            return True
+    return covered_until >= window_end
+
+
+def throughput_detail(stats: dict) -> dict:
+    """Calcula filas por segundo de extraccion y de carga a partir de los acumulados de la tarea."""
+    def rows_per_sec(rows, seconds):
+        return round(rows / seconds, 1) if seconds > 0 else 0.0
+    return {
+        "extract_rows_per_sec": rows_per_sec(stats["extract_rows"], stats["extract_seconds"]),
+        "load_rows_per_sec": rows_per_sec(stats["load_rows"], stats["load_seconds"]),
+    }
+
+
+class EtlProgress:
+    """Contadores de una tarea compartidos por todos sus workers.
+
+    Cada worker suma lo que extrae y carga; el total se publica en el TaskRepository con el
+    estado "in process", de modo que el avance reportado es el agregado de todas las particiones.
+    El detalle incluye las metricas de la tarea (EtlMetrics); con pipeline_stats tambien las filas
+    por segundo y colas de cada etapa, y con dedup las claves y memoria de los filtros de la tarea.
+    extraction_plan es el resumen del plan de extraccion capturado al iniciar la tarea y record_rejected
+    las filas enviadas a dead letter.
+    """
+
+    def __init__(self, task_repository: TaskRepository, task_id: str, partitions_total: int = 1,
+                 pipeline_stats: PipelineStats = None, dedup: TaskDedup = None):
+        self.task_repository = task_repository
+        self.pipeline_stats = pipeline_stats
+        self.dedup = dedup
+        self.extraction_plan = None
+        self.metrics = EtlMetrics()
+        self.task_id = task_id
+        self.partitions_total = partitions_total
+        self.partitions_done = 0
+        self.record_count = 0
+        self.rejected_count = 0
+        self.stats = {"extract_rows": 0, "extract_seconds": 0.0, "load_rows": 0, "load_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def add_extract(self, rows: int, seconds: float) -> None:
+        self.metrics.add_stage("extract", rows, seconds)
+        with self._lock:
+            self.stats["extract_rows"] += rows
+            self.stats["extract_seconds"] += seconds
+
+    def add_load_time(self, seconds: float) -> None:
+        self.metrics.add_stage("load", 0, seconds)
+        with self._lock:
+            self.stats["load_seconds"] += seconds
+
+    def add_loaded(self, rows: int, seconds: float) -> None:
+        """Registra filas ya confirmadas en ml.* y publica el avance."""
+        self.metrics.add_stage("load", rows, seconds)
+        with self._lock:
+            self.record_count += rows
+            self.stats["load_rows"] = self.record_count
+            self.stats["load_seconds"] += seconds
+            # Se publica dentro del lock para que el avance reportado nunca retroceda
+            self.task_repository.set_task_status(self.task_id, "in process", self._detail())
+
+    def add_rejected(self, rows: int) -> int:
+        """Suma filas rechazadas (dead letter) y retorna el total de la tarea."""
+        with self._lock:
+            self.rejected_count += rows
+            return self.rejected_count
+
+    def partition_done(self) -> None:
+        with self._lock:
+            self.partitions_done += 1
+            self.task_repository.set_task_status(self.task_id, "in process", self._detail())
+
+    def detail(self) -> dict:
+        with self._lock:
+            return self._detail()
+
+    def _detail(self) -> dict:
+        detail = {
+            "idtask": self.task_id, "record_process": self.record_count, "record_rejected": self.rejected_count,
+            **throughput_detail(self.stats),
+        }
+        if self.partitions_total > 1:
+            detail["partitions_done"] = self.partitions_done
+            detail["partitions_total"] = self.partitions_total
+        detail["metrics"] = self.metrics.detail()
+        if self.pipeline_stats is not None:
+            detail["pipeline"] = self.pipeline_stats.detail()
+        if self.dedup is not None:
+            detail["dedup"] = self.dedup.detail()
+        if self.extraction_plan is not None:
+            detail["extraction_plan"] = self.extraction_plan
+        return detail
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import threading
+
+import aiohttp
+
+### Cliente de la API de reglas de negocio (/lm/ml/score/) y scoring por grupos de ventanas. ###
+
+RULES_MODE_FINAL = "final"
+RULES_MODE_WINDOWS = "windows"
+RULES_MODES = (RULES_MODE_FINAL, RULES_MODE_WINDOWS)
+
+
+def rules_api_url() -> str:
+    # Obtener IP y puerto desde variables de entorno, con valores por defecto
+    api_ip = os.getenv('DB_ML_HOST', '192.168.150.84')
+    api_port = os.getenv('API_ML_PORT', '9000')
+    return f'http://{api_ip}:{api_port}/lm/ml/score/'
+
+
+class RulesClient:
+    """Llama a la API de reglas desde un event loop propio, con una unica sesion aiohttp compartida.
+
+    - concurrency: llamadas simultaneas como maximo (semaforo y tamaño del pool de conexiones).
+    - max_retries: reintentos ante errores de conexion, timeout, 429 o 5xx, con espera
+      backoff_seconds * 2 ** intento entre cada uno. Otros status no se reintentan.
+
+    submit() es seguro desde cualquier hilo y retorna un concurrent.futures.Future con True si la
+    API respondio 200. Los errores se registran en el log y no se propagan, igual que antes.
+    """
+
+    def __init__(self, api_url: str = None, concurrency: int = 2, max_retries: int = 3,
+                 backoff_seconds: float = 1.0, timeout_seconds: float = 300):
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def submit(self, fecha_inicio: str, fecha_fin: str, task_id: str, metrics=None):
+        return asyncio.run_coroutine_threadsafe(self.score(fecha_inicio, fecha_fin, task_id, metrics), self._get_loop())
+
+    async def score(self, fecha_inicio: str, fecha_fin: str, task_id: str, metrics=None) -> bool:
+        session = self._get_session()
+        api_url = self.api_url or rules_api_url()
+        payload = {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    async with session.post(api_url, json=payload, headers={'Content-Type': 'application/json'}) as response:
+                        if response.status == 200:
+                            logging.info(f"API retorno API de ejecucion de regla de negocio exitoso task_id {task_id} "
+                                         f"({fecha_inicio} - {fecha_fin}): {await response.text()}")
+                            return True
+                        error = f"Status {response.status}"
+                        if response.status != 429 and response.status < 500:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt == self.max_retries:
+                break
+            if metrics is not None:
+                metrics.add_retry("rules_api")
+            logging.info(f"Reintento {attempt + 1} de API de ejecucion de regla de negocio task_id {task_id}: {error}")
+            await asyncio.sleep(self.backoff_seconds * 2 ** attempt)
+        logging.error(f"API llamada API de ejecucion de regla de negocio fallida task_id {task_id} "
+                      f"({fecha_inicio} - {fecha_fin}): {error}")
+        return False
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread, self._loop, self._thread = self._loop, self._thread, None, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="etl_rules", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Solo se llama dentro del loop del cliente, no requiere lock
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            )
+        return self._session
+
+
+class WindowScorer:
+    """Dispara el scoring de una tarea a medida que sus ventanas quedan confirmadas en ml.*.
+
+    Las ventanas llegan desordenadas cuando hay varios workers; se agrupan en tramos contiguos y
+    cada windows_per_call ventanas contiguas se envia una llamada con ese rango. flush() envia
+    los tramos restantes y wait() espera todas las llamadas.
+    """
+
+    def __init__(self, client: RulesClient, task_id: str, windows_per_call: int, metrics=None):
+        self.client = client
+        self.task_id = task_id
+        self.windows_per_call = max(1, windows_per_call)
+        self.metrics = metrics
+        self._pending = []
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def add_windows(self, windows) -> None:
+        with self._lock:
+            self._pending.extend((start, end) for start, end, *_ in windows)
+            self._pending.sort()
+            self._submit_runs(only_full=True)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._submit_runs(only_full=False)
+
+    def wait(self) -> dict:
+        """Espera las llamadas enviadas y retorna cuantas resultaron exitosas o fallidas."""
+        with self._lock:
+            futures = list(self._futures)
+        results = [future.result() for future in futures]
+        return {"calls": len(results), "ok": sum(results), "failed": len(results) - sum(results)}
+
+    def _submit_runs(self, only_full: bool) -> None:
+        remaining = []
+        for run in _contiguous_runs(self._pending):
+            while len(run) >= self.windows_per_call or (run and not only_full):
+                chunk, run = run[:self.windows_per_call], run[self.windows_per_call:]
+                self._submit(chunk[0][0], chunk[-1][1])
+            remaining.extend(run)
+        self._pending = remaining
+
+    def _submit(self, start, end) -> None:
+        self._futures.append(self.client.submit(
+            f"{start:%Y-%m-%d %H:%M:%S}", f"{end:%Y-%m-%d %H:%M:%S}", self.task_id, self.metrics
+        ))
+
+
+def _contiguous_runs(windows: list) -> list:
+    runs = []
+    for window in windows:
+        if runs and runs[-1][-1][1] == window[0]:
+            runs[-1].append(window)
+        else:
+            runs.append([window])
+    return runs
@@ -1,185 +1,394 @@
 import hashlib
+import io
+import uuid
 import time
 import json
+import tempfile
 import threading
 import os
-import csv
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 import psycopg2
 from sqlalchemy import text
-from app.core.ports.etl import TaskRepository
+from app.core.ports.etl import CheckpointRepository, DeadLetterRepository, TaskRepository
+from app.core.ports.adapters import ACTIVE_STATUSES, FileCheckpointRepository, FileDeadLetterRepository
 from app.models.request_models import ETLRequest
 
-from app.core.database import SessionML, get_db_ETL_connection
+from app.core.database import SessionML, engine, get_db_ETL_connection
+from app.core.etl_loader import LicenciasBulkLoader, StagingMerger
+from app.core.etl_config import LOAD_MODE_BATCH, LOAD_MODE_ROW, LOAD_MODE_STAGING, EtlConfig
+from app.core.etl_dedup import DEDUP_BLOOM, DEDUP_LRU, TaskDedup, build_dedup_filter
+from app.core.etl_jobs import EtlJobQueue, TaskCancelled
+from app.core.etl_extract import PreparedExtraction
+from app.core import etl_columnar, etl_deadletter, etl_passthrough
+from app.core.etl_dimensions import DimensionCache, normalizar_especialidad, normalizar_profesionalidad
+from app.core.etl_metrics import (
+    EtlMetrics, MetricsReporter, bind_metrics, current_metrics, instrument_engine, setup_queue_logging,
+)
+from app.core.etl_pipeline import Batch, EtlPipeline, PipelineStats, WindowDone
+from app.core.etl_rules import RULES_MODE_WINDOWS, RulesClient, WindowScorer
+from app.core.etl_progress import EtlProgress, hourly_windows, split_partitions, throughput_detail, window_covered
+from app.core.etl_windows import adaptive_windows, probe_hour_counts
+from app.core.etl_snapshot import SnapshotWriter, snapshot_base_path
+from app.core.result_cache import ResultCache, result_cache as api_result_cache
 from sqlalchemy.exc import IntegrityError
+from psycopg2.extras import execute_values
 
 import logging
 import asyncio
-import aiohttp
 
 ### lógica principal del ETL, incluyendo la generación del hash y la ejecución asíncrona de la tarea. ###
 
+# Modos y limites del ETL, leidos una vez de las variables ETL_*; cada ETLService puede recibir otra
+etl_config = EtlConfig.from_env()
+
+# Las conexiones a la base ML cuentan sus sentencias en las metricas de la tarea del hilo
+instrument_engine(engine)
+
+# Cola compartida por todas las instancias del servicio del proceso (API y cron)
+default_job_queue = EtlJobQueue(etl_config.max_concurrent_tasks)
+
+# Cliente de la API de reglas compartido por todas las instancias del servicio del proceso: un solo
+# event loop y una sola sesion HTTP, que se cierran al detener la aplicacion
+default_rules_client = RulesClient(
+    concurrency=etl_config.rules_concurrency, max_retries=etl_config.rules_max_retries,
+    backoff_seconds=etl_config.rules_backoff_seconds, timeout_seconds=etl_config.rules_timeout_seconds,
+)
+
+# Query de extraccion con segmentación por hora/minuto. El orden es explicito: la primera aparicion de
+# un id_lic repetido es la que se carga, y sin ORDER BY dependeria del plan (cursor, COPY o sentencia preparada)
+EXTRACTION_QUERY = """
+SELECT
+    lic.id_lic,
+    com.marca_otorgamiento,
+    lic.operador,
+    lic.ccaf,
+    lic.entidad_pagadora,
+    lic.folio,
+    lic.fecha_emision,
+    lic.empleador_adscrito,
+    lic.codigo_interno_prestador,
+    lic.comuna_prestador,
+    lic.fecha_ultimo_estado,
+    lic.ultimo_estado,
+    lic.rut_trabajador,
+    lic.sexo_trabajador,
+    lic.edad_trabajador,
+    lic.tipo_reposo,
+    lic.dias_reposo,
+    lic.fecha_inicio_reposo,
+    lic.comuna_reposo,
+    lic.tipo_licencia,
+    lic.rut_medico,
+    lic.especialidad_profesional,
+    lic.tipo_profesional,
+    lic.zbtipo_licencia_entidad AS tipo_licencia_pronunciamiento,
+    lic.zbcodigo_continuacion AS codigo_continuacion_pronunciamiento,
+    lic.zbdias_autorizados AS dias_autorizados_pronunciamiento,
+    lic.zbcodigo_diagnostico AS codigo_diagnostico_pronunciamiento,
+    lic.zbcodigo_autorizacion AS codigo_autorizacion_pronunciamiento,
+    lic.zbcausa_rechazo AS causa_rechazo_pronunciamiento,
+    lic.zbtipo_reposo AS tipo_reposo_pronunciamiento,
+    lic.zbderecho_a_subsidio AS derecho_a_subsidio_pronunciamiento,
+    lic.rut_empleador,
+    lic.calidad_trabajador,
+    lic.actividad_laboral_trabajador,
+    lic.ocupacion,
+    lic.entidad_pagadora2 AS entidad_pagadora_zona_c,
+    lic.fecha_recepcion_empleador,
+    lic.regimen_previsional,
+    lic.entidad_pagadora_subsidio,
+    lic.comuna_laboral,
+    lic.comuna_uso_compin,
+    lic.cantidad_de_pronunciamientos,
+    lic.cantidad_de_zonas_d,
+    lic.secuencia_estados,
+    lic.cod_diagnostico_principal,
+    lic.cod_diagnostico_secundario,
+    lic.periodo
+FROM lme.sabana_fiscalizador_lme lic
+LEFT JOIN lme.sabana_complementaria com
+    ON lic.folio = com.folio AND lic.rut_trabajador = com.rut_trabajador
+WHERE lic.fecha_emision BETWEEN %(start_time)s AND %(end_time)s
+ORDER BY lic.fecha_emision, lic.ctid, com.ctid
+"""
+
+# Extraccion directa: mismas columnas con empleador_adscrito ya transformado
+PASSTHROUGH_QUERY = etl_passthrough.passthrough_query(EXTRACTION_QUERY)
+
 def generate_task_id(etl_request: ETLRequest) -> str:    
-    data_str = json.dumps(etl_request.dict(), sort_keys=True)
+    # La prioridad solo ordena la cola, el mismo rango con otra prioridad es la misma tarea
+    data_str = json.dumps(etl_request.dict(exclude={"priority"}), sort_keys=True)
     hash_input = f"{data_str}"
     return hashlib.sha256(hash_input.encode()).hexdigest()
 
+class PartitionLoader:
+    """Carga los bloques transformados de una particion y registra el checkpoint de cada ventana.
+
+    En modo fila carga cada bloque apenas llega; en modo lote y staging acumula hasta batch_size filas. Una
+    ventana (WindowDone) queda con checkpoint cuando no quedan filas suyas sin confirmar. Con carga
+    columnar los bloques pendientes son RecordBatch de pyarrow en vez de dicts. Las filas que fallan
+    se aislan con ETLService.load_isolating y no cuentan como cargadas.
+    """
+
+    def __init__(self, service: "ETLService", task_id: str, progress: EtlProgress, dedup: TaskDedup):
+        self.service = service
+        self.task_id = task_id
+        self.progress = progress
+        self.dedup = dedup
+        self.pending_rows = []
+        self.pending_count = 0
+        # Ventanas leidas completas cuyas filas pueden estar aun en pending_rows
+        self.fetched_windows = []
+
+    def load(self, item) -> None:
+        if isinstance(item, WindowDone):
+            self.fetched_windows.append(tuple(item))
+            if not self.pending_rows:
+                self.service.checkpoint_windows(self.task_id, self.fetched_windows)
+            return
+
+        load_start = time.perf_counter()
+        if self.service.config.load_mode == LOAD_MODE_ROW:
+            rejected = 0
+            for sabana_fiscalizador_lme_row in item.rows:
+                rejected += self.service.load_isolating(self.task_id, [sabana_fiscalizador_lme_row], self.upload, self.progress)
+            self.progress.add_loaded(len(item.rows) - rejected, time.perf_counter() - load_start)
+            return
+
+        if self.service.config.columnar:
+            self.pending_rows.append(item.rows)
+            self.pending_count += item.rows.num_rows
+        else:
+            self.pending_rows.extend(item.rows)
+            self.pending_count = len(self.pending_rows)
+        if self.pending_count < self.service.config.batch_size:
+            # En modo lote el avance se registra cuando el lote queda confirmado
+            self.progress.add_load_time(time.perf_counter() - load_start)
+            return
+        self.flush(load_start)
+
+    def flush(self, load_start: float = None) -> None:
+        """Confirma las filas pendientes y el checkpoint de las ventanas que cubren."""
+        if not self.pending_rows:
+            return
+        load_start = load_start or time.perf_counter()
+        if self.service.config.columnar:
+            # Una tabla se puede dividir igual que una lista si hay que aislar filas con error
+            rejected = self.service.load_isolating(
+                self.task_id, etl_columnar.concat_batches(self.pending_rows), self.upload, self.progress,
+                records=lambda table: table.to_pylist(),
+            )
+        else:
+            rejected = self.service.load_isolating(self.task_id, self.pending_rows, self.upload, self.progress)
+        loaded = self.pending_count - rejected
+        self.pending_rows = []
+        self.pending_count = 0
+        self.service.checkpoint_windows(self.task_id, self.fetched_windows)
+        self.progress.add_loaded(loaded, time.perf_counter() - load_start)
+
+    def upload(self, rows) -> None:
+        if self.service.config.columnar:
+            self.service.upload_columnar_to_lm(rows.to_batches(), self.dedup)
+        else:
+            self.service.upload_rows(rows, self.dedup)
+
+
 class ETLService:
     
-    def __init__(self, task_repository: TaskRepository, config_log: bool = False):
+    def __init__(self, task_repository: TaskRepository, config_log: bool = False, config: EtlConfig = None,
+                 checkpoint_repository: CheckpointRepository = None, job_queue: EtlJobQueue = None,
+                 dead_letter_repository: DeadLetterRepository = None, result_cache: ResultCache = None,
+                 rules_client: RulesClient = None):
+        # Modos de la instancia; por defecto los de las variables ETL_* (etl_config)
+        self.config = config or etl_config
+        if self.config.columnar:
+            etl_columnar.require_pyarrow()
         self.task_repository = task_repository
-        self.__id_licencias = set() 
-        self.__medicos = set()
-        self.__especialidades = set()
+        self.job_queue = job_queue or default_job_queue
+        # Cancelaciones que otro worker recibio para tareas de este proceso
+        self.task_repository.set_cancel_listener(self.cancel_local_task)
+        self.checkpoint_repository = checkpoint_repository or FileCheckpointRepository(self.config.checkpoint_dir)
+        self.dead_letters = dead_letter_repository or FileDeadLetterRepository(self.config.dead_letter_dir)
+        # Resultados de la API que se descartan cuando una tarea cambia ml.*
+        self.result_cache = result_cache or api_result_cache
+        self.extraction = PreparedExtraction(EXTRACTION_QUERY)
+        self.bulk_loader = LicenciasBulkLoader(self.config.load_method)
+        self.staging_merger = StagingMerger(delta=self.config.delta)
+        self.especialidades = DimensionCache(
+            "ml.especialidad_profesional", "id_especialidad_profesional", "descripcion_especialidad_profesional"
+        )
+        self.profesionalidades = DimensionCache(
+            "ml.profesionalidad", "id_profesionalidad", "descripcion_profesionalidad"
+        )
+        self.rules_client = rules_client or default_rules_client
+        # Scorer por ventanas de cada tarea en curso (solo en modo windows)
+        self._scorers = {}
         # Configurar logging
         if not config_log:
-            logging.basicConfig(
-                level=logging.INFO,
-                format='%(asctime)s - %(levelname)s - %(message)s',
-                filename=task_repository._get_log_file(),  
-                filemode='a' 
-            )
+            # Los workers solo encolan los registros, un QueueListener los escribe en el archivo
+            setup_queue_logging(task_repository._get_log_file())
                 
     def start_etl_task(self, etl_request: ETLRequest) -> dict:
         task_id = generate_task_id(etl_request)
         current_status = self.task_repository.get_task_status(task_id)
+        if current_status and not self.is_abandoned(task_id, current_status):
+            return self.queued_status(task_id, current_status)
+
         if current_status:
-            return current_status
-        
-        self.task_repository.set_task_status(task_id, "initial", {"idtask": task_id})
+            # El proceso que la ejecutaba se cayo: se reanuda desde sus checkpoints o se vuelve a iniciar
+            resumed = self.resume_etl_task(task_id)
+            if resumed is not None:
+                return resumed
+            created = self.task_repository.take_over_task(task_id, "queued", {"idtask": task_id})
+        else:
+            # Atomico en los repositorios compartidos: si otro worker la creo primero se retorna su estado
+            created = self.task_repository.create_task_if_absent(task_id, "queued", {"idtask": task_id})
+        if not created:
+            return self.task_repository.get_task_status(task_id)
+        self.checkpoint_repository.start_task(task_id, etl_request.dict())
+        self.dead_letters.clear(task_id)
 
-        thread = threading.Thread(target=self.run_etl_task, args=(etl_request, task_id))
-        thread.start()
-        
-        return {"Status": "initial", "detail": {"idtask": task_id}}
+        return self.enqueue_task(etl_request, task_id, {"idtask": task_id})
+
+    def resume_etl_task(self, task_id: str) -> dict:
+        """Reanuda una tarea desde la primera ventana sin checkpoint. Retorna None si no hay checkpoints.
+
+        Una tarea activa solo se reanuda si quedo abandonada (su proceso dejo de renovar el lease).
+        """
+        current_status = self.task_repository.get_task_status(task_id)
+        # Tambien si sigue en la cola de este proceso, por ejemplo una cancelacion que aun no se detiene
+        if (current_status and (current_status["Status"] in ACTIVE_STATUSES or self.job_queue.position(task_id) is not None)
+                and not self.is_abandoned(task_id, current_status)):
+            return self.queued_status(task_id, current_status)
+
+        request = self.checkpoint_repository.get_request(task_id)
+        if request is None:
+            return None
+        etl_request = ETLRequest(**request)
+
+        # Atomico en los repositorios compartidos: si otro worker la tomo primero se retorna su estado
+        if not self.task_repository.take_over_task(task_id, "queued", {"idtask": task_id, "resumed": True}):
+            return self.task_repository.get_task_status(task_id)
+
+        return self.enqueue_task(etl_request, task_id, {"idtask": task_id, "resumed": True}, resume=True)
+
+    def is_abandoned(self, task_id: str, current_status: dict) -> bool:
+        """Tarea activa en el repositorio que no esta en la cola de este proceso y cuyo lease expiro."""
+        return (current_status["Status"] in ACTIVE_STATUSES and self.job_queue.position(task_id) is None
+                and self.task_repository.is_abandoned(task_id))
+
+    def cancel_etl_task(self, task_id: str) -> dict:
+        """Cancela una tarea en cola o en ejecucion. Retorna None si no esta activa.
+
+        Si la tarea es de otro proceso se marca en el repositorio compartido y el heartbeat de ese
+        proceso la cancela con cancel_local_task.
+        """
+        result = self.cancel_local_task(task_id)
+        if result is None and self.task_repository.request_cancel(task_id):
+            return {"Status": "cancelling", "detail": {"idtask": task_id}}
+        return result
+
+    def cancel_local_task(self, task_id: str) -> dict:
+        """Cancela una tarea en cola o en ejecucion en este proceso. Retorna None si no la tiene.
+
+        Una tarea en ejecucion se detiene entre lotes: lo ya confirmado queda con checkpoint y la
+        tarea termina en "cancelled", reanudable con resume_etl_task.
+        """
+        where = self.job_queue.cancel(task_id)
+        if where is None:
+            return None
+        if where == "queued":
+            detail = {"idtask": task_id, "resumable": True}
+            self.task_repository.set_task_status(task_id, "cancelled", detail)
+            return {"Status": "cancelled", "detail": detail}
+        return {"Status": "cancelling", "detail": {"idtask": task_id}}
+
+    def enqueue_task(self, etl_request: ETLRequest, task_id: str, detail: dict, resume: bool = False) -> dict:
+        """Envia la tarea a la cola; retorna "initial" si empezo de inmediato o "queued" con su posicion."""
+        position = self.job_queue.submit(
+            task_id, self.run_queued_task, (etl_request, task_id, dict(detail), resume), etl_request.priority
+        )
+        if position == 0:
+            return {"Status": "initial", "detail": detail}
+        return {"Status": "queued", "detail": {**detail, "position": position}}
+
+    def queued_status(self, task_id: str, current_status: dict) -> dict:
+        """Agrega la posicion actual en la cola al estado de una tarea "queued"."""
+        if current_status["Status"] == "queued":
+            position = self.job_queue.position(task_id)
+            if position:
+                return {"Status": "queued", "detail": {**current_status["detail"], "position": position}}
+        return current_status
+
+    def run_queued_task(self, etl_request: ETLRequest, task_id: str, detail: dict, resume: bool,
+                        cancel_event: threading.Event) -> None:
+        self.task_repository.set_task_status(task_id, "initial", detail)
+        self.run_etl_task(etl_request, task_id, resume, cancel_event)
 
     async def execute_rn_api_call(self, start_date: str, end_date: str, task_id: str) -> None:
         try:
-            # Obtener IP y puerto desde variables de entorno, con valores por defecto
-            api_ip = os.getenv('DB_ML_HOST', '192.168.150.84')
-            api_port = os.getenv('API_ML_PORT', '9000')
-            api_url = f'http://{api_ip}:{api_port}/lm/ml/score/'
-            
-            payload = {
-                "fecha_inicio": start_date,
-                "fecha_fin": end_date
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(api_url, json=payload, headers={'Content-Type': 'application/json'}) as response:
-                    if response.status == 200:
-                        logging.info(f"API retorno API de ejecucion de regla de negocio exitoso task_id {task_id}: {await response.text()}")
-                    else:
-                        logging.error(f"API llamada API de ejecucion de regla de negocio fallida sk_id {task_id}: Status {response.status}")
+            await asyncio.wrap_future(self.rules_client.submit(start_date, end_date, task_id))
         except Exception as e:
             logging.error(f"Error al llamar API de ejecucion de regla de negocio task_id {task_id}: {str(e)}")
 
-    def run_etl_task(self, etl_request: ETLRequest, task_id: str) -> None:
+    def run_etl_task(self, etl_request: ETLRequest, task_id: str, resume: bool = False,
+                     cancel_event: threading.Event = None) -> None:
+        # Deduplicacion de la tarea: se libera al terminar, el servicio no acumula claves entre tareas
+        dedup = self.new_task_dedup()
+        progress = EtlProgress(self.task_repository, task_id,
+                               pipeline_stats=PipelineStats() if self.config.pipeline else None, dedup=dedup)
+        reporter = MetricsReporter(task_id, progress.metrics, self.config.metrics_log_interval).start()
         try:
-            self.task_repository.set_task_status(task_id, "in process", {"idtask": task_id, "record_process": 0})            
-            conn = get_db_ETL_connection()
-            cursor = conn.cursor()
+            with bind_metrics(progress.metrics):
+                self.execute_etl_task(etl_request, task_id, progress, dedup, resume, cancel_event)
+        finally:
+            reporter.stop()
+
+    def execute_etl_task(self, etl_request: ETLRequest, task_id: str, progress: EtlProgress, dedup: TaskDedup,
+                         resume: bool = False, cancel_event: threading.Event = None) -> None:
+        try:
+            # Al reanudar se omiten las ventanas con checkpoint y el conteo parte desde lo ya cargado
+            completed_windows = self.checkpoint_repository.get_completed_windows(task_id) if resume else []
+            progress.record_count = sum(record_count for _, _, record_count in completed_windows)
+            if resume:
+                progress.rejected_count = len(self.dead_letters.get_rows(task_id))
+            self.task_repository.set_task_status(task_id, "in process", {"idtask": task_id, "record_process": progress.record_count})            
+            self.load_dimensions()
+            if self.config.load_mode == LOAD_MODE_STAGING:
+                self.prepare_staging()
             current_time_str = datetime.now().strftime("%Y%m%d_%H%M")
             output_dir = os.path.join(os.getcwd(), "etl", current_time_str)
             os.makedirs(output_dir, exist_ok=True)
 
-            csv_file_path = os.path.join(output_dir, f"registros_{task_id}.csv")            
-            
-            # Definir la query base con segmentación por hora/minuto
-            base_query = """
-            SELECT 
-                lic.id_lic,
-                com.marca_otorgamiento,
-                lic.operador,
-                lic.ccaf,
-                lic.entidad_pagadora,
-                lic.folio,
-                lic.fecha_emision,
-                lic.empleador_adscrito,
-                lic.codigo_interno_prestador,
-                lic.comuna_prestador,
-                lic.fecha_ultimo_estado,
-                lic.ultimo_estado,
-                lic.rut_trabajador,
-                lic.sexo_trabajador,
-                lic.edad_trabajador,
-                lic.tipo_reposo,
-                lic.dias_reposo,
-                lic.fecha_inicio_reposo,
-                lic.comuna_reposo,
-                lic.tipo_licencia,
-                lic.rut_medico,
-                lic.especialidad_profesional,
-                lic.tipo_profesional,
-                lic.zbtipo_licencia_entidad AS tipo_licencia_pronunciamiento,
-                lic.zbcodigo_continuacion AS codigo_continuacion_pronunciamiento,
-                lic.zbdias_autorizados AS dias_autorizados_pronunciamiento,
-                lic.zbcodigo_diagnostico AS codigo_diagnostico_pronunciamiento,
-                lic.zbcodigo_autorizacion AS codigo_autorizacion_pronunciamiento,
-                lic.zbcausa_rechazo AS causa_rechazo_pronunciamiento,
-                lic.zbtipo_reposo AS tipo_reposo_pronunciamiento,
-                lic.zbderecho_a_subsidio AS derecho_a_subsidio_pronunciamiento,
-                lic.rut_empleador,
-                lic.calidad_trabajador,
-                lic.actividad_laboral_trabajador,
-                lic.ocupacion,
-                lic.entidad_pagadora2 AS entidad_pagadora_zona_c,
-                lic.fecha_recepcion_empleador,
-                lic.regimen_previsional,
-                lic.entidad_pagadora_subsidio,
-                lic.comuna_laboral,
-                lic.comuna_uso_compin,
-                lic.cantidad_de_pronunciamientos,
-                lic.cantidad_de_zonas_d,
-                lic.secuencia_estados,
-                lic.cod_diagnostico_principal,
-                lic.cod_diagnostico_secundario,
-                lic.periodo
-            FROM lme.sabana_fiscalizador_lme lic
-            LEFT JOIN lme.sabana_complementaria com
-                ON lic.folio = com.folio AND lic.rut_trabajador = com.rut_trabajador
-            WHERE lic.fecha_emision BETWEEN '{start_time}' AND '{end_time}';
-            """
+            # El archivo queda abierto durante toda la tarea y se cierra en el finally
+            snapshot = SnapshotWriter(
+                snapshot_base_path(output_dir, task_id), self.config.snapshot_format, self.config.snapshot_row_group_size
+            )
            
             #Ajustar las fechas para incluir el rango completo del dia, en el caso que el ETL solo sea de un dia particular, tambien sirve.
             start_date = datetime.strptime(f"{etl_request.start_date} 00:00:00", '%Y-%m-%d %H:%M:%S')
             end_date = datetime.strptime(f"{etl_request.end_date} 23:59:59", '%Y-%m-%d %H:%M:%S')
-            
-            current_time = start_date
-            record_count = 0
-            header_written = False
-            
-            while current_time < end_date:
-                start_time = current_time
-                end_time = current_time + timedelta(hours=1)  
-                
-                query = base_query.format(start_time=start_time, end_time=end_time)                
-                cursor.execute(query)
-                column_names = [desc[0] for desc in cursor.description]
-                    
-                while True:
-                    rows = cursor.fetchmany(10) 
-                    if not rows:
-                        break
-                    
-                    for row in rows:
-                        sabana_fiscalizador_lme_row = dict(zip(column_names, row))          
-                        sabana_fiscalizador_lme_row['empleador_adscrito'] = 0 if sabana_fiscalizador_lme_row['empleador_adscrito'] == "No" else 1
-                        
-                        with open(csv_file_path, 'a', newline='', encoding='utf-8') as csvfile:
-                            writer = csv.DictWriter(csvfile, fieldnames=sabana_fiscalizador_lme_row.keys())
-                            if not header_written:
-                                writer.writeheader()
-                                header_written = True
-                            writer.writerow(sabana_fiscalizador_lme_row)
-                        
-                        self.upload_to_lm(sabana_fiscalizador_lme_row)
-                    record_count += len(rows)
-                    self.task_repository.set_task_status(task_id, "in process", {
-                        "idtask": task_id, "record_process": record_count
-                    })
-                
-                current_time = end_time
+
+            if self.config.workers > 1:
+                partitions = split_partitions(start_date, end_date, self.config.partition_hours)
+            else:
+                partitions = [(start_date, end_date)]
+            progress.partitions_total = len(partitions)
+            progress.extraction_plan = self.explain_extraction(task_id, start_date, progress)
+            if self.config.rules_mode == RULES_MODE_WINDOWS:
+                # Las ventanas de una corrida anterior se vuelven a enviar, no se sabe si alcanzaron a puntuarse
+                scorer = WindowScorer(self.rules_client, task_id, self.config.rules_windows, progress.metrics)
+                scorer.add_windows(completed_windows)
+                self._scorers[task_id] = scorer
+            self.run_partitions(task_id, partitions, snapshot, progress, completed_windows, dedup, cancel_event)
+            if cancel_event is not None and cancel_event.is_set():
+                raise TaskCancelled(task_id)
+            snapshot.close()
+
+            logging.info(f"Extraccion task_id {task_id}: {progress.stats['extract_rows']} filas, "
+                         f"throughput {throughput_detail(progress.stats)}")
+            record_count = progress.record_count
 
             # Se setea la ejecucion de Reglas
             self.task_repository.set_task_status(task_id, "execute_rn", {
@@ -187,63 +396,506 @@ class ETLService:
             })
             
             # API de ejecucion de REGLAS!
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.execute_rn_api_call(
-                etl_request.start_date, 
-                etl_request.end_date, 
-                task_id
-            ))
-            loop.close()
+            rules_detail = None
+            if task_id in self._scorers:
+                # Solo quedan pendientes los tramos que no alcanzaron config.rules_windows ventanas
+                scorer = self._scorers[task_id]
+                scorer.flush()
+                rules_detail = scorer.wait()
+            else:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(self.execute_rn_api_call(
+                    etl_request.start_date, 
+                    etl_request.end_date, 
+                    task_id
+                ))
+                loop.close()
 
             # Se notifica Fin de la Tarea
-            self.task_repository.set_task_status(task_id, "finish", {
-                "idtask": task_id, "record_process": record_count
-            })
+            detail = progress.detail()
+            if rules_detail is not None:
+                detail["rules"] = rules_detail
+            self.task_repository.set_task_status(task_id, "finish", detail)
+            self.checkpoint_repository.clear(task_id)
+            self.invalidate_result_cache(task_id)
         
+        except TaskCancelled:
+            logging.info(f"Tarea cancelada task_id {task_id}: {progress.record_count} registros confirmados")
+            self.task_repository.set_task_status(task_id, "cancelled", {
+                "idtask": task_id, "record_process": progress.record_count,
+                "record_rejected": progress.rejected_count, "resumable": True
+            })
         except Exception as e:
+            # Las ventanas con checkpoint se conservan, la tarea se puede reanudar con resume_etl_task
             self.task_repository.set_task_status(task_id, "error", {
-                "idtask": task_id, "record_process": record_count if 'record_count' in locals() else 0,
-                "id_error": 500, "message": str(e)
+                "idtask": task_id, "record_process": progress.record_count,
+                "record_rejected": progress.rejected_count, "id_error": 500, "message": str(e), "resumable": True
             })
         finally:
-            if 'conn' in locals() and conn:
+            self._scorers.pop(task_id, None)
+            if 'snapshot' in locals():
+                snapshot.close()
+
+    def run_partitions(self, task_id: str, partitions: list, snapshot: SnapshotWriter, progress: EtlProgress,
+                       completed_windows: list = (), dedup: TaskDedup = None,
+                       cancel_event: threading.Event = None) -> None:
+        """Procesa las particiones, en el hilo actual si hay una sola o con un pool acotado de workers.
+
+        Si una particion falla se detienen las demas entre lotes y se propaga el primer error. Al
+        cancelar la tarea (cancel_event) las particiones se detienen igual, sin confirmar lo pendiente.
+        """
+        stop_event = cancel_event or threading.Event()
+        dedup = dedup or self.new_task_dedup()
+        if len(partitions) == 1:
+            self.run_partition(task_id, partitions[0], snapshot, progress, stop_event, completed_windows, dedup)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix=f"etl_{task_id[:8]}") as executor:
+            futures = [
+                executor.submit(
+                    self.run_partition, task_id, partition, snapshot, progress, stop_event, completed_windows, dedup
+                )
+                for partition in partitions
+            ]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            errors = [future.exception() for future in done if future.exception() is not None]
+            if errors:
+                stop_event.set()
+                for future in not_done:
+                    future.cancel()
+                raise errors[0]
+
+    def run_partition(self, task_id: str, partition: tuple, snapshot: SnapshotWriter, progress: EtlProgress,
+                      stop_event: threading.Event, completed_windows: list = (), dedup: TaskDedup = None) -> None:
+        """Extrae y carga una particion ventana por ventana, con su propia conexion de origen.
+
+        Cada ventana queda con checkpoint cuando todas sus filas estan confirmadas en ml.*; en modo
+        lote eso ocurre al confirmar el lote que contiene su ultima fila. Con pipeline activo la
+        extraccion, transformacion y carga corren en hilos distintos unidos por colas acotadas. Con
+        window_target_rows las ventanas de una hora pendientes se redimensionan segun un COUNT por hora.
+        """
+        partition_start, partition_end = partition
+        windows = [
+            (start_time, end_time) for start_time, end_time in hourly_windows(partition_start, partition_end)
+            if not window_covered(start_time, end_time, completed_windows)
+        ]
+        if not windows:
+            progress.partition_done()
+            return
+        conn = get_db_ETL_connection()
+        # Las sentencias de este worker contra la base ML se cuentan en las metricas de la tarea
+        with bind_metrics(progress.metrics):
+            try:
+                if self.config.extract_prepared:
+                    self.extraction.prepare(conn)
+                    progress.metrics.add_round_trips("source")
+                if self.config.window_target_rows > 0:
+                    hour_counts = probe_hour_counts(conn, windows[0][0], windows[-1][1])
+                    progress.metrics.add_round_trips("source", 2)
+                    windows = adaptive_windows(windows, hour_counts, self.config.window_target_rows)
+                loader = PartitionLoader(self, task_id, progress, dedup or self.new_task_dedup())
+                if self.config.passthrough:
+                    self.run_windows_passthrough(conn, task_id, partition_start, windows, snapshot, progress,
+                                                 stop_event, loader)
+                    if not stop_event.is_set():
+                        progress.partition_done()
+                    return
+                batches = self.extract_windows(conn, task_id, partition_start, windows, progress, stop_event)
+                if self.config.pipeline:
+                    EtlPipeline(self.config.pipeline_queue_size, progress.pipeline_stats).run(
+                        batches, lambda batch: self.transform_batch(batch, snapshot, progress.metrics), loader.load
+                    )
+                else:
+                    for item in batches:
+                        if not isinstance(item, WindowDone):
+                            item = self.transform_batch(item, snapshot, progress.metrics)
+                        loader.load(item)
+                if stop_event.is_set():
+                    return
+                # Ultimo lote parcial de la particion
+                flush_start = time.perf_counter()
+                loader.flush()
+                if progress.pipeline_stats is not None:
+                    progress.pipeline_stats.add("load", 0, time.perf_counter() - flush_start)
+                progress.partition_done()
+            finally:
                 conn.close()
 
-    def create_especialidad(self, sabana_fiscalizador_lme_row):      
-        session_especialidad = SessionML()
-        
-        try:
-            # Manejar especialidad_profesional_medicos VALIDANDO REPLICAS
-            especialidad = sabana_fiscalizador_lme_row['especialidad_profesional']
-            if especialidad is None or especialidad == '-':
-                esp_descripcion = 'No informada'
+    def extract_windows(self, conn, task_id: str, partition_start, windows: list, progress: EtlProgress,
+                        stop_event: threading.Event):
+        """Genera las filas de cada ventana en bloques de fetch_size (Batch) y un WindowDone al cerrar cada una."""
+        for window, (start_time, end_time) in enumerate(windows):
+            if stop_event.is_set():
+                return
+            window_rows = 0
+            window_start = time.perf_counter()
+            if self.config.extract_prepared:
+                # EXECUTE de la sentencia preparada; los fetchmany leen del buffer del cliente
+                cursor = conn.cursor()
+                if self.config.columnar:
+                    etl_columnar.register_numeric_as_text(cursor)
+                execute_start = time.perf_counter()
+                self.extraction.execute(cursor, start_time, end_time)
+                progress.add_extract(0, time.perf_counter() - execute_start)
+                progress.metrics.add_round_trips("source")
             else:
-                esp_descripcion = especialidad
-            esp_descripcion = esp_descripcion.title()
+                # Cursor con nombre = cursor de servidor, la ventana se trae de a fetch_size filas
+                cursor = conn.cursor(name=f"etl_{task_id[:16]}_{partition_start:%Y%m%d%H}_{window}")
+                cursor.itersize = self.config.fetch_size
+                if self.config.columnar:
+                    etl_columnar.register_numeric_as_text(cursor)
+                cursor.execute(EXTRACTION_QUERY, {"start_time": start_time, "end_time": end_time})
+            column_names = None
+                
+            while True:
+                if stop_event.is_set():
+                    # Ventana incompleta: queda sin checkpoint y se vuelve a leer al reanudar
+                    cursor.close()
+                    return
+                fetch_start = time.perf_counter()
+                rows = cursor.fetchmany(self.config.fetch_size) 
+                progress.add_extract(len(rows), time.perf_counter() - fetch_start)
+                if not self.config.extract_prepared:
+                    progress.metrics.add_round_trips("source")
+                if not rows:
+                    break
+                window_rows += len(rows)
+                if column_names is None:
+                    column_names = [desc[0] for desc in cursor.description]
+                    numeric_columns = etl_columnar.numeric_columns(cursor.description) if self.config.columnar else ()
+                yield Batch(rows, column_names, numeric_columns)
+            
+            cursor.close()
+            # Cierra la transaccion de lectura de la ventana en el origen
+            conn.commit()
+            # DECLARE, CLOSE y COMMIT (o solo COMMIT con sentencia preparada); los FETCH se cuentan arriba
+            progress.metrics.add_round_trips("source", 1 if self.config.extract_prepared else 3)
+            progress.metrics.add_window(window_rows, time.perf_counter() - window_start)
+            yield WindowDone(start_time, end_time, window_rows)
 
-            # Buscar si la especialidad ya existe
-            result = session_especialidad.execute(text("""
-                SELECT id_especialidad_profesional FROM ml.especialidad_profesional
-                WHERE descripcion_especialidad_profesional = :esp_descripcion
-            """), {'esp_descripcion': esp_descripcion})
-            id_especialidad = result.scalar()
+    def run_windows_passthrough(self, conn, task_id: str, partition_start, windows: list, snapshot: SnapshotWriter,
+                                progress: EtlProgress, stop_event: threading.Event, loader: PartitionLoader) -> None:
+        """Carga las ventanas con extraccion directa (COPY origen -> base ML), una transaccion por ventana.
 
-            # Si no existe, insertarla
-            if id_especialidad is None:
-                session_especialidad.execute(text("""
-                    INSERT INTO ml.especialidad_profesional (descripcion_especialidad_profesional)
-                    VALUES (:esp_descripcion)
-                    RETURNING id_especialidad_profesional
-                """), {'esp_descripcion': esp_descripcion})
-                id_especialidad = session_especialidad.execute(text("""
-                    SELECT id_especialidad_profesional FROM ml.especialidad_profesional
-                    WHERE descripcion_especialidad_profesional = :esp_descripcion
-                """), {'esp_descripcion': esp_descripcion}).scalar()
+        Si una ventana falla por sus datos se vuelve a cargar por el camino normal (tuplas y lotes), que
+        aisla las filas con error en dead letter.
+        """
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM ({PASSTHROUGH_QUERY}) q LIMIT 0", {"start_time": None, "end_time": None})
+        columns = [desc[0] for desc in cursor.description]
+        cursor.close()
+        conn.commit()
+        progress.metrics.add_round_trips("source", 2)
+        for start_time, end_time in windows:
+            if stop_event.is_set():
+                return
+            window_start = time.perf_counter()
+            try:
+                window_rows = self.load_window_passthrough(conn, start_time, end_time, columns, snapshot, progress, loader.dedup)
+            except Exception as e:
+                conn.rollback()
+                if self.config.max_rejected_rows <= 0 or not etl_deadletter.is_row_error(e):
+                    raise
+                logging.warning(f"Extraccion directa fallida task_id {task_id} ventana {start_time} - {end_time}, "
+                                f"se carga por lotes para aislar las filas con error: {e}")
+                for item in self.extract_windows(conn, task_id, partition_start, [(start_time, end_time)], progress, stop_event):
+                    if not isinstance(item, WindowDone):
+                        item = self.transform_batch(item, snapshot, progress.metrics)
+                    loader.load(item)
+                if not stop_event.is_set():
+                    loader.flush()
+                continue
+            progress.metrics.add_window(window_rows, time.perf_counter() - window_start)
+            self.checkpoint_windows(task_id, [(start_time, end_time, window_rows)])
+            progress.add_loaded(window_rows, 0.0)
+
+    def load_window_passthrough(self, conn, start_time, end_time, columns: list, snapshot: SnapshotWriter,
+                                progress: EtlProgress, dedup: TaskDedup) -> int:
+        """Copia una ventana del origen a staging sin pasar las filas a Python y la carga en ml.*
+
+        El COPY TO STDOUT del origen corre en otro hilo y alimenta el COPY FROM STDIN de la tabla
+        temporal de la conexion ML (etl_passthrough.CopyStream). Solo vuelven a Python los valores
+        distintos de las dimensiones y los id_lic, para reclamarlos en la deduplicacion de la tarea. El
+        CSV de la ventana va al snapshot despues del commit. Retorna las filas de la ventana.
+        """
+        source_cursor = conn.cursor()
+        copy_sql = source_cursor.mogrify(
+            f"COPY ({PASSTHROUGH_QUERY}) TO STDOUT WITH (FORMAT csv)", {"start_time": start_time, "end_time": end_time}
+        ).decode()
+        spool = tempfile.SpooledTemporaryFile(max_size=self.config.passthrough_spool_bytes)
+        stream = etl_passthrough.CopyStream(tee=spool.write)
+        reclamadas = []
+        session = SessionML()
+        try:
+            cursor = session.connection().connection.cursor()
+            try:
+                etl_passthrough.ensure_temp_table(cursor)
+                copy_start = time.perf_counter()
+                producer = threading.Thread(target=stream.produce, args=(source_cursor, copy_sql), daemon=True)
+                producer.start()
+                try:
+                    window_rows = etl_passthrough.copy_window(cursor, columns, stream)
+                except BaseException:
+                    stream.abort()
+                    raise
+                finally:
+                    producer.join()
+                if stream.error is not None:
+                    raise stream.error
+                progress.add_extract(window_rows, time.perf_counter() - copy_start)
+
+                load_start = time.perf_counter()
+                especialidades, profesionalidades, ids = etl_passthrough.window_keys(cursor)
+                especialidades = {valor: normalizar_especialidad(valor) for valor in especialidades}
+                profesionalidades = {valor: normalizar_profesionalidad(valor) for valor in profesionalidades}
+                self.resolve_descriptions(set(especialidades.values()), set(profesionalidades.values()))
+                reclamadas = dedup.licencias.claim(ids)
+                lote = uuid.uuid4().hex
+                etl_passthrough.stage_window(
+                    cursor, lote,
+                    {valor: self.especialidades.get(descripcion) for valor, descripcion in especialidades.items()},
+                    {valor: self.profesionalidades.get(descripcion) for valor, descripcion in profesionalidades.items()},
+                    reclamadas,
+                )
+            finally:
+                cursor.close()
+            insertadas = self.staging_merger.merge_staged(session.connection().connection, lote)
+            session.commit()
+            dedup.licencias.confirm(reclamadas)
+            self.record_delta(insertadas)
+            progress.add_load_time(time.perf_counter() - load_start)
+            logging.info(f"Ventana {start_time} - {end_time} cargada via COPY directo: {window_rows} filas, "
+                         f"{stream.bytes} bytes, insertadas {insertadas}")
+        except Exception:
+            session.rollback()
+            dedup.licencias.release(reclamadas)
+            raise
+        finally:
+            session.close()
+            source_cursor.close()
+        # COPY y COMMIT en el origen
+        conn.commit()
+        progress.metrics.add_round_trips("source", 2)
+
+        spool.seek(0)
+        with io.TextIOWrapper(spool, encoding="utf-8", newline="") as text_spool:
+            snapshot.write_csv_text(columns, iter(lambda: text_spool.read(1024 * 1024), ""), window_rows)
+        return window_rows
+
+    def explain_extraction(self, task_id: str, start_time, progress: EtlProgress) -> dict:
+        """Captura el plan de la extraccion para la primera hora del rango y lo registra en el log.
+
+        Un error al obtener el plan solo se registra, no detiene la tarea.
+        """
+        try:
+            conn = get_db_ETL_connection()
+            try:
+                self.extraction.prepare(conn)
+                plan = self.extraction.explain(conn, start_time, start_time + timedelta(hours=1))
+                conn.rollback()
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.warning(f"No se pudo obtener el plan de extraccion task_id {task_id}: {str(e)}")
+            return None
+        progress.metrics.add_round_trips("source", 3)
+        log = logging.info if plan["uses_index"] else logging.warning
+        log(f"Plan de extraccion task_id {task_id}: {json.dumps(plan)}")
+        return plan
+
+    def transform_batch(self, batch: Batch, snapshot: SnapshotWriter, metrics: EtlMetrics = None) -> Batch:
+        """Convierte las filas de la sabana en dicts listos para ml.* y las escribe en el snapshot."""
+        if self.config.columnar:
+            return self.transform_record_batch(batch, snapshot, metrics)
+        transform_start = time.perf_counter()
+        sabana_rows = []
+        for row in batch.rows:
+            sabana_fiscalizador_lme_row = dict(zip(batch.columns, row))          
+            sabana_fiscalizador_lme_row['empleador_adscrito'] = 0 if sabana_fiscalizador_lme_row['empleador_adscrito'] == "No" else 1
+            sabana_rows.append(sabana_fiscalizador_lme_row)
+        snapshot_start = time.perf_counter()
+        snapshot.write_rows(sabana_rows)
+        if metrics is not None:
+            metrics.add_stage("transform", len(sabana_rows), snapshot_start - transform_start)
+            metrics.add_stage("snapshot", len(sabana_rows), time.perf_counter() - snapshot_start)
+        return Batch(sabana_rows)
+
+    def transform_record_batch(self, batch: Batch, snapshot: SnapshotWriter, metrics: EtlMetrics = None) -> Batch:
+        """Version columnar de transform_batch: el bloque sigue como un RecordBatch de pyarrow."""
+        transform_start = time.perf_counter()
+        record_batch = etl_columnar.transform_record_batch(
+            etl_columnar.record_batch_from_rows(batch.rows, batch.columns, batch.numeric_columns)
+        )
+        snapshot_start = time.perf_counter()
+        snapshot.write_batch(record_batch)
+        if metrics is not None:
+            metrics.add_stage("transform", record_batch.num_rows, snapshot_start - transform_start)
+            metrics.add_stage("snapshot", record_batch.num_rows, time.perf_counter() - snapshot_start)
+        return Batch(record_batch, batch.columns)
+
+    def checkpoint_windows(self, task_id: str, windows: list) -> None:
+        """Registra el checkpoint de las ventanas ya confirmadas y vacia la lista."""
+        for window_start, window_end, window_rows in windows:
+            self.checkpoint_repository.mark_window_done(task_id, window_start, window_end, window_rows)
+        scorer = self._scorers.get(task_id)
+        if scorer is not None:
+            scorer.add_windows(windows)
+        windows.clear()
+
+    def load_isolating(self, task_id: str, rows, load, progress: EtlProgress, records=list) -> int:
+        """Carga rows con load; las filas que fallan por sus datos quedan en dead letter y la tarea sigue.
+
+        El lote se divide en mitades hasta aislarlas (etl_deadletter.load_isolating). Retorna las filas
+        rechazadas; con max_rejected_rows en 0, o al superarlo, el error se propaga y la tarea termina en
+        error como antes.
+        """
+        if self.config.max_rejected_rows <= 0:
+            load(rows)
+            return 0
+
+        def reject(row: dict, error: Exception) -> None:
+            if progress.add_rejected(1) > self.config.max_rejected_rows:
+                raise RuntimeError(f"Se supero el maximo de {self.config.max_rejected_rows} filas rechazadas: {error}") from error
+            self.dead_letters.add(task_id, row, str(error))
+            logging.warning(f"Fila rechazada task_id {task_id} id_lic {row.get('id_lic')}: {error}")
+
+        return etl_deadletter.load_isolating(rows, load, reject, records)
 
+    def upload_rows(self, rows: list, dedup: TaskDedup) -> None:
+        """Carga filas ya transformadas (dicts) segun load_mode."""
+        if self.config.load_mode == LOAD_MODE_STAGING:
+            self.upload_staging_to_lm(rows, dedup)
+        elif self.config.load_mode == LOAD_MODE_BATCH:
+            self.upload_batch_to_lm(rows, dedup)
+        else:
+            for row in rows:
+                self.upload_to_lm(row, dedup)
+
+    def replay_dead_letters(self, task_id: str) -> dict:
+        """Vuelve a cargar solo las filas rechazadas de la tarea. Retorna None si no tiene.
+
+        Las filas se cargan como dicts segun load_mode (tambien con carga columnar) y las que vuelven
+        a fallar quedan en dead letter con su nuevo error. Si la tarea sigue registrada se actualizan
+        sus conteos.
+        """
+        current_status = self.task_repository.get_task_status(task_id)
+        if current_status and (current_status["Status"] in ACTIVE_STATUSES or self.job_queue.position(task_id) is not None):
+            raise ValueError(f"La tarea {task_id} esta en cola o en ejecucion")
+        rows = [row for row, _ in self.dead_letters.get_rows(task_id)]
+        if not rows:
+            return None
+
+        self.load_dimensions()
+        if self.config.load_mode == LOAD_MODE_STAGING:
+            self.prepare_staging()
+        dedup = self.new_task_dedup()
+        rejected = []
+        size = 1 if self.config.load_mode == LOAD_MODE_ROW else self.config.batch_size
+        for start in range(0, len(rows), size):
+            etl_deadletter.load_isolating(
+                rows[start:start + size], lambda chunk: self.upload_rows(chunk, dedup),
+                lambda row, error: rejected.append((row, str(error))),
+            )
+        self.dead_letters.replace(task_id, rejected)
+        loaded = len(rows) - len(rejected)
+        logging.info(f"Reproceso de dead letter task_id {task_id}: {loaded} filas cargadas, {len(rejected)} rechazadas")
+        if loaded:
+            self.invalidate_result_cache(task_id)
+
+        if current_status:
+            detail = current_status["detail"]
+            self.task_repository.set_task_status(task_id, current_status["Status"], {
+                **detail, "record_process": detail.get("record_process", 0) + loaded, "record_rejected": len(rejected)
+            })
+        return {"idtask": task_id, "replayed": len(rows), "loaded": loaded, "rejected": len(rejected)}
+
+    def invalidate_result_cache(self, task_id: str) -> None:
+        """Descarta la cache de resultados de la API; un error no cambia el estado de la tarea."""
+        try:
+            self.result_cache.invalidate()
+        except Exception as e:
+            logging.warning(f"No se pudo invalidar la cache de resultados tras task_id {task_id}: {e}")
+
+    def new_task_dedup(self) -> TaskDedup:
+        """Filtros de deduplicacion de una tarea, segun config.dedup_kind (exact, lru o bloom).
+
+        Con bloom solo los id_lic usan el filtro: los pares de medicos se repiten en casi todas las
+        filas y cada positivo costaria una consulta, por eso se acotan con un LRU.
+        """
+        medicos_kind = DEDUP_LRU if self.config.dedup_kind == DEDUP_BLOOM else self.config.dedup_kind
+        return TaskDedup(
+            build_dedup_filter(self.config.dedup_kind, self.config.dedup_lru_size, self.config.dedup_bloom_capacity,
+                               self.config.dedup_bloom_error_rate, self.licencias_existentes),
+            build_dedup_filter(medicos_kind, self.config.dedup_lru_size),
+        )
+
+    def licencias_existentes(self, ids_lic) -> set:
+        """id_lic que ya estan en ml.licencias, usado para confirmar los positivos del filtro de Bloom."""
+        session = SessionML()
+        try:
+            result = session.execute(text("""
+                SELECT id_lic FROM ml.licencias WHERE id_lic = ANY(CAST(:ids AS text[]))
+            """), {'ids': list(ids_lic)})
+            return {id_lic for id_lic, in result}
+        finally:
+            session.close()
+
+    def load_dimensions(self) -> None:
+        """Carga en memoria ml.especialidad_profesional y ml.profesionalidad al inicio de la tarea."""
+        session = SessionML()
+        try:
+            self.especialidades.load(session)
+            self.profesionalidades.load(session)
+        finally:
+            session.close()
+
+    def prepare_staging(self) -> None:
+        """Crea la tabla de staging antes de que los workers empiecen a cargar lotes."""
+        session = SessionML()
+        try:
+            self.staging_merger.ensure_table(session.connection().connection)
+            session.commit()
+        finally:
+            session.close()
+
+    def resolve_dimensions(self, rows) -> None:
+        """Inserta de una vez las especialidades y profesionalidades de las filas que no esten en cache."""
+        self.resolve_descriptions(
+            {normalizar_especialidad(row['especialidad_profesional']) for row in rows},
+            {normalizar_profesionalidad(row['tipo_profesional']) for row in rows},
+        )
+
+    def resolve_descriptions(self, especialidades: set, profesionalidades: set) -> None:
+        session = SessionML()
+        try:
+            ids_especialidad = self.especialidades.resolve(session, especialidades)
+            ids_profesionalidad = self.profesionalidades.resolve(session, profesionalidades)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logging.info(f"Error al crear o buscar dimensiones del lote: {e}")
+            raise
+        finally:
+            session.close()
+        self.especialidades.remember(ids_especialidad)
+        self.profesionalidades.remember(ids_profesionalidad)
+
+    def create_especialidad(self, sabana_fiscalizador_lme_row):      
+        # Manejar especialidad_profesional_medicos VALIDANDO REPLICAS, desde la cache de dimensiones
+        esp_descripcion = normalizar_especialidad(sabana_fiscalizador_lme_row['especialidad_profesional'])
+        id_especialidad = self.especialidades.get(esp_descripcion)
+        if id_especialidad is not None:
+            return id_especialidad
+
+        session_especialidad = SessionML()
+        try:
+            # Si no existe, insertarla
+            ids = self.especialidades.resolve(session_especialidad, [esp_descripcion])
             # Confirmar la transacción
             session_especialidad.commit()
-            return id_especialidad
+            self.especialidades.remember(ids)
+            return ids[esp_descripcion]
 
         except Exception as e:
             session_especialidad.rollback()
@@ -253,42 +905,20 @@ class ETLService:
             session_especialidad.close()
 
     def create_profesionalidad(self, sabana_fiscalizador_lme_row):
+        # Determinar la descripción de la profesionalidad y buscarla en la cache de dimensiones
+        descripcion = normalizar_profesionalidad(sabana_fiscalizador_lme_row['tipo_profesional'])
+        id_profesionalidad = self.profesionalidades.get(descripcion)
+        if id_profesionalidad is not None:
+            return id_profesionalidad
+
         session = SessionML()
-        
         try:
-            # Determinar la descripción de la profesionalidad
-            tipo_profesional = sabana_fiscalizador_lme_row['tipo_profesional']
-            if tipo_profesional is None or tipo_profesional == '-' or str(tipo_profesional).strip() == '':
-                descripcion = 'No informada'
-            else:
-                #TODO: Tema pendiente, no hay una descripcion del tipo profesional
-                descripcion = str(tipo_profesional) 
-            descripcion = descripcion.title()
-
-            # Buscar si la profesionalidad ya existe
-            result = session.execute(text("""
-                SELECT id_profesionalidad FROM ml.profesionalidad
-                WHERE descripcion_profesionalidad = :descripcion
-            """), {'descripcion': descripcion})
-            id_profesionalidad = result.scalar()
-
             # Si no existe, insertarla
-            if id_profesionalidad is None:
-                session.execute(text("""
-                    INSERT INTO ml.profesionalidad (descripcion_profesionalidad)
-                    VALUES (:descripcion)
-                    RETURNING id_profesionalidad
-                """), {'descripcion': descripcion})
-                # Obtener el ID recién insertado
-                result = session.execute(text("""
-                    SELECT id_profesionalidad FROM ml.profesionalidad
-                    WHERE descripcion_profesionalidad = :descripcion
-                """), {'descripcion': descripcion})
-                id_profesionalidad = result.scalar()
-
+            ids = self.profesionalidades.resolve(session, [descripcion])
             # Confirmar la transacción
             session.commit()
-            return id_profesionalidad
+            self.profesionalidades.remember(ids)
+            return ids[descripcion]
 
         except Exception as e:
             session.rollback()
@@ -297,9 +927,11 @@ class ETLService:
         finally:
             session.close()
 
-    def setting_doctor(self, rut_medico, id_especialidad):
+    def setting_doctor(self, rut_medico, id_especialidad, dedup: TaskDedup):
         if rut_medico is not None and id_especialidad is not None:
-            if rut_medico in self.__medicos and id_especialidad in self.__especialidades:
+            # Se reclama el par: un medico ya visto con otra especialidad igual debe registrarse
+            par = (rut_medico, id_especialidad)
+            if not dedup.medicos.claim([par]):
                 return
             
             session = SessionML() 
@@ -316,9 +948,10 @@ class ETLService:
                     session.execute(text("""
                         INSERT INTO ml.medicos (rut_medico)
                         VALUES (:rut_medico)
+                        ON CONFLICT DO NOTHING
                     """), {'rut_medico': rut_medico})
                     session.commit()
-                    logging.info(f"Insertado rut_medico {rut_medico} en ml.medicos")
+                    logging.debug(f"Insertado rut_medico {rut_medico} en ml.medicos")
                 #else:
                 #    logging.info(f"El rut_medico {rut_medico} ya existe en ml.medicos")
 
@@ -328,32 +961,36 @@ class ETLService:
                     FROM ml.especialidad_profesional_medicos 
                     WHERE id_especialidad_profesional = :id_especialidad_profesional AND rut_medico = :rut_medico
                 """), {'id_especialidad_profesional': id_especialidad, 'rut_medico': rut_medico}).fetchone()
-                self.__medicos.add(rut_medico)
                 # Si no existe, insertar en especialidad_profesional_medicos
                 if not result_especialidad:
                     session.execute(text("""
                         INSERT INTO ml.especialidad_profesional_medicos (id_especialidad_profesional, rut_medico)
                         VALUES (:id_especialidad, :rut_medico)
+                        ON CONFLICT DO NOTHING
                     """), {'id_especialidad': id_especialidad, 'rut_medico': rut_medico})
                     session.commit()
-                    logging.info(f"Insertada especialidad {id_especialidad} para rut_medico {rut_medico}")
+                    logging.debug(f"Insertada especialidad {id_especialidad} para rut_medico {rut_medico}")
                 #else:
                     #logging.info(f"La especialidad {id_especialidad} para rut_medico {rut_medico} ya existe")
-                self.__especialidades.add(id_especialidad)
+                dedup.medicos.confirm([par])
                     
             except IntegrityError as e:
                 session.rollback()
+                dedup.medicos.release([par])
                 logging.info(f"Error de integridad: {e}")
             except Exception as e:
                 session.rollback()
+                dedup.medicos.release([par])
                 logging.info(f"Error inesperado: {e}")
             finally:
                 session.close()
 
-    def upload_to_lm(self, sabana_fiscalizador_lme_row):
+    def upload_to_lm(self, sabana_fiscalizador_lme_row, dedup: TaskDedup):
+        # Solo se liberan ante un error los id_lic que reclamo esta llamada
+        reclamadas = []
         id_especialidad = self.create_especialidad(sabana_fiscalizador_lme_row)
         rut_medico = sabana_fiscalizador_lme_row['rut_medico']
-        self.setting_doctor(rut_medico, id_especialidad)
+        self.setting_doctor(rut_medico, id_especialidad, dedup)
         
         session = SessionML()
         try:
@@ -369,7 +1006,8 @@ class ETLService:
 
             # Validar id_lic en memoria antes de consultar la base de datos
             id_lic = sabana_fiscalizador_lme_row['id_lic']
-            if id_lic not in self.__id_licencias:
+            reclamadas = dedup.licencias.claim([id_lic])
+            if reclamadas:
                 # Insertar en la tabla licencias VALIDANDO REPLICAS
                 session.execute(text("""
                     INSERT INTO ml.licencias (
@@ -402,26 +1040,206 @@ class ETLService:
                         :marca_otorgamiento
                     ) ON CONFLICT (id_lic) DO NOTHING
                 """), sabana_fiscalizador_lme_row)
-                # Agregar id_lic al arreglo privado
-                self.__id_licencias.add(id_lic)
-                logging.info(f"Procesado id_lic: {id_lic} - folio: {sabana_fiscalizador_lme_row['folio']}")
+                logging.debug(f"Procesado id_lic: {id_lic} - folio: {sabana_fiscalizador_lme_row['folio']}")
+                # Solo el worker que reclamo el id_lic guarda el diagnostico, asi no hay carreras entre workers
+                self.save_diagnostico_especialidad(id_lic, sabana_fiscalizador_lme_row['cod_diagnostico_principal'], sabana_fiscalizador_lme_row['especialidad_profesional'])
             else:
-                logging.info(f"Atención id_lic: {id_lic} - folio: {sabana_fiscalizador_lme_row['folio']} duplicado en memoria, ignorado")
-            self.save_diagnostico_especialidad(id_lic, sabana_fiscalizador_lme_row['cod_diagnostico_principal'], sabana_fiscalizador_lme_row['especialidad_profesional'])
-                # print(id_lic)
+                logging.debug(f"Atención id_lic: {id_lic} - folio: {sabana_fiscalizador_lme_row['folio']} duplicado en memoria, ignorado")
             # Confirmar todas las inserciones y relaciones
             session.commit()
+            dedup.licencias.confirm(reclamadas)
 
         except IntegrityError as e:
             session.rollback()
+            dedup.licencias.release(reclamadas)
             logging.info(f"Error de integridad para id_lic: {sabana_fiscalizador_lme_row['id_lic']} - folio: {sabana_fiscalizador_lme_row['folio']}: {e}")
+            # Con dead letter la fila se rechaza y se cuenta como cualquier error de datos
+            if self.config.max_rejected_rows > 0:
+                raise
         except Exception as e:
             session.rollback()
+            dedup.licencias.release(reclamadas)
             logging.info(f"Error inesperado para id_lic: {sabana_fiscalizador_lme_row['id_lic']} - folio: {sabana_fiscalizador_lme_row['folio']}: {e}")
             raise
         finally:
             session.close()
 
+    def upload_batch_to_lm(self, rows, dedup: TaskDedup):
+        """Carga un lote de filas en ml.* con una sola transaccion.
+
+        Las dimensiones se resuelven una vez por lote desde la cache, los medicos y ml.licencias se
+        cargan con execute_values y LicenciasBulkLoader (COPY o execute_values) en la misma
+        transaccion y el lote se confirma con un unico commit.
+        """
+        especialidad_medicos = set()
+        profesionalidad_medicos = set()
+        unicas = []
+        ids_lote = set()
+        # Un INSERT ... RETURNING por dimension para todo el lote, el resto sale de la cache
+        self.resolve_dimensions(rows)
+        for row in rows:
+            id_especialidad = self.create_especialidad(row)
+            rut_medico = row['rut_medico']
+            if rut_medico is not None and id_especialidad is not None:
+                especialidad_medicos.add((rut_medico, id_especialidad))
+            id_profesionalidad = self.create_profesionalidad(row)
+            if rut_medico is not None and id_profesionalidad is not None:
+                profesionalidad_medicos.add((id_profesionalidad, rut_medico))
+
+            id_lic = row['id_lic']
+            if id_lic in ids_lote:
+                continue
+            ids_lote.add(id_lic)
+            unicas.append(row)
+
+        # Igual que setting_doctor: solo los pares (rut_medico, especialidad) no vistos en la tarea
+        medicos = dedup.medicos.claim(especialidad_medicos)
+        # Reclamar los id_lic de una vez; los reclamados por otro worker o tarea previa se omiten
+        reclamadas = set(dedup.licencias.claim([row['id_lic'] for row in unicas]))
+        nuevas = [row for row in unicas if row['id_lic'] in reclamadas]
+        diagnosticos = [
+            (row['id_lic'], row['cod_diagnostico_principal'], row['especialidad_profesional']) for row in nuevas
+        ]
+
+        session = SessionML()
+        try:
+            dbapi_connection = session.connection().connection
+            cursor = dbapi_connection.cursor()
+            try:
+                if medicos:
+                    execute_values(cursor, """
+                        INSERT INTO ml.medicos (rut_medico)
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                    """, [(rut_medico,) for rut_medico in dict.fromkeys(rut for rut, _ in medicos)])
+                    execute_values(cursor, """
+                        INSERT INTO ml.especialidad_profesional_medicos (id_especialidad_profesional, rut_medico)
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                    """, [(id_especialidad, rut_medico) for rut_medico, id_especialidad in medicos])
+                if profesionalidad_medicos:
+                    execute_values(cursor, """
+                        INSERT INTO ml.profesionalidad_medicos (id_profesionalidad, rut_medico)
+                        VALUES %s
+                        ON CONFLICT (id_profesionalidad, rut_medico) DO NOTHING
+                    """, list(profesionalidad_medicos))
+                insertadas = self.bulk_loader.load(dbapi_connection, nuevas)
+                # Igual que save_diagnostico_especialidad: solo si la licencia no tiene registro
+                if diagnosticos:
+                    execute_values(cursor, """
+                        INSERT INTO ml.licencia_diagnostico_especialidad (id_licencia, cod_diagnostico, especialidad_medico)
+                        SELECT v.id_licencia, v.cod_diagnostico, v.especialidad_medico
+                        FROM (VALUES %s) AS v (id_licencia, cod_diagnostico, especialidad_medico)
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM ml.licencia_diagnostico_especialidad d
+                            WHERE d.id_licencia = v.id_licencia
+                        )
+                    """, diagnosticos, page_size=len(diagnosticos))
+            finally:
+                cursor.close()
+            session.commit()
+            dedup.medicos.confirm(medicos)
+            dedup.licencias.confirm(reclamadas)
+            logging.info(f"Lote cargado: {len(rows)} filas, {insertadas} licencias nuevas, "
+                          f"{len(rows) - len(nuevas)} duplicadas en memoria")
+        except Exception as e:
+            session.rollback()
+            dedup.medicos.release(medicos)
+            dedup.licencias.release(reclamadas)
+            logging.info(f"Error inesperado al cargar lote de {len(rows)} filas: {e}")
+            raise
+        finally:
+            session.close()
+
+    def upload_staging_to_lm(self, rows, dedup: TaskDedup):
+        """Carga un lote en ml.* pasando por la tabla de staging, con una sola transaccion.
+
+        Los ids de dimension salen de la cache y los id_lic se reclaman igual que en modo lote;
+        las cinco tablas destino se pueblan con INSERT ... SELECT desde staging (StagingMerger).
+        """
+        self.resolve_dimensions(rows)
+        reclamadas = set(dedup.licencias.claim(row['id_lic'] for row in rows))
+        lote = uuid.uuid4().hex
+        staging_rows = []
+        pendientes = set(reclamadas)
+        for row in rows:
+            # Solo la primera fila de cada id_lic reclamado se carga en ml.licencias
+            reclamada = row['id_lic'] in pendientes
+            pendientes.discard(row['id_lic'])
+            staging_rows.append({
+                **row,
+                'id_especialidad_profesional': self.especialidades.get(normalizar_especialidad(row['especialidad_profesional'])),
+                'id_profesionalidad': self.profesionalidades.get(normalizar_profesionalidad(row['tipo_profesional'])),
+                'reclamada': reclamada,
+                'lote': lote,
+            })
+
+        session = SessionML()
+        try:
+            dbapi_connection = session.connection().connection
+            insertadas = self.staging_merger.merge(dbapi_connection, staging_rows, lote)
+            session.commit()
+            dedup.licencias.confirm(reclamadas)
+            self.record_delta(insertadas)
+            logging.info(f"Lote {lote} cargado via staging: {len(rows)} filas, insertadas {insertadas}")
+        except Exception as e:
+            session.rollback()
+            dedup.licencias.release(reclamadas)
+            logging.info(f"Error inesperado al cargar lote de {len(rows)} filas via staging: {e}")
+            raise
+        finally:
+            session.close()
+
+    def upload_columnar_to_lm(self, batches: list, dedup: TaskDedup):
+        """Version columnar de upload_staging_to_lm para bloques RecordBatch de pyarrow.
+
+        Los ids de dimension se asignan por valor distinto (diccionario) y la marca reclamada con
+        operaciones por columna; el lote se copia a staging en CSV generado por pyarrow. Solo los
+        id_lic pasan por Python, para reclamarlos en el filtro de deduplicacion de la tarea.
+        """
+        import pyarrow as pa
+
+        table = etl_columnar.concat_batches(batches)
+        especialidades = etl_columnar.distinct_descriptions(table.column('especialidad_profesional'), normalizar_especialidad)
+        profesionalidades = etl_columnar.distinct_descriptions(table.column('tipo_profesional'), normalizar_profesionalidad)
+        self.resolve_descriptions(set(especialidades.values()), set(profesionalidades.values()))
+        id_especialidad = etl_columnar.map_column(
+            table.column('especialidad_profesional'),
+            {valor: self.especialidades.get(descripcion) for valor, descripcion in especialidades.items()}, pa.int64(),
+        )
+        id_profesionalidad = etl_columnar.map_column(
+            table.column('tipo_profesional'),
+            {valor: self.profesionalidades.get(descripcion) for valor, descripcion in profesionalidades.items()}, pa.int64(),
+        )
+        ids = table.column('id_lic').combine_chunks()
+        reclamadas = set(dedup.licencias.claim(ids.to_pylist()))
+        lote = uuid.uuid4().hex
+        staging = etl_columnar.staging_table(
+            table, id_especialidad, id_profesionalidad, etl_columnar.first_claimed_mask(ids, reclamadas), lote
+        )
+
+        session = SessionML()
+        try:
+            dbapi_connection = session.connection().connection
+            insertadas = self.staging_merger.merge_csv(dbapi_connection, etl_columnar.copy_csv_buffer(staging), lote)
+            session.commit()
+            dedup.licencias.confirm(reclamadas)
+            self.record_delta(insertadas)
+            logging.info(f"Lote {lote} cargado via staging (columnar): {table.num_rows} filas, insertadas {insertadas}")
+        except Exception as e:
+            session.rollback()
+            dedup.licencias.release(reclamadas)
+            logging.info(f"Error inesperado al cargar lote de {table.num_rows} filas via staging (columnar): {e}")
+            raise
+        finally:
+            session.close()
+
+    def record_delta(self, insertadas: dict) -> None:
+        """Suma los conteos de la carga delta de un lote confirmado a las metricas de la tarea del hilo."""
+        metrics = current_metrics()
+        if "delta" in insertadas and metrics is not None:
+            metrics.add_delta(insertadas["delta"])
+
     def save_diagnostico_especialidad(self, id_lic, cod_diagnostico, especialidad_profesional):
         session = SessionML()
 
@@ -0,0 +1,189 @@
+import csv
+import gzip
+import io
+import os
+import threading
+from decimal import Decimal
+
+### Archivo de respaldo (snapshot) con las filas extraidas por cada tarea ETL. ###
+
+SNAPSHOT_CSV = "csv"
+SNAPSHOT_CSV_GZIP = "csv.gz"
+SNAPSHOT_CSV_ZSTD = "csv.zst"
+SNAPSHOT_PARQUET = "parquet"
+SNAPSHOT_FORMATS = (SNAPSHOT_CSV, SNAPSHOT_CSV_GZIP, SNAPSHOT_CSV_ZSTD, SNAPSHOT_PARQUET)
+
+# Buffer de escritura para los CSV, evita una syscall por fila
+_CSV_BUFFER_SIZE = 1024 * 1024
+
+
+class SnapshotWriter:
+    """Escribe las filas de una tarea en un unico archivo que queda abierto hasta close().
+
+    Formatos:
+    - csv, csv.gz (gzip) y csv.zst (zstandard, requiere el paquete zstandard).
+    - parquet (requiere pyarrow): las filas se acumulan y se escriben por row group de
+      row_group_size filas, para que analitica pueda leer el extracto sin parsear texto.
+
+    Es seguro usarlo desde varios workers a la vez. El archivo se crea con la primera fila.
+    """
+
+    def __init__(self, base_path: str, snapshot_format: str = SNAPSHOT_CSV, row_group_size: int = 100000):
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Formato de snapshot no soportado: {snapshot_format}, use uno de {SNAPSHOT_FORMATS}")
+        # Validar dependencias opcionales al crear el writer y no a mitad de la tarea
+        if snapshot_format == SNAPSHOT_CSV_ZSTD:
+            _require("zstandard", snapshot_format)
+        if snapshot_format == SNAPSHOT_PARQUET:
+            _require("pyarrow", snapshot_format)
+        self.format = snapshot_format
+        self.path = f"{base_path}.{snapshot_format}"
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._pending = []
+        # Filas en _pending cuando contiene RecordBatch (write_batch) en vez de dicts
+        self._pending_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_row(self, row: dict) -> None:
+        self.write_rows([row])
+
+    def write_rows(self, rows: list) -> None:
+        if not rows:
+            return
+        with self._lock:
+            if self.format == SNAPSHOT_PARQUET:
+                self._pending.extend(rows)
+                if len(self._pending) >= self.row_group_size:
+                    self._flush_row_group()
+            else:
+                if self._csv_writer is None:
+                    self._open_csv(list(rows[0].keys()))
+                self._csv_writer.writerows(rows)
+            self.rows_written += len(rows)
+
+    def write_batch(self, batch) -> None:
+        """Escribe un RecordBatch de pyarrow (carga columnar) sin pasar por dicts."""
+        if batch.num_rows == 0:
+            return
+        with self._lock:
+            if self.format == SNAPSHOT_PARQUET:
+                self._pending.append(_numeric_as_double(batch))
+                self._pending_rows += batch.num_rows
+                if self._pending_rows >= self.row_group_size:
+                    self._flush_batches()
+            else:
+                import pyarrow.csv as pacsv
+
+                if self._file is None:
+                    self._open_csv(batch.schema.names)
+                buffer = io.BytesIO()
+                pacsv.write_csv(batch, buffer, pacsv.WriteOptions(include_header=False))
+                self._file.write(buffer.getvalue().decode("utf-8"))
+            self.rows_written += batch.num_rows
+
+    def write_csv_text(self, fieldnames: list, chunks, rows: int) -> None:
+        """Agrega filas ya serializadas en CSV sin encabezado (salida de COPY ... WITH (FORMAT csv)).
+
+        chunks es un iterable de str; las filas de una llamada quedan contiguas en el archivo.
+        """
+        if self.format == SNAPSHOT_PARQUET:
+            raise ValueError("El snapshot parquet no admite filas en CSV, use un formato csv")
+        with self._lock:
+            if self._file is None:
+                self._open_csv(fieldnames)
+            for chunk in chunks:
+                self._file.write(chunk)
+            self.rows_written += rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self.format == SNAPSHOT_PARQUET:
+                if self._pending_rows:
+                    self._flush_batches()
+                elif self._pending:
+                    self._flush_row_group()
+                if self._parquet_writer is not None:
+                    self._parquet_writer.close()
+                    self._parquet_writer = None
+            elif self._file is not None:
+                self._file.close()
+                self._file = None
+                self._csv_writer = None
+
+    def _open_csv(self, fieldnames: list) -> None:
+        if self.format == SNAPSHOT_CSV_GZIP:
+            self._file = gzip.open(self.path, "wt", newline="", encoding="utf-8", compresslevel=6)
+        elif self.format == SNAPSHOT_CSV_ZSTD:
+            import zstandard
+            raw = open(self.path, "wb")
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+            self._file = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        else:
+            self._file = open(self.path, "w", newline="", encoding="utf-8", buffering=_CSV_BUFFER_SIZE)
+        self._csv_writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._csv_writer.writeheader()
+
+    def _flush_row_group(self) -> None:
+        import pyarrow as pa
+
+        # Decimal de numeric se guarda como double, igual que los modelos de respuesta
+        columns = {
+            name: [float(value) if isinstance(value, Decimal) else value for value in (row[name] for row in self._pending)]
+            for name in self._pending[0].keys()
+        }
+        self._write_parquet(pa.table(columns))
+
+    def _flush_batches(self) -> None:
+        import pyarrow as pa
+
+        # Tipos inferidos por bloque (p. ej. null en un bloque sin valores) se unifican
+        table = pa.concat_tables([pa.Table.from_batches([batch]) for batch in self._pending], promote_options="permissive")
+        self._write_parquet(table)
+        self._pending_rows = 0
+
+    def _write_parquet(self, table) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet_writer is None:
+            # Columnas sin ningun valor en el primer row group quedan como string
+            schema = pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            self._parquet_writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+        table = table.cast(self._parquet_writer.schema)
+        self._parquet_writer.write_table(table, row_group_size=self.row_group_size)
+        self._pending = []
+
+
+def _numeric_as_double(batch):
+    """Columnas numeric (Decimal o texto marcado con pg_type) como double, igual que _flush_row_group."""
+    import pyarrow as pa
+
+    for index, field in enumerate(batch.schema):
+        if pa.types.is_decimal(field.type) or (field.metadata or {}).get(b"pg_type") == b"numeric":
+            batch = batch.set_column(index, field.name, batch.column(index).cast(pa.float64()))
+    return batch
+
+
+def _require(module: str, snapshot_format: str) -> None:
+    try:
+        __import__(module)
+    except ImportError:
+        raise ValueError(f"El formato de snapshot {snapshot_format} requiere el paquete {module}")
+
+
+def snapshot_base_path(output_dir: str, task_id: str) -> str:
+    """Ruta sin extension del snapshot de una tarea: etl/<timestamp>/registros_<task_id>."""
+    return os.path.join(output_dir, f"registros_{task_id}")
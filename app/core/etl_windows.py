@@ -0,0 +1,62 @@
+import math
+from datetime import timedelta
+
+### Ventanas de extraccion adaptativas: se dimensionan a una cantidad objetivo de filas. ###
+
+# Histograma por hora del origen; usa el mismo filtro por fecha_emision que EXTRACTION_QUERY
+HOUR_COUNTS_QUERY = """
+SELECT date_trunc('hour', fecha_emision) AS hora, count(*)
+FROM lme.sabana_fiscalizador_lme
+WHERE fecha_emision BETWEEN %s AND %s
+GROUP BY 1
+"""
+
+
+def probe_hour_counts(conn, start_time, end_time) -> dict:
+    """Cantidad de filas del origen por hora en [start_time, end_time], con una sola consulta."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(HOUR_COUNTS_QUERY, (start_time, end_time))
+        counts = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+    # Cierra la transaccion de lectura, igual que cada ventana
+    conn.commit()
+    return counts
+
+
+def adaptive_windows(windows: list, hour_counts: dict, target_rows: int) -> list:
+    """Une ventanas de una hora contiguas y divide las que superan target_rows.
+
+    Las horas contiguas se agrupan mientras la suma estimada no supere target_rows (las horas vacias
+    no suman); una hora con mas filas se divide en partes iguales, suponiendo filas parejas dentro de
+    la hora. Retorna (inicio, fin) en el mismo orden y cubriendo el mismo rango que windows.
+    """
+    result = []
+    current = None
+    for start_time, end_time in windows:
+        rows = hour_counts.get(start_time, 0)
+        if rows > target_rows:
+            if current:
+                result.append(tuple(current[:2]))
+                current = None
+            # Partes de al menos un segundo; la ultima termina exactamente en end_time
+            seconds = (end_time - start_time).total_seconds()
+            parts = max(1, min(math.ceil(rows / target_rows), int(seconds)))
+            step = timedelta(seconds=math.floor(seconds / parts))
+            part_start = start_time
+            for part in range(parts):
+                part_end = end_time if part == parts - 1 else part_start + step
+                result.append((part_start, part_end))
+                part_start = part_end
+            continue
+        if current and current[1] == start_time and current[2] + rows <= target_rows:
+            current[1] = end_time
+            current[2] += rows
+            continue
+        if current:
+            result.append(tuple(current[:2]))
+        current = [start_time, end_time, rows]
+    if current:
+        result.append(tuple(current[:2]))
+    return result
@@ -0,0 +1,50 @@
+import csv
+import io
+import os
+from typing import Optional
+
+from app.models.response_models import LicenseDetail
+
+### Exportacion en streaming de los listados de licencias: NDJSON o CSV segun el header Accept. ###
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+STREAM_MEDIA_TYPES = (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE)
+
+# Filas por viaje al cursor de servidor (yield_per) y por bloque escrito en la respuesta
+API_STREAM_BATCH_SIZE = int(os.getenv("API_STREAM_BATCH_SIZE", "1000"))
+
+LICENSE_COLUMNS = list(LicenseDetail.model_fields)
+
+
+def stream_media_type(accept: Optional[str]) -> Optional[str]:
+    """El formato de streaming pedido en Accept (el primero que aparezca), o None para la respuesta JSON."""
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in STREAM_MEDIA_TYPES:
+            return media_type
+    return None
+
+
+def encode_licenses(media_type: str, batches):
+    """Convierte bloques de LicenseDetail en bloques de bytes NDJSON (una licencia por linea) o CSV con encabezado."""
+    if media_type == NDJSON_MEDIA_TYPE:
+        for licenses in batches:
+            if licenses:
+                yield "".join(f"{license.model_dump_json()}\n" for license in licenses).encode("utf-8")
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LICENSE_COLUMNS)
+    header = True
+    for licenses in batches:
+        for license in licenses:
+            values = license.model_dump(mode="json")
+            writer.writerow(["" if values[column] is None else values[column] for column in LICENSE_COLUMNS])
+        if buffer.tell() or header:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            header = False
+    if header:
+        yield buffer.getvalue().encode("utf-8")
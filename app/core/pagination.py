@@ -0,0 +1,79 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+### Paginacion por cursor (keyset) de los listados de licencias, ordenados por (fecha_emision, id_lic). ###
+
+# Licencias por pagina si el request trae cursor pero no limit, y el maximo aceptado
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "500"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "5000"))
+# Clave de cursor de las licencias sin fecha_emision; las consultas ordenan COALESCE(fecha_emision, '-infinity')
+NO_FECHA_EMISION = "-infinity"
+
+
+def encode_cursor(fecha_emision: datetime, id_lic: str) -> str:
+    """Cursor opaco con la clave de la ultima licencia de la pagina (fecha_emision puede ser None)."""
+    payload = json.dumps([fecha_emision.isoformat() if fecha_emision is not None else None, id_lic])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Retorna (fecha_emision, id_lic) del cursor; ValueError si no es un cursor de esta API.
+
+    Si la ultima licencia no tenia fecha_emision se retorna NO_FECHA_EMISION, que la consulta compara
+    como timestamp.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fecha_emision, id_lic = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if fecha_emision is None:
+            return NO_FECHA_EMISION, str(id_lic)
+        return datetime.fromisoformat(fecha_emision), str(id_lic)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Cursor de paginacion invalido")
+
+
+def page_params(cursor: str = None, limit: int = None) -> dict:
+    """Parametros de busqueda de la consulta: clave del cursor y limit + 1 licencias, para saber si hay mas.
+
+    Sin cursor ni limit el limit es None (todas las licencias, como antes de paginar); con cursor y
+    sin limit se usa API_PAGE_SIZE.
+    """
+    if cursor is None and limit is None:
+        return {"cursor_fecha_emision": None, "cursor_id_lic": None, "limit": None}
+    limit = API_PAGE_SIZE if limit is None else limit
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ValueError(f"limit debe estar entre 1 y {API_MAX_PAGE_SIZE}")
+    fecha_emision, id_lic = decode_cursor(cursor) if cursor else (None, None)
+    return {"cursor_fecha_emision": fecha_emision, "cursor_id_lic": id_lic, "limit": limit + 1}
+
+
+def stream_params(cursor: str = None, limit: int = None) -> dict:
+    """Como page_params para una exportacion en streaming: sin limit (NULL) se leen todas las licencias."""
+    if limit is not None and limit < 1:
+        raise ValueError("limit debe ser mayor que 0")
+    fecha_emision, id_lic = decode_cursor(cursor) if cursor else (None, None)
+    return {"cursor_fecha_emision": fecha_emision, "cursor_id_lic": id_lic, "limit": limit}
+
+
+def split_page(rows: list, limit: int) -> tuple:
+    """Separa las filas de las primeras limit licencias y el cursor de la siguiente pagina (None si no hay).
+
+    Con limit None todas las filas son una sola pagina. Una licencia puede ocupar varias filas (una por especialidad del medico), por eso la pagina se
+    cuenta en licencias y no en filas.
+    """
+    if limit is None:
+        return list(rows), None
+    keys = []
+    page = []
+    for row in rows:
+        mapping = row._mapping if hasattr(row, "_mapping") else row
+        key = (mapping["fecha_emision"], mapping["id_lic"])
+        if not keys or keys[-1] != key:
+            if len(keys) == limit:
+                return page, encode_cursor(*keys[-1])
+            keys.append(key)
+        page.append(row)
+    return page, None
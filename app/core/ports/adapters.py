@@ -1,16 +1,602 @@
 
 
-from app.core.ports.etl import TaskRepository
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from contextlib import closing
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.core.ports.etl import CheckpointRepository, DeadLetterRepository, TaskRepository
+
+
+# Estados en que la tarea sigue viva; el resto (finish, error, ...) son terminales
+ACTIVE_STATUSES = ("queued", "initial", "in process", "execute_rn")
+# Cada cuanto se revisa la eviccion por TTL
+EVICTION_INTERVAL_SECONDS = 60
+# Condicion SQL de las tareas terminadas, las unicas que expiran por TTL
+_SQLITE_TERMINAL = "status NOT IN ({})".format(", ".join("?" * len(ACTIVE_STATUSES)))
+_POSTGRES_TERMINAL = "status <> ALL(:active_statuses)"
+# Proceso que ejecuta las tareas activas que registra este proceso
+TASK_OWNER = f"{socket.gethostname()}:{os.getpid()}"
 
 
 class InMemoryTaskRepository(TaskRepository ):
     
-    def __init__(self, log_file: str):
+    def __init__(self, log_file: str, ttl_seconds: float = None):
         super().__init__(log_file)
         self.task_status = {}
+        self.ttl_seconds = ttl_seconds
+        self._updated_at = {}
+        self._last_eviction = time.monotonic()
+        self._lock = threading.Lock()
     
     def get_task_status(self, task_id: str) -> dict:
         return self.task_status.get(task_id, None)
     
     def set_task_status(self, task_id: str, status: str, detail: dict) -> None:
-        self.task_status[task_id] = {"Status": status, "detail": detail}
\ No newline at end of file
+        with self._lock:
+            self.task_status[task_id] = {"Status": status, "detail": detail}
+            self._updated_at[task_id] = time.monotonic()
+            self._evict_expired()
+
+    def create_task_if_absent(self, task_id: str, status: str, detail: dict) -> bool:
+        with self._lock:
+            if task_id in self.task_status:
+                return False
+            self.task_status[task_id] = {"Status": status, "detail": detail}
+            self._updated_at[task_id] = time.monotonic()
+            return True
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        if self.ttl_seconds is None or now - self._last_eviction < EVICTION_INTERVAL_SECONDS:
+            return
+        self._last_eviction = now
+        for task_id, updated_at in list(self._updated_at.items()):
+            if now - updated_at > self.ttl_seconds and self.task_status[task_id]["Status"] not in ACTIVE_STATUSES:
+                self.task_status.pop(task_id, None)
+                self._updated_at.pop(task_id, None)
+
+
+class SharedTaskRepository(TaskRepository):
+    """Base de los repositorios de estado compartidos entre procesos (SQLite / PostgreSQL).
+
+    - Las actualizaciones "in process" de una misma tarea se coalescen: se persiste a lo mas una
+      cada write_interval segundos y las intermedias quedan en memoria del proceso que ejecuta la
+      tarea. Los cambios de estado (initial, execute_rn, finish, error, ...) se escriben siempre.
+    - Las tareas terminadas sin actualizacion en ttl_seconds se eliminan; las activas (ACTIVE_STATUSES)
+      no expiran.
+    - Cada tarea activa registra su dueno (host:pid) y un hilo renueva su updated_at cada
+      heartbeat_interval segundos. Si el dueno se cae, a los lease_seconds la tarea queda abandonada
+      y otro proceso la puede tomar con take_over_task.
+    - request_cancel marca la tarea en la tabla; el heartbeat del dueno lee la marca y llama al
+      listener de set_cancel_listener, asi la cancelacion llega aunque la reciba otro worker.
+    """
+
+    def __init__(self, log_file: str, ttl_seconds: float, write_interval: float,
+                 lease_seconds: float = 120, heartbeat_interval: float = 30):
+        super().__init__(log_file)
+        self.ttl_seconds = ttl_seconds
+        self.write_interval = write_interval
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.owner = TASK_OWNER
+        self._last_write = {}
+        self._pending = {}
+        self._last_eviction = 0.0
+        self._heartbeat = None
+        self._cancel_listener = None
+        self._lock = threading.Lock()
+
+    def get_task_status(self, task_id: str) -> dict:
+        with self._lock:
+            pending = self._pending.get(task_id)
+        if pending:
+            return pending
+        return self._read(task_id)
+
+    def set_task_status(self, task_id: str, status: str, detail: dict) -> None:
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_write.get(task_id)
+            if status == "in process" and last and last[0] == status and now - last[1] < self.write_interval:
+                self._pending[task_id] = {"Status": status, "detail": detail}
+                return
+            self._pending.pop(task_id, None)
+            if status in ACTIVE_STATUSES:
+                self._last_write[task_id] = (status, now)
+                self._start_heartbeat()
+            else:
+                self._last_write.pop(task_id, None)
+            evict = now - self._last_eviction >= EVICTION_INTERVAL_SECONDS
+            if evict:
+                self._last_eviction = now
+        # La escritura va fuera del lock: no bloquea a las demas tareas ni a las lecturas del estado
+        self._write(task_id, status, json.dumps(detail, default=str), time.time())
+        if evict:
+            self._delete_older_than(time.time() - self.ttl_seconds)
+
+    def create_task_if_absent(self, task_id: str, status: str, detail: dict) -> bool:
+        created = self._insert_if_absent(task_id, status, json.dumps(detail, default=str), time.time())
+        if created:
+            self._track_active(task_id, status)
+        return created
+
+    def is_abandoned(self, task_id: str) -> bool:
+        return self._is_abandoned(task_id, time.time() - self.lease_seconds)
+
+    def take_over_task(self, task_id: str, status: str, detail: dict) -> bool:
+        now = time.time()
+        taken = self._take_over(task_id, status, json.dumps(detail, default=str), now, now - self.lease_seconds)
+        if taken:
+            with self._lock:
+                self._pending.pop(task_id, None)
+            self._track_active(task_id, status)
+        return taken
+
+    def request_cancel(self, task_id: str) -> bool:
+        return self._request_cancel(task_id)
+
+    def set_cancel_listener(self, listener) -> None:
+        self._cancel_listener = listener
+
+    def _track_active(self, task_id: str, status: str) -> None:
+        with self._lock:
+            self._last_write[task_id] = (status, time.monotonic())
+            self._start_heartbeat()
+
+    def _start_heartbeat(self) -> None:
+        # Se llama con self._lock tomado
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="etl-task-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self) -> None:
+        """Renueva el lease de las tareas activas de este proceso, aunque no reporten avance.
+
+        En la misma pasada entrega al listener las tareas cuya cancelacion pidio otro proceso.
+        """
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                task_ids = list(self._last_write)
+            if not task_ids:
+                continue
+            try:
+                cancel_requested = self._touch(task_ids, time.time())
+            except Exception as e:
+                logging.warning(f"No se pudo renovar el lease de las tareas {', '.join(task_ids)}: {e}")
+                continue
+            for task_id in cancel_requested:
+                if self._cancel_listener is None:
+                    break
+                try:
+                    self._cancel_listener(task_id)
+                except Exception as e:
+                    logging.warning(f"No se pudo cancelar la tarea {task_id}: {e}")
+
+    @abstractmethod
+    def _read(self, task_id: str) -> dict:
+        pass
+
+    @abstractmethod
+    def _write(self, task_id: str, status: str, detail: str, updated_at: float) -> None:
+        pass
+
+    @abstractmethod
+    def _insert_if_absent(self, task_id: str, status: str, detail: str, updated_at: float) -> bool:
+        pass
+
+    @abstractmethod
+    def _delete_older_than(self, cutoff: float) -> None:
+        pass
+
+    @abstractmethod
+    def _is_abandoned(self, task_id: str, lease_cutoff: float) -> bool:
+        """Si la tarea esta activa y su updated_at es anterior a lease_cutoff."""
+        pass
+
+    @abstractmethod
+    def _take_over(self, task_id: str, status: str, detail: str, updated_at: float, lease_cutoff: float) -> bool:
+        """Escribe la tarea con este proceso como dueno si no existe, esta terminada o esta abandonada."""
+        pass
+
+    @abstractmethod
+    def _touch(self, task_ids: list, updated_at: float) -> list:
+        """Renueva updated_at de las tareas activas de este proceso y retorna las que tienen cancelacion pedida."""
+        pass
+
+    @abstractmethod
+    def _request_cancel(self, task_id: str) -> bool:
+        """Marca cancel_requested si la tarea esta activa."""
+        pass
+
+
+class SqliteTaskRepository(SharedTaskRepository):
+    """Estado de tareas en un archivo SQLite, compartido por los workers de un mismo host."""
+
+    def __init__(self, log_file: str, db_path: str, ttl_seconds: float, write_interval: float,
+                 lease_seconds: float = 120, heartbeat_interval: float = 30):
+        super().__init__(log_file, ttl_seconds, write_interval, lease_seconds, heartbeat_interval)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS etl_task_status (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    detail TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Archivos creados antes de registrar el dueno de la tarea o las cancelaciones
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(etl_task_status)")]
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE etl_task_status ADD COLUMN owner TEXT")
+            if "cancel_requested" not in columns:
+                conn.execute("ALTER TABLE etl_task_status ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _read(self, task_id: str) -> dict:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT status, detail FROM etl_task_status "
+                f"WHERE task_id = ? AND (updated_at >= ? OR NOT {_SQLITE_TERMINAL})",
+                (task_id, time.time() - self.ttl_seconds, *ACTIVE_STATUSES),
+            ).fetchone()
+        return {"Status": row[0], "detail": json.loads(row[1])} if row else None
+
+    def _write(self, task_id: str, status: str, detail: str, updated_at: float) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                INSERT INTO etl_task_status (task_id, status, detail, updated_at, owner) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    status = excluded.status, detail = excluded.detail, updated_at = excluded.updated_at,
+                    owner = excluded.owner
+            """, (task_id, status, detail, updated_at, self.owner))
+            conn.commit()
+
+    def _insert_if_absent(self, task_id: str, status: str, detail: str, updated_at: float) -> bool:
+        with closing(self._connect()) as conn:
+            # Una tarea expirada que aun no se elimino se puede volver a crear
+            conn.execute(
+                f"DELETE FROM etl_task_status WHERE task_id = ? AND updated_at < ? AND {_SQLITE_TERMINAL}",
+                (task_id, updated_at - self.ttl_seconds, *ACTIVE_STATUSES),
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO etl_task_status (task_id, status, detail, updated_at, owner) VALUES (?, ?, ?, ?, ?)",
+                (task_id, status, detail, updated_at, self.owner),
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def _delete_older_than(self, cutoff: float) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(f"DELETE FROM etl_task_status WHERE updated_at < ? AND {_SQLITE_TERMINAL}",
+                         (cutoff, *ACTIVE_STATUSES))
+            conn.commit()
+
+    def _is_abandoned(self, task_id: str, lease_cutoff: float) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT 1 FROM etl_task_status WHERE task_id = ? AND updated_at < ? AND NOT {_SQLITE_TERMINAL}",
+                (task_id, lease_cutoff, *ACTIVE_STATUSES),
+            ).fetchone()
+        return row is not None
+
+    def _take_over(self, task_id: str, status: str, detail: str, updated_at: float, lease_cutoff: float) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(f"""
+                INSERT INTO etl_task_status (task_id, status, detail, updated_at, owner) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    status = excluded.status, detail = excluded.detail, updated_at = excluded.updated_at,
+                    owner = excluded.owner, cancel_requested = 0
+                WHERE etl_task_status.{_SQLITE_TERMINAL} OR etl_task_status.updated_at < ?
+            """, (task_id, status, detail, updated_at, self.owner, *ACTIVE_STATUSES, lease_cutoff))
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def _touch(self, task_ids: list, updated_at: float) -> list:
+        placeholders = ", ".join("?" * len(task_ids))
+        with closing(self._connect()) as conn:
+            conn.execute(f"""
+                UPDATE etl_task_status SET updated_at = ?
+                WHERE task_id IN ({placeholders}) AND owner = ? AND NOT {_SQLITE_TERMINAL}
+            """, (updated_at, *task_ids, self.owner, *ACTIVE_STATUSES))
+            rows = conn.execute(f"""
+                SELECT task_id FROM etl_task_status
+                WHERE task_id IN ({placeholders}) AND owner = ? AND cancel_requested = 1 AND NOT {_SQLITE_TERMINAL}
+            """, (*task_ids, self.owner, *ACTIVE_STATUSES)).fetchall()
+            conn.commit()
+        return [row[0] for row in rows]
+
+    def _request_cancel(self, task_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f"UPDATE etl_task_status SET cancel_requested = 1 WHERE task_id = ? AND NOT {_SQLITE_TERMINAL}",
+                (task_id, *ACTIVE_STATUSES),
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+
+class PostgresTaskRepository(SharedTaskRepository):
+    """Estado de tareas en la tabla ml.etl_task_status, compartido entre hosts."""
+
+    def __init__(self, log_file: str, ttl_seconds: float, write_interval: float,
+                 lease_seconds: float = 120, heartbeat_interval: float = 30, session_factory=None):
+        super().__init__(log_file, ttl_seconds, write_interval, lease_seconds, heartbeat_interval)
+        if session_factory is None:
+            from app.core.database import SessionML
+            session_factory = SessionML
+        self.session_factory = session_factory
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _ensure_tables(self) -> None:
+        """Crea la tabla en el primer uso y no al importar: la API inicia aunque la base no responda."""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            self._create_tables()
+            self._ready = True
+
+    def _create_tables(self) -> None:
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS ml.etl_task_status (
+                task_id text PRIMARY KEY,
+                status text NOT NULL,
+                detail jsonb NOT NULL,
+                updated_at timestamptz NOT NULL,
+                owner text,
+                cancel_requested boolean NOT NULL DEFAULT false
+            )
+        """)
+        self._execute("""
+            ALTER TABLE ml.etl_task_status
+                ADD COLUMN IF NOT EXISTS owner text,
+                ADD COLUMN IF NOT EXISTS cancel_requested boolean NOT NULL DEFAULT false
+        """)
+
+    def _execute(self, query: str, params: dict = None, fetch: bool = False):
+        session = self.session_factory()
+        try:
+            result = session.execute(text(query), params or {})
+            rows = result.fetchall() if fetch else result.rowcount
+            session.commit()
+            return rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _read(self, task_id: str) -> dict:
+        self._ensure_tables()
+        rows = self._execute(f"""
+            SELECT status, detail FROM ml.etl_task_status
+            WHERE task_id = :task_id AND (updated_at >= to_timestamp(:cutoff) OR NOT {_POSTGRES_TERMINAL})
+        """, {"task_id": task_id, "cutoff": time.time() - self.ttl_seconds,
+              "active_statuses": list(ACTIVE_STATUSES)}, fetch=True)
+        return {"Status": rows[0][0], "detail": rows[0][1]} if rows else None
+
+    def _write(self, task_id: str, status: str, detail: str, updated_at: float) -> None:
+        self._ensure_tables()
+        self._execute("""
+            INSERT INTO ml.etl_task_status (task_id, status, detail, updated_at, owner)
+            VALUES (:task_id, :status, CAST(:detail AS jsonb), to_timestamp(:updated_at), :owner)
+            ON CONFLICT (task_id) DO UPDATE SET
+                status = EXCLUDED.status, detail = EXCLUDED.detail, updated_at = EXCLUDED.updated_at,
+                owner = EXCLUDED.owner
+        """, {"task_id": task_id, "status": status, "detail": detail, "updated_at": updated_at, "owner": self.owner})
+
+    def _insert_if_absent(self, task_id: str, status: str, detail: str, updated_at: float) -> bool:
+        self._ensure_tables()
+        # Una tarea expirada que aun no se elimino se puede volver a crear
+        inserted = self._execute(f"""
+            INSERT INTO ml.etl_task_status (task_id, status, detail, updated_at, owner)
+            VALUES (:task_id, :status, CAST(:detail AS jsonb), to_timestamp(:updated_at), :owner)
+            ON CONFLICT (task_id) DO UPDATE SET
+                status = EXCLUDED.status, detail = EXCLUDED.detail, updated_at = EXCLUDED.updated_at,
+                owner = EXCLUDED.owner, cancel_requested = false
+            WHERE ml.etl_task_status.updated_at < to_timestamp(:cutoff)
+                AND ml.etl_task_status.{_POSTGRES_TERMINAL}
+        """, {"task_id": task_id, "status": status, "detail": detail, "updated_at": updated_at,
+              "cutoff": updated_at - self.ttl_seconds, "active_statuses": list(ACTIVE_STATUSES), "owner": self.owner})
+        return inserted == 1
+
+    def _delete_older_than(self, cutoff: float) -> None:
+        self._ensure_tables()
+        self._execute(
+            f"DELETE FROM ml.etl_task_status WHERE updated_at < to_timestamp(:cutoff) AND {_POSTGRES_TERMINAL}",
+            {"cutoff": cutoff, "active_statuses": list(ACTIVE_STATUSES)},
+        )
+
+    def _is_abandoned(self, task_id: str, lease_cutoff: float) -> bool:
+        self._ensure_tables()
+        rows = self._execute(f"""
+            SELECT 1 FROM ml.etl_task_status
+            WHERE task_id = :task_id AND updated_at < to_timestamp(:cutoff) AND NOT {_POSTGRES_TERMINAL}
+        """, {"task_id": task_id, "cutoff": lease_cutoff, "active_statuses": list(ACTIVE_STATUSES)}, fetch=True)
+        return bool(rows)
+
+    def _take_over(self, task_id: str, status: str, detail: str, updated_at: float, lease_cutoff: float) -> bool:
+        self._ensure_tables()
+        taken = self._execute(f"""
+            INSERT INTO ml.etl_task_status (task_id, status, detail, updated_at, owner)
+            VALUES (:task_id, :status, CAST(:detail AS jsonb), to_timestamp(:updated_at), :owner)
+            ON CONFLICT (task_id) DO UPDATE SET
+                status = EXCLUDED.status, detail = EXCLUDED.detail, updated_at = EXCLUDED.updated_at,
+                owner = EXCLUDED.owner, cancel_requested = false
+            WHERE ml.etl_task_status.{_POSTGRES_TERMINAL} OR ml.etl_task_status.updated_at < to_timestamp(:cutoff)
+        """, {"task_id": task_id, "status": status, "detail": detail, "updated_at": updated_at, "owner": self.owner,
+              "cutoff": lease_cutoff, "active_statuses": list(ACTIVE_STATUSES)})
+        return taken == 1
+
+    def _touch(self, task_ids: list, updated_at: float) -> list:
+        self._ensure_tables()
+        rows = self._execute(f"""
+            UPDATE ml.etl_task_status SET updated_at = to_timestamp(:updated_at)
+            WHERE task_id = ANY(:task_ids) AND owner = :owner AND NOT {_POSTGRES_TERMINAL}
+            RETURNING task_id, cancel_requested
+        """, {"updated_at": updated_at, "task_ids": task_ids, "owner": self.owner,
+              "active_statuses": list(ACTIVE_STATUSES)}, fetch=True)
+        return [row[0] for row in rows if row[1]]
+
+    def _request_cancel(self, task_id: str) -> bool:
+        self._ensure_tables()
+        marked = self._execute(f"""
+            UPDATE ml.etl_task_status SET cancel_requested = true
+            WHERE task_id = :task_id AND NOT {_POSTGRES_TERMINAL}
+        """, {"task_id": task_id, "active_statuses": list(ACTIVE_STATUSES)})
+        return marked == 1
+
+
+def build_task_repository(log_file: str) -> TaskRepository:
+    """Crea el repositorio de estado configurado en ETL_TASK_REPOSITORY: memory, sqlite o postgres.
+
+    Con uvicorn --workers N se debe usar sqlite (un host) o postgres (varios hosts), para que todos
+    los workers vean las mismas tareas.
+    """
+    backend = os.getenv("ETL_TASK_REPOSITORY", "memory")
+    ttl_seconds = float(os.getenv("ETL_TASK_TTL_SECONDS", str(7 * 24 * 3600)))
+    write_interval = float(os.getenv("ETL_STATUS_WRITE_INTERVAL", "2"))
+    lease_seconds = float(os.getenv("ETL_TASK_LEASE_SECONDS", "120"))
+    heartbeat_interval = float(os.getenv("ETL_TASK_HEARTBEAT_SECONDS", "30"))
+    if backend == "memory":
+        return InMemoryTaskRepository(log_file, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        db_path = os.getenv("ETL_TASK_SQLITE_PATH", os.path.join(os.getcwd(), "etl", "etl_tasks.sqlite3"))
+        return SqliteTaskRepository(log_file, db_path, ttl_seconds, write_interval, lease_seconds, heartbeat_interval)
+    if backend == "postgres":
+        return PostgresTaskRepository(log_file, ttl_seconds, write_interval, lease_seconds, heartbeat_interval)
+    raise ValueError(f"Repositorio de tareas no soportado: {backend}, use memory, sqlite o postgres")
+
+
+class FileCheckpointRepository(CheckpointRepository):
+    """Checkpoints en un archivo JSON lines por tarea: <base_dir>/<task_id>.jsonl
+
+    La primera linea es el request y cada linea siguiente una ventana completada. Cada
+    escritura se hace con fsync para que sobreviva a una caida del proceso.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+
+    def _path(self, task_id: str) -> str:
+        return os.path.join(self.base_dir, f"{task_id}.jsonl")
+
+    def _append(self, task_id: str, record: dict, mode: str = "a") -> None:
+        with self._lock:
+            os.makedirs(self.base_dir, exist_ok=True)
+            with open(self._path(task_id), mode, encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self, task_id: str) -> list:
+        path = self._path(task_id)
+        if not os.path.exists(path):
+            return []
+        with self._lock, open(path, "r", encoding="utf-8") as f:
+            # Una linea incompleta (caida a mitad de escritura) se ignora
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+            return records
+
+    def start_task(self, task_id: str, request: dict) -> None:
+        self._append(task_id, {"request": request}, mode="w")
+
+    def get_request(self, task_id: str) -> dict:
+        for record in self._read(task_id):
+            if "request" in record:
+                return record["request"]
+        return None
+
+    def mark_window_done(self, task_id: str, window_start, window_end, record_count: int) -> None:
+        self._append(task_id, {
+            "start": window_start.isoformat(), "end": window_end.isoformat(), "record_count": record_count
+        })
+
+    def get_completed_windows(self, task_id: str) -> list:
+        return [
+            (datetime.fromisoformat(r["start"]), datetime.fromisoformat(r["end"]), r["record_count"])
+            for r in self._read(task_id) if "start" in r
+        ]
+
+    def clear(self, task_id: str) -> None:
+        with self._lock:
+            if os.path.exists(self._path(task_id)):
+                os.remove(self._path(task_id))
+
+
+
+class FileDeadLetterRepository(DeadLetterRepository):
+    """Filas rechazadas en un archivo JSON lines por tarea: <base_dir>/<task_id>.jsonl
+
+    Cada linea es {"row", "error", "at"}; los valores que JSON no soporta (fechas, Decimal) se
+    guardan como texto, que PostgreSQL vuelve a convertir al reprocesar. Una ventana sin checkpoint
+    que se reanuda puede rechazar la misma fila otra vez, por eso get_rows descarta las repetidas.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+
+    def _path(self, task_id: str) -> str:
+        return os.path.join(self.base_dir, f"{task_id}.jsonl")
+
+    def _write(self, task_id: str, records: list, mode: str) -> None:
+        with self._lock:
+            os.makedirs(self.base_dir, exist_ok=True)
+            with open(self._path(task_id), mode, encoding="utf-8") as f:
+                for row, error in records:
+                    f.write(json.dumps({"row": row, "error": error, "at": datetime.now().isoformat()}, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def add(self, task_id: str, row: dict, error: str) -> None:
+        self._write(task_id, [(row, error)], mode="a")
+
+    def get_rows(self, task_id: str) -> list:
+        path = self._path(task_id)
+        if not os.path.exists(path):
+            return []
+        records = {}
+        with self._lock, open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # Se conserva el ultimo error de cada fila
+                records[json.dumps(record["row"], sort_keys=True)] = (record["row"], record["error"])
+        return list(records.values())
+
+    def replace(self, task_id: str, records: list) -> None:
+        if records:
+            self._write(task_id, records, mode="w")
+            return
+        with self._lock:
+            if os.path.exists(self._path(task_id)):
+                os.remove(self._path(task_id))
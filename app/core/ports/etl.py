@@ -11,6 +11,92 @@ class TaskRepository(ABC):
     @abstractmethod
     def set_task_status(self, task_id: str, status: str, detail: dict) -> None:
         pass
+
+    def create_task_if_absent(self, task_id: str, status: str, detail: dict) -> bool:
+        """Registra la tarea solo si no existe y retorna si la creo.
+
+        Los repositorios compartidos entre procesos lo sobreescriben de forma atomica, para que dos
+        workers de la API no inicien la misma tarea.
+        """
+        if self.get_task_status(task_id):
+            return False
+        self.set_task_status(task_id, status, detail)
+        return True
+
+    def is_abandoned(self, task_id: str) -> bool:
+        """Si la tarea figura activa pero el proceso que la ejecutaba dejo de renovarla (se cayo).
+
+        El estado en memoria muere con su proceso, por eso por defecto ninguna tarea queda abandonada.
+        """
+        return False
+
+    def take_over_task(self, task_id: str, status: str, detail: dict) -> bool:
+        """Registra status para una tarea terminada o abandonada y retorna si la tomo.
+
+        Los repositorios compartidos lo hacen de forma atomica y retornan False si otro proceso la
+        tiene activa.
+        """
+        self.set_task_status(task_id, status, detail)
+        return True
+
+    def request_cancel(self, task_id: str) -> bool:
+        """Marca la cancelacion de una tarea activa que ejecuta otro proceso y retorna si la marco.
+
+        El estado en memoria es de un solo proceso, por eso por defecto no hay otro proceso que la ejecute.
+        """
+        return False
+
+    def set_cancel_listener(self, listener) -> None:
+        """Registra listener(task_id), que se llama cuando otro proceso pide cancelar una tarea de este."""
+        pass
     
     def _get_log_file(self):
-        return self.__log_file    
\ No newline at end of file
+        return self.__log_file    
+
+### repositorio de checkpoints: ventanas ya cargadas de cada tarea, para poder reanudarla. ###
+class CheckpointRepository(ABC):
+
+    @abstractmethod
+    def start_task(self, task_id: str, request: dict) -> None:
+        """Registra el request de una tarea nueva, descartando checkpoints anteriores."""
+        pass
+
+    @abstractmethod
+    def get_request(self, task_id: str) -> dict:
+        """Request original de la tarea, o None si no tiene checkpoints."""
+        pass
+
+    @abstractmethod
+    def mark_window_done(self, task_id: str, window_start, window_end, record_count: int) -> None:
+        """Registra de forma durable una ventana cuyas filas ya estan confirmadas en ml.*"""
+        pass
+
+    @abstractmethod
+    def get_completed_windows(self, task_id: str) -> list:
+        """Lista de (window_start, window_end, record_count) ya completadas."""
+        pass
+
+    @abstractmethod
+    def clear(self, task_id: str) -> None:
+        pass
+
+### repositorio de filas rechazadas (dead letter): filas que fallaron al cargar, para reprocesarlas. ###
+class DeadLetterRepository(ABC):
+
+    @abstractmethod
+    def add(self, task_id: str, row: dict, error: str) -> None:
+        """Registra de forma durable una fila que no se pudo cargar y el error que produjo."""
+        pass
+
+    @abstractmethod
+    def get_rows(self, task_id: str) -> list:
+        """Lista de (row, error) rechazadas de la tarea, sin repetir filas identicas."""
+        pass
+
+    @abstractmethod
+    def replace(self, task_id: str, records: list) -> None:
+        """Reemplaza las filas rechazadas por records (row, error), por ejemplo tras reprocesarlas."""
+        pass
+
+    def clear(self, task_id: str) -> None:
+        self.replace(task_id, [])
@@ -0,0 +1,178 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import text
+
+### Catalogo de las consultas de sql/: se leen y compilan una vez al iniciar, con estadisticas por consulta. ###
+
+# Directorio de las consultas; por defecto sql/ en la raiz del proyecto, sin depender del directorio de trabajo
+SQL_DIR = os.getenv(
+    "SQL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "sql")
+)
+# Duraciones recientes por consulta que se guardan para los percentiles
+QUERY_STATS_SAMPLES = int(os.getenv("QUERY_STATS_SAMPLES", "1024"))
+
+
+class QueryStats:
+    """Llamadas, errores, filas retornadas y latencia (ultimas samples duraciones) de una consulta."""
+
+    def __init__(self, samples: int = QUERY_STATS_SAMPLES):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self._latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, rows: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.rows += rows
+            self._latencies.append(seconds)
+
+    def record_error(self, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self._latencies.append(seconds)
+
+    def detail(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors, rows = self.calls, self.errors, self.rows
+        ok = calls - errors
+        return {
+            "calls": calls,
+            "errors": errors,
+            "rows": rows,
+            "avg_rows": round(rows / ok, 1) if ok else 0.0,
+            "latency_ms": {
+                "p50": _percentile_ms(latencies, 50),
+                "p95": _percentile_ms(latencies, 95),
+                "p99": _percentile_ms(latencies, 99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+        }
+
+
+def _percentile_ms(sorted_values: list, percentile: float) -> float:
+    """Percentil por rango mas cercano, en milisegundos."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return round(sorted_values[rank - 1] * 1000, 2)
+
+
+class CatalogQuery:
+    """Una consulta del catalogo: el text() compilado y los parametros que declara."""
+
+    def __init__(self, name: str, path: str, sql: str):
+        self.name = name
+        self.path = path
+        self.sql = sql
+        # El mismo objeto en cada llamada, asi SQLAlchemy reutiliza su compilacion en cache
+        self.statement = text(sql)
+        self.params = frozenset(self.statement.compile().params)
+        self.stats = QueryStats()
+        self._warned_unused = False
+
+    def bind(self, params: dict) -> dict:
+        """Valida params contra los parametros de la consulta y retorna solo los que usa.
+
+        Un parametro faltante es un ValueError. Los que la consulta no usa se descartan y se
+        registran una vez en el log.
+        """
+        missing = self.params - params.keys()
+        if missing:
+            raise ValueError(f"Faltan parametros para la consulta {self.name}: {', '.join(sorted(missing))}")
+        unused = params.keys() - self.params
+        if unused and not self._warned_unused:
+            self._warned_unused = True
+            logging.warning(f"La consulta {self.name} no usa los parametros: {', '.join(sorted(unused))}")
+        return {name: params[name] for name in self.params}
+
+
+class QueryCatalog:
+    """Consultas de un directorio, por nombre de archivo sin extension (p. ej. "licencias_2")."""
+
+    def __init__(self, queries: dict):
+        self._queries = queries
+
+    @classmethod
+    def load(cls, sql_dir: str = SQL_DIR) -> "QueryCatalog":
+        """Lee y compila todos los .sql de sql_dir; un archivo que no compila falla aqui y no en una solicitud."""
+        queries = {}
+        for file_name in sorted(os.listdir(sql_dir)):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".sql":
+                continue
+            path = os.path.join(sql_dir, file_name)
+            with open(path, "r") as file:
+                sql = file.read()
+            try:
+                queries[name] = CatalogQuery(name, path, sql)
+            except Exception as e:
+                raise ValueError(f"No se pudo compilar la consulta {path}: {e}")
+        logging.info(f"Catalogo de consultas cargado desde {sql_dir}: {', '.join(queries)}")
+        return cls(queries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def names(self) -> list:
+        return list(self._queries)
+
+    def get(self, name: str) -> CatalogQuery:
+        query = self._queries.get(name)
+        if query is None:
+            raise ValueError(f"Consulta no registrada en el catalogo: {name}")
+        return query
+
+    def execute(self, session, name: str, params: dict) -> list:
+        """Ejecuta la consulta name en session y registra latencia y filas (o el error)."""
+        query = self.get(name)
+        bound = query.bind(params)
+        start = time.perf_counter()
+        try:
+            rows = session.execute(query.statement, bound).fetchall()
+        except Exception:
+            query.stats.record_error(time.perf_counter() - start)
+            raise
+        query.stats.record(time.perf_counter() - start, len(rows))
+        return rows
+
+    def stream(self, session, name: str, params: dict, batch_size: int):
+        """Como execute, pero con cursor de servidor: genera las filas en bloques de batch_size.
+
+        La latencia registrada es la de toda la lectura (hasta el ultimo bloque o hasta que se cierra
+        el generador).
+        """
+        query = self.get(name)
+        bound = query.bind(params)
+        start = time.perf_counter()
+        rows = 0
+        failed = False
+        try:
+            # stream_results en la sentencia: la sesion no lo aplica a text() si va en execute()
+            result = session.execute(query.statement.execution_options(stream_results=True), bound)
+            for partition in result.partitions(batch_size):
+                rows += len(partition)
+                yield partition
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if failed:
+                query.stats.record_error(time.perf_counter() - start)
+            else:
+                query.stats.record(time.perf_counter() - start, rows)
+
+    def stats(self) -> dict:
+        return {name: query.stats.detail() for name, query in self._queries.items()}
+
+
+# Catalogo de la API, cargado al importar los servicios (al iniciar la aplicacion)
+catalog = QueryCatalog.load()
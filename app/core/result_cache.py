@@ -0,0 +1,289 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+### Cache de resultados de consultas de la API (LRU con TTL), invalidado al terminar una tarea ETL. ###
+
+# Backend: memory (por proceso), postgres (compartido entre workers y hosts) o none (sin cache)
+API_CACHE_BACKEND = os.getenv("API_CACHE_BACKEND", "memory")
+# Segundos que un resultado se considera vigente si antes no termina una tarea ETL
+API_CACHE_TTL_SECONDS = float(os.getenv("API_CACHE_TTL_SECONDS", "300"))
+# Resultados maximos en cache; al superarlo se descartan los menos usados
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "1024"))
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def cache_key(name: str, params: dict) -> str:
+    """Clave de la consulta name con params normalizados: sin espacios en los bordes, fechas ISO y orden fijo."""
+    normalized = json.dumps({key: _normalize(value) for key, value in params.items()}, sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+class MemoryCacheBackend:
+    """Resultados en un OrderedDict del proceso, en orden de uso; cada worker de uvicorn tiene el suyo."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Numero de invalidaciones; set() descarta los resultados leidos antes de la ultima."""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: str):
+        """Retorna (encontrado, valor)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value, ttl_seconds: float, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.time() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PostgresCacheBackend:
+    """Resultados en la tabla UNLOGGED ml.api_result_cache, compartida por todos los workers y hosts.
+
+    El uso se registra en la lectura (last_used) y al superar max_entries se eliminan los menos
+    usados. Los valores se guardan con pickle: la tabla solo la escribe la propia API. El numero de
+    invalidaciones vive en ml.api_result_cache_generation, para que set() descarte resultados
+    leidos antes de una invalidacion hecha por cualquier proceso.
+    """
+
+    def __init__(self, max_entries: int, session_factory=None):
+        if session_factory is None:
+            from app.core.database import SessionML
+            session_factory = SessionML
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _ensure_tables(self) -> None:
+        """Crea las tablas en el primer uso y no al importar: la API inicia aunque la base no responda."""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            self._create_tables()
+            self._ready = True
+
+    def _create_tables(self) -> None:
+        self._execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS ml.api_result_cache (
+                key text PRIMARY KEY,
+                value bytea NOT NULL,
+                expires_at timestamptz NOT NULL,
+                last_used timestamptz NOT NULL
+            )
+        """)
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS ml.api_result_cache_generation (
+                id boolean PRIMARY KEY DEFAULT true CHECK (id),
+                generation bigint NOT NULL
+            );
+            INSERT INTO ml.api_result_cache_generation (generation) VALUES (0) ON CONFLICT DO NOTHING
+        """)
+
+    def _execute(self, query: str, params: dict = None, fetch: bool = False):
+        session = self.session_factory()
+        try:
+            result = session.execute(text(query), params or {})
+            rows = result.fetchall() if fetch else None
+            session.commit()
+            return rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get(self, key: str):
+        self._ensure_tables()
+        rows = self._execute("""
+            UPDATE ml.api_result_cache SET last_used = now()
+            WHERE key = :key AND expires_at > now()
+            RETURNING value
+        """, {"key": key}, fetch=True)
+        if not rows:
+            return False, None
+        return True, pickle.loads(rows[0][0])
+
+    def generation(self) -> int:
+        self._ensure_tables()
+        return self._execute("SELECT generation FROM ml.api_result_cache_generation", fetch=True)[0][0]
+
+    def set(self, key: str, value, ttl_seconds: float, generation: int) -> None:
+        self._ensure_tables()
+        # TRUNCATE de clear() bloquea la tabla: el INSERT espera su commit y ve la nueva generacion
+        self._execute("""
+            INSERT INTO ml.api_result_cache (key, value, expires_at, last_used)
+            SELECT :key, :value, now() + make_interval(secs => :ttl), now()
+            WHERE (SELECT generation FROM ml.api_result_cache_generation) = :generation
+            ON CONFLICT (key) DO UPDATE SET
+                value = EXCLUDED.value, expires_at = EXCLUDED.expires_at, last_used = EXCLUDED.last_used
+        """, {"key": key, "value": pickle.dumps(value), "ttl": ttl_seconds, "generation": generation})
+        # Vencidos y, sobre el maximo, los menos usados
+        self._execute("""
+            DELETE FROM ml.api_result_cache WHERE expires_at <= now() OR key IN (
+                SELECT key FROM ml.api_result_cache ORDER BY last_used DESC OFFSET :max_entries
+            )
+        """, {"max_entries": self.max_entries})
+
+    def clear(self) -> None:
+        self._ensure_tables()
+        self._execute("""
+            TRUNCATE ml.api_result_cache;
+            UPDATE ml.api_result_cache_generation SET generation = generation + 1
+        """)
+
+    def __len__(self):
+        self._ensure_tables()
+        return self._execute("SELECT count(*) FROM ml.api_result_cache", fetch=True)[0][0]
+
+
+class ResultCache:
+    """Cache de resultados por consulta y parametros, con tasas de acierto.
+
+    Un resultado se guarda solo si no hubo una invalidacion mientras se calculaba: una consulta que
+    leyo ml.* antes de que terminara una tarea ETL no vuelve a dejar datos viejos en la cache.
+
+    Si el backend falla (p. ej. la base del backend postgres no responde) la consulta se ejecuta
+    igual y el error solo queda en el log.
+    """
+
+    def __init__(self, backend, ttl_seconds: float = API_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._hits = {}
+        self._misses = {}
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, name: str, params: dict, load):
+        """Retorna el resultado en cache de name con params, o lo calcula con load() y lo guarda."""
+        if self.backend is None:
+            return load()
+        key = cache_key(name, params)
+        try:
+            found, value = self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"Error al leer la cache de la consulta {name}: {e}")
+            found, value = False, None
+        self._count(self._hits if found else self._misses, name)
+        if found:
+            return value
+        try:
+            # Se lee antes de load(): si invalidate() ocurre durante la consulta, set() la descarta
+            generation = self.backend.generation()
+        except Exception as e:
+            logging.warning(f"Error al leer la cache de la consulta {name}: {e}")
+            return load()
+        value = load()
+        try:
+            self.backend.set(key, value, self.ttl_seconds, generation)
+        except Exception as e:
+            logging.warning(f"Error al guardar en la cache la consulta {name}: {e}")
+        return value
+
+    def invalidate(self) -> None:
+        """Descarta todos los resultados (los datos de ml.* cambiaron)."""
+        if self.backend is None:
+            return
+        self.backend.clear()
+        with self._lock:
+            self._invalidations += 1
+
+    def _count(self, counter: dict, name: str) -> None:
+        with self._lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            names = sorted(set(self._hits) | set(self._misses))
+            queries = {name: _rates(self._hits.get(name, 0), self._misses.get(name, 0)) for name in names}
+            total = _rates(sum(self._hits.values()), sum(self._misses.values()))
+            invalidations = self._invalidations
+        try:
+            entries = len(self.backend) if self.backend is not None else 0
+        except Exception:
+            entries = None
+        return {
+            "backend": API_CACHE_BACKEND if self.backend is not None else "none",
+            "ttl_seconds": self.ttl_seconds,
+            "entries": entries,
+            "invalidations": invalidations,
+            **total,
+            "queries": queries,
+        }
+
+
+def _rates(hits: int, misses: int) -> dict:
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "miss_rate": round(misses / total, 4) if total else 0.0,
+    }
+
+
+def build_result_cache() -> ResultCache:
+    """Crea la cache configurada en API_CACHE_BACKEND: memory, postgres o none.
+
+    Con uvicorn --workers N y memory cada worker tiene su cache y solo el que ejecuta la tarea ETL
+    la invalida; los demas dependen del TTL. postgres se invalida para todos.
+    """
+    if API_CACHE_BACKEND == "none":
+        return ResultCache(None)
+    if API_CACHE_BACKEND == "memory":
+        return ResultCache(MemoryCacheBackend(API_CACHE_MAX_ENTRIES))
+    if API_CACHE_BACKEND == "postgres":
+        return ResultCache(PostgresCacheBackend(API_CACHE_MAX_ENTRIES))
+    raise ValueError(f"Backend de cache no soportado: {API_CACHE_BACKEND}, use memory, postgres o none")
+
+
+# Cache de la API, compartida por los servicios y el ETL (que la invalida)
+result_cache = build_result_cache()
@@ -1,16 +1,14 @@
 from app.core.database import SessionML
-from sqlalchemy import text, exc
+from app.core.query_catalog import catalog
+from app.core.result_cache import result_cache
+from app.core.pagination import page_params, split_page, stream_params
+from app.core.license_export import API_STREAM_BATCH_SIZE
+from sqlalchemy import exc
 from app.models.request_models import LicenseRequest, RegionRequest
 from datetime import date, datetime
 from app.models.response_models import LicenseListResponse, LicenseDetail
 
 
-def read_sql_file(file_path: str) -> str:
-    """Lee una consulta SQL desde un archivo y la devuelve como un string."""
-    with open(file_path, "r") as file:
-        return file.read()
-
-
 def parse_dates(fecha_inicio: str, fecha_fin: str) -> tuple[date, date]:
     """Convierte las fechas de string a date, lanzando un error si el formato no es válido."""
     try:
@@ -121,12 +119,12 @@ def map_to_license_detail(row: dict) -> LicenseDetail:
         raise
 
 
-def execute_query(file_path: str, params: dict):
-    """Ejecuta una consulta SQL desde un archivo con parámetros proporcionados."""
+def execute_query(name: str, params: dict):
+    """Ejecuta una consulta del catálogo (archivo de sql/ sin extensión) con parámetros proporcionados."""
+    catalog.get(name).bind(params)
     session = SessionML()
-    query = read_sql_file(file_path)
     try:
-        result = session.execute(text(query), params).fetchall()
+        result = catalog.execute(session, name, params)
         return result
     except exc.SQLAlchemyError as e:
         session.rollback()
@@ -138,6 +136,52 @@ def execute_query(file_path: str, params: dict):
         session.close()
 
 
+def query_license_list(name: str, params: dict) -> LicenseListResponse:
+    """Ejecuta una consulta del catálogo que retorna licencias y las convierte en LicenseListResponse."""
+    result = execute_query(name, params)
+    if not result:
+        return LicenseListResponse(licenses=[])
+    licenses = [map_to_license_detail(row) for row in result if row]
+    licenses = [l for l in licenses if l]  # Filtrar None
+    return LicenseListResponse(licenses=licenses)
+
+
+def query_license_page(name: str, params: dict, cursor: str = None, limit: int = None) -> LicenseListResponse:
+    """Ejecuta una consulta paginada del catálogo (keyset por fecha_emision, id_lic) y retorna una página.
+
+    next_cursor es None en la última página. Sin cursor ni limit se retornan todas las licencias.
+    """
+    paging = page_params(cursor, limit)
+    result = execute_query(name, {**params, **paging})
+    rows, next_cursor = split_page(result, paging["limit"] - 1 if paging["limit"] is not None else None)
+    licenses = [map_to_license_detail(row) for row in rows if row]
+    licenses = [l for l in licenses if l]  # Filtrar None
+    return LicenseListResponse(licenses=licenses, next_cursor=next_cursor)
+
+
+def stream_license_query(name: str, params: dict, cursor: str = None, limit: int = None,
+                         batch_size: int = API_STREAM_BATCH_SIZE):
+    """Genera las licencias de una consulta paginada del catálogo en bloques, leídas con un cursor de servidor.
+
+    Sin limit se leen todas desde el cursor; en memoria queda un solo bloque de batch_size filas.
+    """
+    params = {**params, **stream_params(cursor, limit)}
+    session = SessionML()
+    try:
+        for rows in catalog.stream(session, name, params, batch_size):
+            yield [map_to_license_detail(row) for row in rows if row]
+    except exc.SQLAlchemyError as e:
+        raise ValueError(f"Error en la ejecución de la consulta SQL: {str(e)}")
+    finally:
+        session.close()
+
+
+def query_license_detail(name: str, params: dict) -> LicenseDetail:
+    """Como query_license_list, retornando solo la primera licencia (None si no hay)."""
+    licenses = query_license_list(name, params).licenses
+    return licenses[0] if licenses else None
+
+
 def get_total_licenses(data: LicenseRequest):
     """Obtiene el total de licencias por profesional y diagnóstico."""
     if not all([data.fecha_inicio, data.fecha_fin, data.folio]):
@@ -146,7 +190,7 @@ def get_total_licenses(data: LicenseRequest):
         )
 
     result = execute_query(
-        "./sql/licencias_1.sql",
+        "licencias_1",
         {
             "fecha_inicio": data.fecha_inicio,
             "fecha_fin": data.fecha_fin,
@@ -179,42 +223,32 @@ def get_total_licenses(data: LicenseRequest):
 
 
 def get_licenses_by_doctor(
-    rut_medico: str, fecha_inicio: str, fecha_fin: str
+    rut_medico: str, fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None
 ) -> LicenseListResponse:
     """Obtiene el listado de LM emitida por un médico."""
     fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
     try:
-        result = execute_query(
-            "./sql/licencias_2.sql",
-            {
-                "rut_medico": rut_medico,
-                "fecha_inicio": fecha_inicio,
-                "fecha_fin": fecha_fin,
-            },
+        params = {
+            "rut_medico": rut_medico,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+        }
+        return result_cache.get_or_load(
+            "licencias_2", {**params, "cursor": cursor, "limit": limit},
+            lambda: query_license_page("licencias_2", params, cursor, limit),
         )
-        if not result:
-            return LicenseListResponse(licenses=[])
-        licenses = [map_to_license_detail(row) for row in result if row]
-        licenses = [l for l in licenses if l]  # Filtrar None
-        return LicenseListResponse(licenses=licenses)
     except Exception as e:
         print(f"Error ejecutando la consulta get_licenses_by_doctor: {e}")
         raise
 
 
-def get_licenses_without_fundamento(fecha_inicio: str, fecha_fin: str):
-    """Obtiene el listado de LM sin fundamento médico en un rango de tiempo."""
+def get_licenses_without_fundamento(fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None):
+    """Obtiene el listado de LM sin fundamento médico en un rango de tiempo, por páginas."""
     fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
     try:
-        result = execute_query(
-            "./sql/licencias_3.sql", {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}
+        return query_license_page(
+            "licencias_3", {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}, cursor, limit
         )
-        licenses = []
-        if not result:
-            return LicenseListResponse(licenses=[])
-        licenses = [map_to_license_detail(row) for row in result if row]
-        licenses = [l for l in licenses if l]  # Filtrar None
-        return LicenseListResponse(licenses=licenses)
     except Exception as e:
         print(f"Error ejecutando la consulta get_licenses_by_doctor: {e}")
         raise
@@ -223,15 +257,10 @@ def get_licenses_without_fundamento(fecha_inicio: str, fecha_fin: str):
 def get_licenses_by_folio(folio: str) -> LicenseDetail:
     """Obtiene el listado de LM emitida por el folio."""
     try:
-        result = execute_query(
-            "./sql/licencias_7.sql",
-            {"folio": folio},
+        params = {"folio": folio}
+        return result_cache.get_or_load(
+            "licencias_7", params, lambda: query_license_detail("licencias_7", params)
         )
-        if not result:
-            return None
-        licenses = [map_to_license_detail(row) for row in result if row]
-        licenses = [l for l in licenses if l]  # Filtrar None
-        return licenses[0]
     except Exception as e:
         print(f"Error ejecutando la consulta get_licenses_by_doctor: {e}")
         raise
@@ -239,7 +268,7 @@ def get_licenses_by_folio(folio: str) -> LicenseDetail:
 
 def get_fundamento_indicator(folio: str):
     """Obtiene el indicador de fundamento médico de una LM."""
-    result = execute_query("./sql/licencias_4.sql", {"folio": folio})
+    result = execute_query("licencias_4", {"folio": folio})
     return result
 
 
@@ -248,7 +277,7 @@ def get_licenses_by_diagnosis(cod_diagnostico: str, fecha_inicio: str, fecha_fin
     fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
 
     result = execute_query(
-        "./sql/licencias_5.sql",
+        "licencias_5",
         {
             "cod_diagnostico": cod_diagnostico,
             "fecha_inicio": fecha_inicio,
@@ -263,7 +292,7 @@ def get_licenses_by_region(comuna_reposo: str, fecha_inicio: str, fecha_fin: str
     fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
 
     result = execute_query(
-        "./sql/licencias_6.sql",
+        "licencias_6",
         {
             "comuna_reposo": comuna_reposo,
             "fecha_inicio": fecha_inicio,
@@ -274,47 +303,79 @@ def get_licenses_by_region(comuna_reposo: str, fecha_inicio: str, fecha_fin: str
 
 
 def get_licenses_by_trabajador(
-    rut_trabajador: str, fecha_inicio: str, fecha_fin: str
+    rut_trabajador: str, fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None
 ) -> LicenseListResponse:
     """Obtiene el listado de LM emitida para un trabajador."""
     try:
         fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
-        result = execute_query(
-            "./sql/licencias_8.sql",
-            {
-                "rut_trabajador": rut_trabajador,
-                "fecha_inicio": fecha_inicio,
-                "fecha_fin": fecha_fin,
-            },
+        params = {
+            "rut_trabajador": rut_trabajador,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+        }
+        return result_cache.get_or_load(
+            "licencias_8", {**params, "cursor": cursor, "limit": limit},
+            lambda: query_license_page("licencias_8", params, cursor, limit),
         )
-        if not result:
-            return LicenseListResponse(licenses=[])
-        licenses = [map_to_license_detail(row) for row in result if row]
-        licenses = [l for l in licenses if l]  # Filtrar None
-        return LicenseListResponse(licenses=licenses)
     except Exception as e:
         print(f"Error ejecutando la consulta get_licenses_by_doctor: {e}")
         raise
 
 def get_licenses_by_diagnostico(
-    codigo_diagnostico_pronunciamiento: str, fecha_inicio: str, fecha_fin: str
+    codigo_diagnostico_pronunciamiento: str, fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None
 ) -> LicenseListResponse:
     """Obtiene el listado de LM emitida para un trabajador."""
     try:
         fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
-        result = execute_query(
-            "./sql/licencias_9.sql",
+        return query_license_page(
+            "licencias_9",
             {
                 "codigo_diagnostico_pronunciamiento": codigo_diagnostico_pronunciamiento,
                 "fecha_inicio": fecha_inicio,
                 "fecha_fin": fecha_fin,
             },
+            cursor,
+            limit,
         )
-        if not result:
-            return LicenseListResponse(licenses=[])
-        licenses = [map_to_license_detail(row) for row in result if row]
-        licenses = [l for l in licenses if l]  # Filtrar None
-        return LicenseListResponse(licenses=licenses)
     except Exception as e:
         print(f"Error ejecutando la consulta get_licenses_by_doctor: {e}")
         raise
+
+
+def stream_licenses_by_doctor(rut_medico: str, fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None):
+    """Versión en streaming de get_licenses_by_doctor (bloques de LicenseDetail)."""
+    fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
+    return stream_license_query(
+        "licencias_2", {"rut_medico": rut_medico, "fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}, cursor, limit
+    )
+
+
+def stream_licenses_without_fundamento(fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None):
+    """Versión en streaming de get_licenses_without_fundamento."""
+    fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
+    return stream_license_query("licencias_3", {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}, cursor, limit)
+
+
+def stream_licenses_by_trabajador(rut_trabajador: str, fecha_inicio: str, fecha_fin: str, cursor: str = None, limit: int = None):
+    """Versión en streaming de get_licenses_by_trabajador."""
+    fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
+    return stream_license_query(
+        "licencias_8", {"rut_trabajador": rut_trabajador, "fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin},
+        cursor, limit,
+    )
+
+
+def stream_licenses_by_diagnostico(codigo_diagnostico_pronunciamiento: str, fecha_inicio: str, fecha_fin: str,
+                                   cursor: str = None, limit: int = None):
+    """Versión en streaming de get_licenses_by_diagnostico."""
+    fecha_inicio, fecha_fin = parse_dates(fecha_inicio, fecha_fin)
+    return stream_license_query(
+        "licencias_9",
+        {
+            "codigo_diagnostico_pronunciamiento": codigo_diagnostico_pronunciamiento,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+        },
+        cursor,
+        limit,
+    )
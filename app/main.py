@@ -1,6 +1,8 @@
 # app/main.py
 from fastapi import FastAPI
 from app.api.endpoints import router
+from app.core.db_executor import shutdown_db_executor
+from app.core.etl_services import default_rules_client
 from app.scheduler.cron_etl import run_cron_scheduler, start_scheduled_etl
 
 app = FastAPI()
@@ -9,5 +11,9 @@ app = FastAPI()
 run_cron_scheduler(start_scheduled_etl)
 # Incluir los endpoints
 app.include_router(router)
+# Esperar las consultas en curso del executor de base de datos al detener la aplicacion
+app.router.add_event_handler("shutdown", shutdown_db_executor)
+# Cerrar el event loop y la sesion HTTP del cliente de la API de reglas
+app.router.add_event_handler("shutdown", default_rules_client.close)
 
 
@@ -19,6 +19,9 @@ class LicenseByRangeDateRequest(BaseModel):
 class NoFundamentoRequest(BaseModel):
     fecha_inicio: str
     fecha_fin: str
+    # Paginacion: next_cursor de la respuesta anterior y licencias por pagina
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 class FundamentoIndicatorRequest(BaseModel):
     folio: str
@@ -38,20 +41,28 @@ class DoctorLicenseByRangeDateRequest(BaseModel):
     rut_medico: str
     fecha_inicio: Optional[str] = "1900-01-01"  
     fecha_fin: Optional[str] = None  
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 class TrabajadorLicenseByRangeDateRequest(BaseModel):
     rut_trabajador: str
     fecha_inicio: Optional[str] = "1900-01-01" 
     fecha_fin: Optional[str] = None  
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 class DiagnosticoLicenseByRangeDateRequest(BaseModel):
     codigo_diagnostico_pronunciamiento: str
     fecha_inicio: Optional[str] = "1900-01-01"  
     fecha_fin: Optional[str] = None  
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 ### CARGA ETL ###
 
 
 class ETLRequest(BaseModel):
     start_date: str
-    end_date: str
\ No newline at end of file
+    end_date: str
+    # Mayor valor sale antes de la cola de tareas; no forma parte del id de la tarea
+    priority: int = 0
\ No newline at end of file
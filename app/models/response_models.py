@@ -65,6 +65,8 @@ class LicenseDetail(BaseModel):
 
 class LicenseListResponse(BaseModel):
     licenses: List[LicenseDetail]
+    # Cursor de la pagina siguiente en los listados paginados; None en la ultima
+    next_cursor: Optional[str] = None
 
     class Config:
         # Actualización a 'from_attributes' en lugar de 'orm_mode'
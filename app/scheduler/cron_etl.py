@@ -7,7 +7,7 @@ from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from pathlib import Path
 from app.core.etl_services import ETLService
-from app.core.ports.adapters import InMemoryTaskRepository
+from app.core.ports.adapters import build_task_repository
 from app.core.ports.etl import TaskRepository
 from app.models.request_models import ETLRequest
 
@@ -74,7 +74,7 @@ def start_scheduled_etl():
 
     etl_request = ETLRequest(start_date=start_date, end_date=end_date)
 
-    task_repo = InMemoryTaskRepository("cron_etl.log")
+    task_repo = build_task_repository("cron_etl.log")
 
     #con config_log=True , para que separe el log definido, es decir filename="cron_etl.log"  
     etl_service = ETLService(task_repository=task_repo, config_log=True)
@@ -0,0 +1,176 @@
+# app/tests/test_adapters.py
+import time
+from datetime import datetime
+
+from app.core.ports.adapters import (
+    FileCheckpointRepository, InMemoryTaskRepository, PostgresTaskRepository, SqliteTaskRepository,
+)
+
+
+def test_checkpoints_en_archivo_sobreviven_a_una_nueva_instancia(tmp_path):
+    repo = FileCheckpointRepository(str(tmp_path))
+    repo.start_task("t1", {"start_date": "2025-02-14", "end_date": "2025-02-16"})
+    repo.mark_window_done("t1", datetime(2025, 2, 14, 0), datetime(2025, 2, 14, 1), 42)
+
+    reopened = FileCheckpointRepository(str(tmp_path))
+    assert reopened.get_request("t1") == {"start_date": "2025-02-14", "end_date": "2025-02-16"}
+    assert reopened.get_completed_windows("t1") == [(datetime(2025, 2, 14, 0), datetime(2025, 2, 14, 1), 42)]
+
+    # Iniciar de nuevo la tarea descarta los checkpoints anteriores
+    reopened.start_task("t1", {"start_date": "2025-02-14", "end_date": "2025-02-16"})
+    assert reopened.get_completed_windows("t1") == []
+
+    reopened.clear("t1")
+    assert reopened.get_request("t1") is None
+
+
+def test_sqlite_comparte_estado_y_evita_tareas_duplicadas(tmp_path):
+    db_path = str(tmp_path / "tasks.sqlite3")
+    worker_1 = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+    worker_2 = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+
+    assert worker_1.create_task_if_absent("t1", "initial", {"idtask": "t1"})
+    assert not worker_2.create_task_if_absent("t1", "initial", {"idtask": "t1"})
+    assert worker_2.get_task_status("t1") == {"Status": "initial", "detail": {"idtask": "t1"}}
+
+
+def test_sqlite_coalesce_escrituras_in_process(tmp_path):
+    db_path = str(tmp_path / "tasks.sqlite3")
+    worker_1 = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+    worker_2 = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+
+    worker_1.set_task_status("t1", "in process", {"record_process": 10})
+    worker_1.set_task_status("t1", "in process", {"record_process": 20})
+    # El proceso que ejecuta ve el ultimo avance, los demas el ultimo persistido
+    assert worker_1.get_task_status("t1")["detail"] == {"record_process": 20}
+    assert worker_2.get_task_status("t1")["detail"] == {"record_process": 10}
+
+    # Un cambio de estado siempre se persiste
+    worker_1.set_task_status("t1", "finish", {"record_process": 30})
+    assert worker_2.get_task_status("t1") == {"Status": "finish", "detail": {"record_process": 30}}
+
+
+def test_sqlite_ttl(tmp_path):
+    repo = SqliteTaskRepository("etl.log", str(tmp_path / "tasks.sqlite3"), ttl_seconds=0.05, write_interval=0)
+    repo.set_task_status("t1", "finish", {})
+    time.sleep(0.1)
+    assert repo.get_task_status("t1") is None
+    assert repo.create_task_if_absent("t1", "initial", {})
+
+
+def test_memoria_evicta_por_ttl(monkeypatch):
+    repo = InMemoryTaskRepository("etl.log", ttl_seconds=10)
+    repo.set_task_status("t1", "finish", {})
+    later = time.monotonic() + 3600
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    repo.set_task_status("t2", "initial", {})
+    assert repo.get_task_status("t1") is None
+    assert repo.get_task_status("t2") is not None
+
+
+def test_sqlite_ttl_no_elimina_tareas_activas(tmp_path):
+    repo = SqliteTaskRepository("etl.log", str(tmp_path / "tasks.sqlite3"), ttl_seconds=0.05, write_interval=0)
+    repo.set_task_status("t1", "in process", {"record_process": 10})
+    repo.set_task_status("t2", "finish", {})
+    time.sleep(0.1)
+    repo._delete_older_than(time.time() - repo.ttl_seconds)
+    assert repo.get_task_status("t1") == {"Status": "in process", "detail": {"record_process": 10}}
+    assert repo.get_task_status("t2") is None
+    assert not repo.create_task_if_absent("t1", "initial", {})
+
+
+def test_memoria_no_evicta_tareas_activas(monkeypatch):
+    repo = InMemoryTaskRepository("etl.log", ttl_seconds=10)
+    repo.set_task_status("t1", "queued", {})
+    later = time.monotonic() + 3600
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    repo.set_task_status("t2", "initial", {})
+    assert repo.get_task_status("t1") is not None
+
+
+def test_sqlite_tarea_abandonada_se_puede_tomar(tmp_path):
+    db_path = str(tmp_path / "tasks.sqlite3")
+    crashed = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60,
+                                   lease_seconds=0.05, heartbeat_interval=3600)
+    worker = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60, lease_seconds=0.05)
+
+    crashed.set_task_status("t1", "in process", {"record_process": 10})
+    assert not worker.is_abandoned("t1")
+    assert not worker.take_over_task("t1", "queued", {"resumed": True})
+
+    # Sin heartbeat el lease expira
+    time.sleep(0.1)
+    assert worker.is_abandoned("t1")
+    assert worker.take_over_task("t1", "queued", {"resumed": True})
+    assert crashed.get_task_status("t1") == {"Status": "queued", "detail": {"resumed": True}}
+    assert not worker.is_abandoned("t1")
+
+
+def test_sqlite_heartbeat_renueva_el_lease(tmp_path):
+    db_path = str(tmp_path / "tasks.sqlite3")
+    running = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60,
+                                   lease_seconds=0.3, heartbeat_interval=0.05)
+    other = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60, lease_seconds=0.3)
+
+    running.set_task_status("t1", "execute_rn", {})
+    time.sleep(0.6)
+    assert not other.is_abandoned("t1")
+
+    # Una tarea terminada deja de renovarse, pero tampoco queda abandonada
+    running.set_task_status("t1", "finish", {})
+    time.sleep(0.4)
+    assert not other.is_abandoned("t1")
+    assert other.take_over_task("t1", "queued", {"resumed": True})
+
+
+def test_postgres_crea_la_tabla_en_el_primer_uso():
+    statements = []
+
+    class FakeResult:
+        rowcount = 0
+
+        def fetchall(self):
+            return []
+
+    class FakeSession:
+        def execute(self, statement, params=None):
+            statements.append(" ".join(str(statement).split()))
+            return FakeResult()
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    repository = PostgresTaskRepository("etl.log", ttl_seconds=3600, write_interval=60, session_factory=FakeSession)
+    assert statements == []
+
+    assert repository.get_task_status("t1") is None
+    assert repository.get_task_status("t1") is None
+    ddl = [statement for statement in statements if statement.startswith(("CREATE", "ALTER"))]
+    assert len(ddl) == 2
+    assert ddl[0].startswith("CREATE TABLE IF NOT EXISTS ml.etl_task_status ")
+    assert sum(statement.startswith("SELECT status, detail") for statement in statements) == 2
+
+
+def test_sqlite_cancelacion_pedida_por_otro_proceso(tmp_path):
+    db_path = str(tmp_path / "tasks.sqlite3")
+    running = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60, heartbeat_interval=0.05)
+    other = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+    cancelled = []
+    running.set_cancel_listener(cancelled.append)
+
+    running.set_task_status("t1", "in process", {})
+    running.set_task_status("t2", "in process", {})
+    assert other.request_cancel("t1")
+    time.sleep(0.3)
+    assert set(cancelled) == {"t1"}
+
+    # Una tarea terminada no se marca, y al retomarla la marca anterior se descarta
+    running.set_task_status("t1", "cancelled", {})
+    assert not other.request_cancel("t1")
+    cancelled.clear()
+    assert running.take_over_task("t1", "queued", {})
+    time.sleep(0.3)
+    assert cancelled == []
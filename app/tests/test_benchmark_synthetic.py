@@ -0,0 +1,30 @@
+from collections import Counter
+
+from benchmarks.synthetic import SABANA_COLUMNS, SyntheticConfig, generate_rows
+
+
+def test_generador_es_determinista_y_completo():
+    config = SyntheticConfig(rows=500, medicos=50, seed=7)
+    rows = list(generate_rows(config))
+    assert rows == list(generate_rows(config))
+    assert len(rows) == 500
+    assert set(rows[0]) == set(SABANA_COLUMNS)
+
+
+def test_generador_respeta_duplicados_cardinalidad_y_rango():
+    config = SyntheticConfig(rows=5000, especialidades=8, medicos=100, duplicate_rate=0.2, days=2)
+    rows = list(generate_rows(config))
+    duplicated = len(rows) - len({row["id_lic"] for row in rows})
+    assert 0.15 < duplicated / len(rows) < 0.25
+    especialidades = {row["especialidad_profesional"] for row in rows} - {"-", None}
+    assert len(especialidades) <= 8
+    assert all(config.start_date <= row["fecha_emision"].date() <= config.end_date for row in rows)
+
+
+def test_date_skew_concentra_filas_en_pocas_horas():
+    def top_hour_share(skew):
+        rows = list(generate_rows(SyntheticConfig(rows=3000, duplicate_rate=0, date_skew=skew)))
+        hours = Counter(row["fecha_emision"].replace(minute=0, second=0) for row in rows)
+        return hours.most_common(1)[0][1] / len(rows)
+
+    assert top_hour_share(1.5) > 5 * top_hour_share(0.0)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+from app.core import db_executor
+from app.core.db_executor import iterate_in_db, run_in_db, shutdown_db_executor
+
+
+def test_run_in_db_no_bloquea_el_event_loop():
+    def consulta_lenta(segundos, etiqueta=None):
+        time.sleep(segundos)
+        return etiqueta, threading.current_thread().name
+
+    async def main():
+        ticks = 0
+
+        async def latido():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tarea = asyncio.create_task(latido())
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(run_in_db(consulta_lenta, 0.2, etiqueta=i) for i in range(4)))
+        duracion = time.perf_counter() - inicio
+        tarea.cancel()
+        return resultados, duracion, ticks
+
+    resultados, duracion, ticks = asyncio.run(main())
+    try:
+        assert [etiqueta for etiqueta, _ in resultados] == [0, 1, 2, 3]
+        assert all(hilo.startswith("db") for _, hilo in resultados)
+        # Las cuatro consultas corren en paralelo y el loop sigue atendiendo otras corrutinas
+        assert duracion < 0.6
+        assert ticks >= 5
+    finally:
+        shutdown_db_executor()
+
+
+def test_executor_acotado_por_db_executor_workers(monkeypatch):
+    monkeypatch.setattr(db_executor, "DB_EXECUTOR_WORKERS", 2)
+    shutdown_db_executor()
+    activos = 0
+    maximo = 0
+    lock = threading.Lock()
+
+    def consulta():
+        nonlocal activos, maximo
+        with lock:
+            activos += 1
+            maximo = max(maximo, activos)
+        time.sleep(0.05)
+        with lock:
+            activos -= 1
+
+    async def main():
+        await asyncio.gather(*(run_in_db(consulta) for _ in range(6)))
+
+    try:
+        asyncio.run(main())
+        assert maximo == 2
+    finally:
+        shutdown_db_executor()
+
+
+def test_iterate_in_db_cierra_el_iterador_si_se_deja_de_consumir():
+    cerrado = threading.Event()
+    hilos = set()
+
+    def filas():
+        try:
+            for i in range(100):
+                hilos.add(threading.current_thread().name)
+                yield i
+        finally:
+            cerrado.set()
+
+    async def main():
+        recibidas = []
+        body = iterate_in_db(filas())
+        async for fila in body:
+            recibidas.append(fila)
+            if len(recibidas) == 3:
+                break
+        await body.aclose()
+        return recibidas
+
+    try:
+        assert asyncio.run(main()) == [0, 1, 2]
+        assert cerrado.wait(5)
+        assert all(hilo.startswith("db") for hilo in hilos)
+    finally:
+        shutdown_db_executor()
@@ -0,0 +1,53 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from app.core import etl_columnar
+from app.core.etl_loader import STAGING_COLUMNS
+
+
+def test_transforma_bloque_y_marca_columnas_numeric():
+    batch = etl_columnar.record_batch_from_rows(
+        [("1", "No", "45"), ("2", "Si", None), ("3", None, "3.50")],
+        ["id_lic", "empleador_adscrito", "edad_trabajador"],
+        numeric_columns=("edad_trabajador",),
+    )
+    field = batch.schema.field("edad_trabajador")
+    assert field.type == pa.string()
+    assert field.metadata == etl_columnar.NUMERIC_METADATA
+
+    transformed = etl_columnar.transform_record_batch(batch)
+    # Solo "No" queda en 0, igual que la transformacion por fila
+    assert transformed.column(1).to_pylist() == [0, 1, 1]
+    assert transformed.column(2).to_pylist() == ["45", None, "3.50"]
+
+
+def test_mapea_columna_por_valores_distintos():
+    column = pa.chunked_array([["Cirugia", None], ["Cirugia", "Pediatria"]])
+    normalizadas = etl_columnar.distinct_descriptions(column, lambda value: value and value.upper())
+    assert normalizadas == {"Cirugia": "CIRUGIA", None: None, "Pediatria": "PEDIATRIA"}
+
+    ids = etl_columnar.map_column(column, {"Cirugia": 7, "Pediatria": 9}, pa.int64())
+    assert ids.to_pylist() == [7, None, 7, 9]
+
+
+def test_marca_primera_fila_de_cada_licencia_reclamada():
+    ids = pa.chunked_array([["a", "b"], ["a", "c", "b"]])
+    mask = etl_columnar.first_claimed_mask(ids, {"a", "b"})
+    assert mask.to_pylist() == [True, True, False, False, False]
+    assert etl_columnar.first_claimed_mask(ids, set()).to_pylist() == [False] * 5
+
+
+def test_tabla_staging_en_orden_y_csv_para_copy():
+    rows = [tuple(f"{name}_{index}" for name in STAGING_COLUMNS) for index in range(2)]
+    batch = etl_columnar.record_batch_from_rows(rows, list(STAGING_COLUMNS))
+    table = etl_columnar.concat_batches([batch])
+    ids = pa.array([1, None], type=pa.int64())
+    staged = etl_columnar.staging_table(table, ids, ids, pa.array([True, False]), "lote-1")
+    assert staged.column_names == list(STAGING_COLUMNS)
+    assert staged.column("lote").to_pylist() == ["lote-1", "lote-1"]
+
+    lines = etl_columnar.copy_csv_buffer(staged).read().decode().splitlines()
+    assert len(lines) == 2
+    # NULL queda como campo vacio sin comillas y el texto entre comillas
+    assert lines[1].endswith('"especialidad_profesional_1",,,false,"lote-1"')
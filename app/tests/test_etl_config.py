@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.etl_config import LOAD_MODE_STAGING, EtlConfig
+
+
+def test_from_env_lee_las_variables_y_usa_los_valores_por_defecto():
+    config = EtlConfig.from_env({
+        "ETL_LOAD_MODE": "staging", "ETL_BATCH_SIZE": "250", "ETL_DELTA": "true", "ETL_WORKERS": "4",
+        "ETL_DEDUP": "lru", "ETL_DEDUP_BLOOM_ERROR_RATE": "0.01", "ETL_CHECKPOINT_DIR": "/tmp/checkpoints",
+    })
+    assert (config.load_mode, config.batch_size, config.delta, config.workers) == (LOAD_MODE_STAGING, 250, True, 4)
+    assert config.dedup_kind == "lru" and config.dedup_bloom_error_rate == 0.01
+    assert config.checkpoint_dir == "/tmp/checkpoints"
+    # Sin variable, el valor por defecto del campo
+    assert config.fetch_size == EtlConfig().fetch_size == 5000
+    assert not config.passthrough and config.rules_mode == "final"
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"load_mode": "otro"}, "Modo de carga"),
+    ({"delta": True}, "delta requiere"),
+    ({"passthrough": True}, "directa requiere"),
+    ({"load_mode": "staging", "passthrough": True, "pipeline": True}, "no se combina"),
+    ({"load_mode": "staging", "passthrough": True, "snapshot_format": "parquet"}, "snapshot csv"),
+    ({"dedup_kind": "otro"}, "Deduplicacion"),
+    ({"load_mode": "staging", "delta": True, "dedup_kind": "bloom"}, "bloom"),
+    ({"rules_mode": "otro"}, "Modo de reglas"),
+])
+def test_rechaza_combinaciones_no_admitidas(values, message):
+    with pytest.raises(ValueError, match=message):
+        EtlConfig(**values)
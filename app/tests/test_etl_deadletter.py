@@ -0,0 +1,67 @@
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+import pytest
+
+from app.core.etl_deadletter import load_isolating
+from app.core.ports.adapters import FileDeadLetterRepository
+
+
+class FakeLoader:
+    """Carga todo el bloque o nada, como una transaccion, y falla si contiene una fila mala."""
+
+    def __init__(self, bad):
+        self.bad = bad
+        self.loaded = []
+        self.calls = 0
+
+    def __call__(self, rows):
+        self.calls += 1
+        for row in rows:
+            if row["id_lic"] in self.bad:
+                raise ValueError(f"valor invalido en {row['id_lic']}")
+        self.loaded.extend(row["id_lic"] for row in rows)
+
+
+def test_biseca_el_lote_y_rechaza_solo_las_filas_con_error():
+    rows = [{"id_lic": str(i)} for i in range(16)]
+    loader = FakeLoader(bad={"3", "12"})
+    rejected = []
+
+    count = load_isolating(rows, loader, lambda row, error: rejected.append((row["id_lic"], str(error))))
+
+    assert count == 2
+    assert rejected == [("3", "valor invalido en 3"), ("12", "valor invalido en 12")]
+    assert sorted(loader.loaded, key=int) == [str(i) for i in range(16) if i not in (3, 12)]
+    # Dos filas malas en 16: bastante menos cargas que una por fila
+    assert loader.calls < 16
+
+
+def test_error_de_conexion_no_se_aisla():
+    def load(rows):
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    with pytest.raises(psycopg2.OperationalError):
+        load_isolating([{"id_lic": "1"}, {"id_lic": "2"}], load, lambda row, error: None)
+
+
+def test_repositorio_en_archivo_guarda_y_reemplaza_filas(tmp_path):
+    repository = FileDeadLetterRepository(str(tmp_path))
+    row = {"id_lic": "1", "fecha_emision": datetime(2025, 2, 1, 10, 30), "edad_trabajador": Decimal("45")}
+    repository.add("t1", row, "error 1")
+    # Una ventana reanudada puede rechazar la misma fila de nuevo
+    repository.add("t1", row, "error 2")
+    repository.add("t1", {"id_lic": "2"}, "error 3")
+
+    records = repository.get_rows("t1")
+    assert records == [
+        ({"id_lic": "1", "fecha_emision": "2025-02-01 10:30:00", "edad_trabajador": "45"}, "error 2"),
+        ({"id_lic": "2"}, "error 3"),
+    ]
+
+    repository.replace("t1", records[1:])
+    assert repository.get_rows("t1") == [({"id_lic": "2"}, "error 3")]
+    repository.clear("t1")
+    assert repository.get_rows("t1") == []
+    assert repository.get_rows("otra") == []
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from app.core.etl_dedup import BloomDedup, ExactDedup, LruDedup, TaskDedup, build_dedup_filter
+
+
+def test_exact_reclama_una_vez_y_libera():
+    dedup = ExactDedup()
+    assert dedup.claim(["L1", "L2", "L1"]) == ["L1", "L2"]
+    assert dedup.claim(["L2", "L3"]) == ["L3"]
+    before = dedup.memory_bytes()
+    dedup.release(["L3"])
+    assert dedup.memory_bytes() < before
+    assert dedup.claim(["L3"]) == ["L3"]
+    assert dedup.detail()["entries"] == 3
+
+
+def test_pares_de_medico_distinguen_especialidad():
+    # Un medico ya visto con otra especialidad debe registrarse igual
+    dedup = ExactDedup()
+    assert dedup.claim([("1-9", 1)]) == [("1-9", 1)]
+    assert dedup.claim([("1-9", 2)]) == [("1-9", 2)]
+    assert dedup.claim([("1-9", 1)]) == []
+
+
+def test_lru_acota_las_entradas():
+    dedup = LruDedup(max_entries=2)
+    dedup.claim(["L1", "L2"])
+    dedup.claim(["L1"])  # L1 pasa a ser la mas reciente
+    dedup.claim(["L3"])
+    assert len(dedup) == 2
+    assert dedup.claim(["L1"]) == []
+    assert dedup.claim(["L2"]) == ["L2"]
+
+
+def test_bloom_confirma_positivos_en_la_base():
+    consultas = []
+
+    def exists(keys):
+        consultas.append(list(keys))
+        return {"L1"}
+
+    dedup = BloomDedup(capacity=1000, error_rate=0.01, exists=exists)
+    assert dedup.claim(["L1", "L2"]) == ["L1", "L2"]
+    # Reclamadas y sin commit: se descartan sin ir a la base
+    assert dedup.claim(["L1"]) == []
+    assert consultas == []
+
+    dedup.confirm(["L1", "L2"])
+    assert dedup.claim(["L1", "L2"]) == ["L2"]
+    assert consultas == [["L1", "L2"]]
+
+
+def test_bloom_consulta_exists_sin_el_lock_y_revisa_al_volver():
+    dedup = BloomDedup(capacity=1000, error_rate=0.01)
+    dedup.claim(["L1", "L2"])
+    dedup.confirm(["L1", "L2"])
+    otro_worker = []
+    consultas = []
+
+    def exists(keys):
+        consultas.append(list(keys))
+        if len(consultas) == 1:
+            # Mientras se consulta la base otro worker reclama y confirma L2
+            worker = threading.Thread(target=lambda: otro_worker.append(dedup.claim(["L2"])))
+            worker.start()
+            worker.join(timeout=5)
+            assert not worker.is_alive()
+            dedup.confirm(["L2"])
+        return set()
+
+    dedup.exists = exists
+    assert dedup.claim(["L1", "L2"]) == ["L1"]
+    assert otro_worker == [["L2"]]
+    assert consultas == [["L1", "L2"], ["L2"]]
+
+
+def test_bloom_memoria_fija():
+    dedup = BloomDedup(capacity=10000, error_rate=0.001)
+    before = dedup.memory_bytes()
+    dedup.claim([f"L{i}" for i in range(5000)])
+    dedup.confirm([f"L{i}" for i in range(5000)])
+    assert dedup.memory_bytes() == before
+    # Sin exists los positivos son duplicados; con 0.1% casi ninguna clave nueva se pierde
+    nuevas = dedup.claim([f"N{i}" for i in range(1000)])
+    assert len(nuevas) >= 990
+
+
+def test_build_dedup_filter():
+    assert isinstance(build_dedup_filter("lru", lru_size=10), LruDedup)
+    with pytest.raises(ValueError):
+        build_dedup_filter("cuckoo")
+    task = TaskDedup(ExactDedup(), ExactDedup())
+    assert set(task.detail()) == {"licencias", "medicos"}
@@ -0,0 +1,57 @@
+# app/tests/test_etl_dimensions.py
+from app.core.etl_dimensions import DimensionCache, normalizar_especialidad, normalizar_profesionalidad
+
+
+class FakeSession:
+    """Sesion minima que registra las sentencias y responde con filas preparadas."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+        return self.responses.pop(0) if self.responses else []
+
+
+def test_normalizacion_de_dimensiones():
+    assert normalizar_especialidad(None) == "No Informada"
+    assert normalizar_especialidad("-") == "No Informada"
+    assert normalizar_especialidad("medicina general") == "Medicina General"
+    assert normalizar_profesionalidad(" ") == "No Informada"
+    assert normalizar_profesionalidad(2) == "2"
+
+
+def test_resolve_inserta_solo_descripciones_nuevas_en_un_lote():
+    cache = DimensionCache("ml.profesionalidad", "id_profesionalidad", "descripcion_profesionalidad")
+    cache.load(FakeSession([[(1, "Medico")]]))
+
+    session = FakeSession([[(2, "Dentista"), (3, "Matrona")]])
+    ids = cache.resolve(session, {"Medico", "Dentista", "Matrona"})
+
+    assert ids == {"Medico": 1, "Dentista": 2, "Matrona": 3}
+    assert len(session.statements) == 1
+    assert session.statements[0][1] == {"descripciones": ["Dentista", "Matrona"]}
+
+    # Los ids nuevos entran a la cache solo despues del commit de quien llama
+    assert cache.get("Dentista") is None
+    cache.remember(ids)
+
+    session = FakeSession([])
+    assert cache.resolve(session, ["Dentista"]) == {"Dentista": 2}
+    assert session.statements == []
+
+
+def test_resolve_revertido_no_deja_ids_en_cache():
+    cache = DimensionCache("ml.profesionalidad", "id_profesionalidad", "descripcion_profesionalidad")
+    cache.load(FakeSession([[(1, "Medico")]]))
+
+    # La transaccion se revierte: no se llama a remember()
+    assert cache.resolve(FakeSession([[(2, "Dentista")]]), ["Dentista"]) == {"Dentista": 2}
+    assert cache.get("Dentista") is None
+    assert len(cache) == 1
+
+    # El siguiente intento vuelve a insertar y obtiene el id real
+    session = FakeSession([[(5, "Dentista")]])
+    assert cache.resolve(session, ["Dentista", "Medico"]) == {"Dentista": 5, "Medico": 1}
+    assert session.statements[0][1] == {"descripciones": ["Dentista"]}
@@ -0,0 +1,132 @@
+import threading
+from datetime import datetime
+
+from app.core.etl_config import EtlConfig
+from app.core.etl_extract import PreparedExtraction, summarize_plan
+from app.core.etl_pipeline import Batch, WindowDone
+from app.core.etl_progress import EtlProgress
+from app.core.etl_services import EXTRACTION_QUERY, ETLService
+from app.core.ports.adapters import InMemoryTaskRepository
+
+
+class FakeCursor:
+    def __init__(self, executed, result=None):
+        self.executed = executed
+        self.result = result
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, result=None):
+        self.executed = []
+        self.result = result
+
+    def cursor(self):
+        return FakeCursor(self.executed, self.result)
+
+
+def test_prepara_una_vez_y_ejecuta_con_parametros():
+    extraction = PreparedExtraction("SELECT * FROM t WHERE f BETWEEN %(start_time)s AND %(end_time)s")
+    conn = FakeConnection()
+    extraction.prepare(conn)
+    start, end = datetime(2025, 2, 14, 0), datetime(2025, 2, 14, 1)
+    extraction.execute(conn.cursor(), start, end)
+
+    assert conn.executed == [
+        ("PREPARE etl_extraccion (timestamp, timestamp) AS SELECT * FROM t WHERE f BETWEEN $1 AND $2", None),
+        ("EXECUTE etl_extraccion (%s, %s)", (start, end)),
+    ]
+
+
+def test_resumen_del_plan_con_bitmap_scan():
+    plan = {
+        "Node Type": "Hash Right Join", "Total Cost": 120.5,
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "sabana_complementaria"},
+            {"Node Type": "Bitmap Heap Scan", "Relation Name": "sabana_fiscalizador_lme",
+             "Plans": [{"Node Type": "Bitmap Index Scan", "Index Name": "sabana_fiscalizador_lme_fecha_emision_idx"}]},
+        ],
+    }
+    assert summarize_plan(plan) == {
+        "total_cost": 120.5, "scan": "Bitmap Heap Scan",
+        "index": "sabana_fiscalizador_lme_fecha_emision_idx", "uses_index": True,
+    }
+
+
+def test_explain_detecta_recorrido_completo():
+    conn = FakeConnection(result=('[{"Plan": {"Node Type": "Seq Scan", "Relation Name": "sabana_fiscalizador_lme", '
+                                  '"Total Cost": 9000.0}}]',))
+    plan = PreparedExtraction("SELECT 1").explain(conn, datetime(2025, 2, 14), datetime(2025, 2, 14, 1))
+    assert plan == {"total_cost": 9000.0, "scan": "Seq Scan", "index": None, "uses_index": False}
+
+
+class FakeNamedCursor:
+    """Cursor de servidor: entrega las filas de la ventana en bloques del tamaño pedido."""
+
+    def __init__(self, events, name, rows):
+        self.events = events
+        self.name = name
+        self.rows = list(rows)
+        self.itersize = None
+        self.description = [("id_lic",), ("folio",)]
+
+    def execute(self, query, params=None):
+        self.events.append(("execute", self.name, self.itersize, query, params))
+
+    def fetchmany(self, size):
+        self.events.append(("fetchmany", self.name, size))
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        self.events.append(("close", self.name))
+
+
+class FakeSourceConnection:
+    def __init__(self, windows_rows):
+        self.events = []
+        self.windows_rows = list(windows_rows)
+
+    def cursor(self, name=None):
+        assert name is not None, "la extraccion por ventana debe usar un cursor de servidor"
+        return FakeNamedCursor(self.events, name, self.windows_rows.pop(0))
+
+    def commit(self):
+        self.events.append(("commit",))
+
+
+def test_extract_windows_usa_un_cursor_con_nombre_por_ventana():
+    repo = InMemoryTaskRepository("etl.log")
+    service = ETLService(repo, config_log=True, config=EtlConfig(fetch_size=2, extract_prepared=False))
+    task_id = "a" * 64
+    partition_start = datetime(2025, 2, 14, 0)
+    windows = [(datetime(2025, 2, 14, 0), datetime(2025, 2, 14, 1)), (datetime(2025, 2, 14, 1), datetime(2025, 2, 14, 2))]
+    conn = FakeSourceConnection([[("L1", 1), ("L2", 2), ("L3", 3)], []])
+
+    items = list(service.extract_windows(conn, task_id, partition_start, windows, EtlProgress(repo, task_id),
+                                         threading.Event()))
+
+    assert items == [
+        Batch([("L1", 1), ("L2", 2)], ["id_lic", "folio"], ()),
+        Batch([("L3", 3)], ["id_lic", "folio"], ()),
+        WindowDone(windows[0][0], windows[0][1], 3),
+        WindowDone(windows[1][0], windows[1][1], 0),
+    ]
+    first, second = f"etl_{task_id[:16]}_2025021400_0", f"etl_{task_id[:16]}_2025021400_1"
+    # itersize = fetch_size antes del DECLARE; cada ventana se cierra y confirma antes de abrir la siguiente
+    assert conn.events == [
+        ("execute", first, 2, EXTRACTION_QUERY, {"start_time": windows[0][0], "end_time": windows[0][1]}),
+        ("fetchmany", first, 2), ("fetchmany", first, 2), ("fetchmany", first, 2),
+        ("close", first), ("commit",),
+        ("execute", second, 2, EXTRACTION_QUERY, {"start_time": windows[1][0], "end_time": windows[1][1]}),
+        ("fetchmany", second, 2),
+        ("close", second), ("commit",),
+    ]
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from app.core.etl_jobs import EtlJobQueue
+
+
+class BlockingJobs:
+    """Tareas que quedan en ejecucion hasta que se liberan, registrando el orden de inicio."""
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+        self.done = threading.Semaphore(0)
+        self._lock = threading.Lock()
+
+    def __call__(self, name, cancel_event):
+        with self._lock:
+            self.started.append(name)
+            self.release[name] = threading.Event()
+        # Sale al liberarla o al cancelarla
+        while not self.release[name].wait(0.01) and not cancel_event.is_set():
+            pass
+        self.done.release()
+
+    def finish(self, name):
+        # La tarea se inicia en otro hilo, se espera a que registre su evento
+        deadline = time.monotonic() + 5
+        while name not in self.release and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.release[name].set()
+        assert self.done.acquire(timeout=5)
+
+
+def wait_until_idle(queue, task_id):
+    # done se libera dentro de la tarea; la cola la quita de _running despues, en su propio hilo
+    deadline = time.monotonic() + 5
+    while queue.position(task_id) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_limita_concurrencia_y_ordena_por_prioridad():
+    jobs = BlockingJobs()
+    queue = EtlJobQueue(max_concurrent=1)
+    assert queue.submit("a", jobs, ("a",)) == 0
+    assert queue.submit("b", jobs, ("b",), priority=0) == 1
+    assert queue.submit("c", jobs, ("c",), priority=5) == 1
+    assert queue.position("b") == 2
+    assert queue.detail() == {"running": 1, "queued": 2, "max_concurrent": 1}
+
+    jobs.finish("a")
+    jobs.finish("c")
+    jobs.finish("b")
+    assert jobs.started == ["a", "c", "b"]
+    wait_until_idle(queue, "b")
+    assert queue.detail()["running"] == 0
+
+
+def test_cancelar_tarea_en_cola_y_en_ejecucion():
+    jobs = BlockingJobs()
+    queue = EtlJobQueue(max_concurrent=1)
+    queue.submit("a", jobs, ("a",))
+    queue.submit("b", jobs, ("b",))
+
+    assert queue.cancel("b") == "queued"
+    assert queue.position("b") is None
+    assert queue.cancel("a") == "running"
+    assert jobs.done.acquire(timeout=5)
+    wait_until_idle(queue, "a")
+    assert queue.cancel("a") is None
+    # La tarea cancelada en cola nunca se ejecuta
+    assert jobs.started == ["a"]
+
+
+def test_cancelar_desde_otro_worker(tmp_path):
+    from app.core.etl_config import EtlConfig
+    from app.core.etl_services import ETLService
+    from app.core.ports.adapters import SqliteTaskRepository
+
+    # Dos workers de la API: cada uno con su cola y su instancia del repositorio compartido
+    db_path = str(tmp_path / "tasks.sqlite3")
+    owner_repo = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60, heartbeat_interval=0.05)
+    other_repo = SqliteTaskRepository("etl.log", db_path, ttl_seconds=3600, write_interval=60)
+    config = EtlConfig(checkpoint_dir=str(tmp_path / "checkpoints"), dead_letter_dir=str(tmp_path / "dead_letter"))
+    owner = ETLService(owner_repo, config_log=True, config=config, job_queue=EtlJobQueue(1))
+    other = ETLService(other_repo, config_log=True, config=config, job_queue=EtlJobQueue(1))
+    jobs = BlockingJobs()
+
+    owner_repo.set_task_status("t1", "in process", {})
+    owner.job_queue.submit("t1", jobs, ("t1",), 0)
+    assert other.cancel_etl_task("t1") == {"Status": "cancelling", "detail": {"idtask": "t1"}}
+    # El heartbeat del dueno lee la marca y activa el evento de cancelacion de la tarea
+    assert jobs.done.acquire(timeout=5)
+    wait_until_idle(owner.job_queue, "t1")
+
+    owner_repo.set_task_status("t1", "cancelled", {})
+    assert other.cancel_etl_task("t1") is None
@@ -0,0 +1,239 @@
+# app/tests/test_etl_loader.py
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import etl_services
+from app.core.etl_config import EtlConfig
+from app.core.etl_loader import (
+    LICENCIAS_COLUMNS, STAGING_COLUMNS, LicenciasBulkLoader, StagingMerger, copy_value, rows_to_copy_buffer,
+)
+from app.core.ports.adapters import InMemoryTaskRepository
+
+
+def test_copy_value_escapa_formato_text():
+    assert copy_value(None) == "\\N"
+    assert copy_value("") == ""
+    assert copy_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert copy_value(date(2025, 2, 14)) == "2025-02-14"
+
+
+def test_rows_to_copy_buffer_respeta_orden_de_columnas():
+    row = {column: None for column in LICENCIAS_COLUMNS}
+    row.update({"id_lic": "L1", "folio": "F1", "empleador_adscrito": 0})
+    lines = rows_to_copy_buffer([row]).read().splitlines()
+    assert len(lines) == 1
+    fields = lines[0].split("\t")
+    assert len(fields) == len(LICENCIAS_COLUMNS)
+    assert fields[LICENCIAS_COLUMNS.index("id_lic")] == "L1"
+    assert fields[LICENCIAS_COLUMNS.index("empleador_adscrito")] == "0"
+    assert fields[LICENCIAS_COLUMNS.index("marca_otorgamiento")] == "\\N"
+
+
+def test_bulk_loader_rechaza_metodo_desconocido():
+    with pytest.raises(ValueError):
+        LicenciasBulkLoader("insert")
+
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = None
+        self.rowcount = 0
+
+    def copy_expert(self, sql, buffer):
+        self.copied = (sql, buffer.read())
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+        self.rowcount = 1
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursor_instance = FakeCursor()
+
+    def cursor(self):
+        return self.cursor_instance
+
+
+def test_staging_merger_puebla_las_cinco_tablas_y_limpia_el_lote():
+    row = {column: None for column in STAGING_COLUMNS}
+    row.update({"id_lic": "L1", "rut_medico": "1-9", "reclamada": True, "lote": "abc"})
+    connection = FakeConnection()
+
+    inserted = StagingMerger().merge(connection, [row], "abc")
+
+    cursor = connection.cursor_instance
+    assert cursor.copied[0].startswith("COPY ml.etl_staging_licencias (")
+    assert cursor.copied[1].rstrip("\n").split("\t")[-2:] == ["True", "abc"]
+    assert list(inserted) == [
+        "ml.medicos", "ml.especialidad_profesional_medicos", "ml.profesionalidad_medicos",
+        "ml.licencias", "ml.licencia_diagnostico_especialidad",
+    ]
+    assert all(params == {"lote": "abc"} for _, params in cursor.statements)
+    assert cursor.statements[-1][0] == "DELETE FROM ml.etl_staging_licencias WHERE lote = %(lote)s"
+
+
+def test_staging_merger_delta_compara_hash_y_cuenta_cambios():
+    row = {column: None for column in STAGING_COLUMNS}
+    row.update({"id_lic": "L1", "reclamada": True, "lote": "abc"})
+    connection = FakeConnection()
+    # insertadas, actualizadas y recibidas del lote
+    connection.cursor_instance.fetchone = lambda: (2, 3, 10)
+
+    inserted = StagingMerger(delta=True).merge(connection, [row], "abc")
+
+    assert inserted["ml.licencias"] == 2
+    assert inserted["delta"] == {"inserted": 2, "updated": 3, "unchanged": 5}
+    delta_sql = next(sql for sql, _ in connection.cursor_instance.statements if "ml.licencias_hash" in sql)
+    assert "ON CONFLICT (id_lic) DO UPDATE SET operador = EXCLUDED.operador" in delta_sql
+    assert "IS DISTINCT FROM" in delta_sql
+
+
+class RecordingCursor:
+    """Cursor psycopg2 de prueba: registra cada sentencia (tambien las de execute_values) en la conexion."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        sql = " ".join((sql.decode() if isinstance(sql, bytes) else sql).split())
+        self.connection.events.append(sql)
+        if self.connection.fail_on and sql.startswith(self.connection.fail_on):
+            raise RuntimeError("fallo de la base")
+        self.rowcount = self.connection.rowcounts.get(sql.split(" (")[0], 0)
+
+    def copy_expert(self, sql, buffer):
+        self.connection.events.append(" ".join(sql.split()))
+        self.connection.copied.append(buffer.read())
+
+    def mogrify(self, template, args):
+        return repr(tuple(args)).encode()
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    encoding = "UTF8"
+
+    def __init__(self, rowcounts=None, fail_on=None):
+        self.events = []
+        self.copied = []
+        self.rowcounts = rowcounts or {}
+        self.fail_on = fail_on
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+
+def licencia(id_lic, **values):
+    row = {column: None for column in LICENCIAS_COLUMNS}
+    row.update({"id_lic": id_lic, "folio": f"F{id_lic}", "especialidad_profesional": "Medicina General",
+                "tipo_profesional": "Medico", "cod_diagnostico_principal": "J00"}, **values)
+    return row
+
+
+def test_bulk_loader_copy_carga_por_tabla_temporal_con_on_conflict():
+    connection = RecordingConnection(rowcounts={"INSERT INTO ml.licencias": 1})
+
+    assert LicenciasBulkLoader("copy").load(connection, [licencia("L1"), licencia("L2")]) == 1
+
+    create, copy, insert, truncate = connection.events
+    assert create == "CREATE TEMP TABLE IF NOT EXISTS tmp_etl_licencias (LIKE ml.licencias INCLUDING DEFAULTS)"
+    assert copy.startswith("COPY tmp_etl_licencias (id_lic, ") and copy.endswith(") FROM STDIN")
+    assert [line.split("\t")[0] for line in connection.copied[0].splitlines()] == ["L1", "L2"]
+    assert insert.startswith("INSERT INTO ml.licencias (id_lic, ")
+    assert "SELECT id_lic, " in insert and insert.endswith("FROM tmp_etl_licencias ON CONFLICT (id_lic) DO NOTHING")
+    assert truncate == "TRUNCATE tmp_etl_licencias"
+    assert LicenciasBulkLoader("copy").load(connection, []) == 0
+
+
+class FakeSession:
+    """SessionML de prueba sobre la conexion DBAPI; las consultas ORM encuentran el registro."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def connection(self):
+        return SimpleNamespace(connection=self._connection)
+
+    def execute(self, statement, params=None):
+        return SimpleNamespace(fetchone=lambda: ("existe",))
+
+    def commit(self):
+        self._connection.events.append("COMMIT")
+
+    def rollback(self):
+        self._connection.events.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+def batch_service(monkeypatch, connection):
+    monkeypatch.setattr(etl_services, "SessionML", lambda: FakeSession(connection))
+    config = EtlConfig(load_mode="batch", load_method="copy", dedup_kind="exact")
+    service = etl_services.ETLService(InMemoryTaskRepository("etl.log"), config_log=True, config=config)
+    service.especialidades.remember({"Medicina General": 1})
+    service.profesionalidades.remember({"Medico": 7})
+    return service
+
+
+def test_upload_batch_reclama_carga_y_confirma_el_lote(monkeypatch):
+    connection = RecordingConnection(rowcounts={"INSERT INTO ml.licencias": 2})
+    service = batch_service(monkeypatch, connection)
+    dedup = service.new_task_dedup()
+    # L3 ya la cargo otro lote de la tarea
+    assert dedup.licencias.claim(["L3"]) == ["L3"]
+    dedup.licencias.confirm(["L3"])
+
+    service.upload_batch_to_lm(
+        [licencia("L1", rut_medico="1-9"), licencia("L1", rut_medico="1-9"), licencia("L2"), licencia("L3")], dedup
+    )
+
+    # Solo las licencias reclamadas por el lote llegan al COPY, una vez cada una
+    assert [line.split("\t")[0] for line in connection.copied[0].splitlines()] == ["L1", "L2"]
+    statements = [event.split(" (")[0] for event in connection.events]
+    assert statements == [
+        "COMMIT",  # dimensiones, ya en cache
+        "INSERT INTO ml.medicos",
+        "INSERT INTO ml.especialidad_profesional_medicos",
+        "INSERT INTO ml.profesionalidad_medicos",
+        "CREATE TEMP TABLE IF NOT EXISTS tmp_etl_licencias",
+        "COPY tmp_etl_licencias",
+        "INSERT INTO ml.licencias",
+        "TRUNCATE tmp_etl_licencias",
+        "INSERT INTO ml.licencia_diagnostico_especialidad",
+        "COMMIT",
+    ]
+    # Los medicos van en la misma transaccion del lote, una fila por par reclamado
+    assert connection.events[1].endswith("VALUES ('1-9',) ON CONFLICT DO NOTHING")
+    assert connection.events[2].endswith("VALUES (1, '1-9') ON CONFLICT DO NOTHING")
+    assert "(7, '1-9')" in connection.events[3]
+    assert "('L1', 'J00', 'Medicina General'),('L2', 'J00', 'Medicina General')" in connection.events[8]
+    # Confirmadas tras el commit: otro lote ya no las reclama
+    assert dedup.licencias.claim(["L1", "L2", "L3"]) == []
+    assert dedup.medicos.claim([("1-9", 1)]) == []
+
+
+def test_upload_batch_libera_las_reclamadas_si_la_carga_falla(monkeypatch):
+    connection = RecordingConnection(fail_on="INSERT INTO ml.licencias ")
+    service = batch_service(monkeypatch, connection)
+    dedup = service.new_task_dedup()
+
+    with pytest.raises(RuntimeError):
+        service.upload_batch_to_lm([licencia("L1", rut_medico="1-9"), licencia("L2")], dedup)
+
+    assert connection.events[-1] == "ROLLBACK"
+    assert "COMMIT" not in connection.events[1:]
+    # Liberadas: el reintento del lote las vuelve a reclamar
+    assert dedup.licencias.claim(["L1", "L2"]) == ["L1", "L2"]
+    assert dedup.medicos.claim([("1-9", 1)]) == [("1-9", 1)]
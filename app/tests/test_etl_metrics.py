@@ -0,0 +1,40 @@
+import logging
+
+from app.core.etl_metrics import EtlMetrics, MetricsReporter, _count_round_trip, bind_metrics
+
+
+def test_metricas_agregan_etapas_ventanas_y_reintentos():
+    metrics = EtlMetrics()
+    metrics.add_stage("extract", 1000, 0.5)
+    metrics.add_stage("load", 1000, 2.0)
+    metrics.add_window(600, 1.0)
+    metrics.add_window(400, 3.0)
+    metrics.add_retry("deadlock")
+    metrics.add_retry("deadlock")
+
+    detail = metrics.detail()
+    assert detail["stages"]["extract"]["rows_per_sec"] == 2000.0
+    assert detail["stages"]["load"]["rows_per_sec"] == 500.0
+    assert detail["stages"]["transform"]["rows_per_sec"] == 0.0
+    assert detail["windows"] == {"count": 2, "avg_rows": 500.0, "avg_seconds": 2.0, "max_seconds": 3.0}
+    assert detail["retries"] == {"deadlock": 2}
+
+
+def test_viajes_se_cuentan_en_las_metricas_del_hilo():
+    metrics = EtlMetrics()
+    _count_round_trip()  # Sin metricas asociadas no se cuenta
+    with bind_metrics(metrics):
+        _count_round_trip()
+        _count_round_trip()
+    _count_round_trip()
+    assert metrics.detail()["round_trips"]["ml"] == 2
+
+
+def test_reporter_registra_metricas_al_detenerse(caplog):
+    metrics = EtlMetrics()
+    metrics.add_stage("load", 10, 1.0)
+    with caplog.at_level(logging.INFO, logger="etl.metrics"):
+        MetricsReporter("task1", metrics, interval=0).start().stop()
+    assert len(caplog.records) == 1
+    assert "Metricas task_id task1" in caplog.records[0].getMessage()
+    assert '"rows_per_sec": 10.0' in caplog.records[0].getMessage()
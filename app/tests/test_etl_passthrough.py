@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from app.core.etl_passthrough import CopyAborted, CopyStream, passthrough_query
+
+
+QUERY = """
+SELECT
+    lic.id_lic,
+    lic.empleador_adscrito,
+    lic.periodo
+FROM lme.sabana_fiscalizador_lme lic
+WHERE lic.fecha_emision BETWEEN %(start_time)s AND %(end_time)s
+ORDER BY lic.fecha_emision, lic.ctid
+"""
+
+
+class FakeSourceCursor:
+    """Escribe una fila por write, como copy_expert de psycopg2 en COPY ... TO STDOUT."""
+
+    def __init__(self, lines, error=None):
+        self.lines = lines
+        self.error = error
+
+    def copy_expert(self, sql, file):
+        for line in self.lines:
+            file.write(line)
+        if self.error is not None:
+            raise self.error
+
+
+def test_passthrough_query_mapea_empleador_y_conserva_el_orden_de_la_extraccion():
+    query = passthrough_query(QUERY)
+    assert "CASE WHEN lic.empleador_adscrito = 'No' THEN 0 ELSE 1 END AS empleador_adscrito," in query
+    assert query.replace(
+        "CASE WHEN lic.empleador_adscrito = 'No' THEN 0 ELSE 1 END AS empleador_adscrito,", "lic.empleador_adscrito,"
+    ) == QUERY
+    with pytest.raises(ValueError):
+        passthrough_query(QUERY.replace("lic.empleador_adscrito,", ""))
+
+
+def test_copy_stream_agrupa_las_filas_y_entrega_todo_al_destino():
+    lines = [f"{i},fila\n".encode() for i in range(500)]
+    tee = []
+    stream = CopyStream(tee=tee.append, chunk_bytes=100, max_chunks=2)
+    producer = threading.Thread(target=stream.produce, args=(FakeSourceCursor(lines), "COPY"))
+    producer.start()
+    received = b""
+    while True:
+        data = stream.read(64)
+        if not data:
+            break
+        received += data
+    producer.join()
+    assert stream.error is None
+    assert received == b"".join(lines) == b"".join(tee)
+    assert stream.bytes == len(received)
+    assert all(len(chunk) >= 100 for chunk in tee[:-1])
+
+
+def test_copy_stream_propaga_el_error_del_origen():
+    stream = CopyStream(chunk_bytes=10)
+    stream.produce(FakeSourceCursor([b"1,a\n", b"2,bbbbbbbbbb\n", b"3,c\n"], error=RuntimeError("origen caido")), "COPY")
+    # El bloque incompleto no se envia; el destino termina y quien llama revisa stream.error
+    assert stream.read() == b"1,a\n2,bbbbbbbbbb\n"
+    assert stream.read() == b""
+    assert isinstance(stream.error, RuntimeError)
+
+
+def test_copy_stream_abort_detiene_al_productor():
+    stream = CopyStream(chunk_bytes=1, max_chunks=1)
+    producer = threading.Thread(target=stream.produce, args=(FakeSourceCursor([b"x\n"] * 100), "COPY"))
+    producer.start()
+    stream.read(1)
+    stream.abort()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    assert isinstance(stream.error, CopyAborted)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from app.core.etl_pipeline import Batch, EtlPipeline, PipelineStats, WindowDone
+
+
+def _extract(windows, rows_per_batch=3, batches_per_window=2):
+    for window in range(windows):
+        for batch in range(batches_per_window):
+            yield Batch([(window, batch, i) for i in range(rows_per_batch)], ["window", "batch", "i"])
+        yield WindowDone(window, window + 1, rows_per_batch * batches_per_window)
+
+
+def _transform(batch):
+    return Batch([dict(zip(batch.columns, row)) for row in batch.rows])
+
+
+def test_pipeline_entrega_bloques_y_ventanas_en_orden():
+    loaded = []
+    stats = PipelineStats()
+    EtlPipeline(queue_size=2, stats=stats).run(_extract(3), _transform, loaded.append)
+
+    assert [type(item).__name__ for item in loaded] == ["Batch", "Batch", "WindowDone"] * 3
+    assert loaded[0].rows[0] == {"window": 0, "batch": 0, "i": 0}
+    detail = stats.detail()
+    assert [detail[stage]["rows"] for stage in ("extract", "transform", "load")] == [18, 18, 18]
+    assert detail["extract"]["queue_depth_max"] <= 2
+    assert "queue_depth" not in detail["load"]
+
+
+def test_pipeline_aplica_backpressure():
+    extracted = []
+    release = threading.Event()
+
+    def extract():
+        for i in range(20):
+            extracted.append(i)
+            yield Batch([i])
+
+    def load(batch):
+        release.wait(5)
+
+    thread = threading.Thread(target=EtlPipeline(queue_size=2).run, args=(extract(), lambda b: b, load))
+    thread.start()
+    time.sleep(0.3)
+    # Carga detenida: a lo mas 2 colas llenas, uno en cada etapa y uno mas en el generador
+    assert len(extracted) <= 2 * 2 + 3
+    release.set()
+    thread.join(5)
+    assert len(extracted) == 20
+
+
+@pytest.mark.parametrize("failing_stage", ["extract", "transform", "load"])
+def test_pipeline_propaga_el_error_sin_bloquearse(failing_stage):
+    def extract():
+        for i in range(100):
+            if failing_stage == "extract" and i == 5:
+                raise RuntimeError("extract")
+            yield Batch([i])
+
+    def transform(batch):
+        if failing_stage == "transform" and batch.rows[0] == 5:
+            raise RuntimeError("transform")
+        return batch
+
+    def load(batch):
+        if failing_stage == "load" and batch.rows[0] == 5:
+            raise RuntimeError("load")
+
+    with pytest.raises(RuntimeError, match=failing_stage):
+        EtlPipeline(queue_size=1).run(extract(), transform, load)
@@ -0,0 +1,54 @@
+# app/tests/test_etl_progress.py
+from datetime import datetime, timedelta
+
+from app.core.etl_progress import EtlProgress, hourly_windows, split_partitions, window_covered
+
+
+class RecordingTaskRepository:
+    def __init__(self):
+        self.updates = []
+
+    def set_task_status(self, task_id, status, detail):
+        self.updates.append((status, detail))
+
+
+def test_particiones_cubren_las_mismas_ventanas_que_el_recorrido_secuencial():
+    start = datetime(2025, 2, 14, 0, 0, 0)
+    end = datetime(2025, 2, 16, 23, 59, 59)
+
+    partitions = split_partitions(start, end, 24)
+    assert len(partitions) == 3
+    assert partitions[0] == (start, start + timedelta(hours=24))
+    assert partitions[-1][1] == end
+
+    windows = [w for partition in partitions for w in hourly_windows(*partition)]
+    assert windows == hourly_windows(start, end)
+    assert len(windows) == 72
+
+
+def test_progreso_agrega_el_avance_de_todos_los_workers():
+    repo = RecordingTaskRepository()
+    progress = EtlProgress(repo, "task", partitions_total=2)
+
+    progress.add_loaded(10, 0.5)
+    progress.add_loaded(5, 0.5)
+    progress.partition_done()
+
+    status, detail = repo.updates[-1]
+    assert status == "in process"
+    assert detail["record_process"] == 15
+    assert detail["load_rows_per_sec"] == 15.0
+    assert detail["partitions_done"] == 1
+    assert detail["partitions_total"] == 2
+
+
+def test_window_covered_con_checkpoints_contiguos():
+    start = datetime(2025, 2, 14, 0, 0, 0)
+    completed = [
+        (start, start + timedelta(hours=1), 10),
+        (start + timedelta(hours=1), start + timedelta(hours=2), 5),
+    ]
+    assert window_covered(start, start + timedelta(hours=1), completed)
+    assert window_covered(start + timedelta(minutes=30), start + timedelta(hours=2), completed)
+    assert not window_covered(start + timedelta(hours=1), start + timedelta(hours=3), completed)
+    assert not window_covered(start, start + timedelta(hours=1), [])
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.etl_metrics import EtlMetrics
+from app.core.etl_rules import RulesClient, WindowScorer
+
+
+class StubRulesApi:
+    """Servidor HTTP local que registra los payloads y responde 500 a las primeras `failures` llamadas."""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.payloads = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub._lock:
+                    stub.payloads.append(json.loads(body))
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    status = 500 if len(stub.payloads) <= stub.failures else 200
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.active -= 1
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/lm/ml/score/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_api():
+    apis = []
+
+    def start(**kwargs):
+        apis.append(StubRulesApi(**kwargs))
+        return apis[-1]
+
+    yield start
+    for api in apis:
+        api.close()
+
+
+def test_reintenta_ante_error_del_servidor(stub_api):
+    api = stub_api(failures=2)
+    metrics = EtlMetrics()
+    client = RulesClient(api.url, max_retries=3, backoff_seconds=0.01)
+    try:
+        assert client.submit("2025-02-01", "2025-02-02", "task1", metrics).result(timeout=5) is True
+    finally:
+        client.close()
+    assert len(api.payloads) == 3
+    assert api.payloads[-1] == {"fecha_inicio": "2025-02-01", "fecha_fin": "2025-02-02"}
+    assert metrics.detail()["retries"] == {"rules_api": 2}
+
+
+def test_close_libera_el_loop_y_el_cliente_se_puede_reutilizar(stub_api):
+    api = stub_api()
+    client = RulesClient(api.url)
+    assert client.submit("2025-02-01", "2025-02-02", "task1").result(timeout=5) is True
+    thread = client._thread
+    client.close()
+    assert not thread.is_alive()
+    try:
+        assert client.submit("2025-02-02", "2025-02-03", "task2").result(timeout=5) is True
+    finally:
+        client.close()
+    assert len(api.payloads) == 2
+
+
+def test_falla_al_agotar_reintentos(stub_api):
+    api = stub_api(failures=10)
+    client = RulesClient(api.url, max_retries=1, backoff_seconds=0.01)
+    try:
+        assert client.submit("2025-02-01", "2025-02-02", "task1").result(timeout=5) is False
+    finally:
+        client.close()
+    assert len(api.payloads) == 2
+
+
+def test_limita_llamadas_concurrentes(stub_api):
+    api = stub_api(delay=0.1)
+    client = RulesClient(api.url, concurrency=2)
+    try:
+        futures = [client.submit(f"2025-02-0{day}", f"2025-02-0{day}", "task1") for day in range(1, 7)]
+        assert all(future.result(timeout=5) for future in futures)
+    finally:
+        client.close()
+    assert len(api.payloads) == 6
+    assert api.max_active == 2
+
+
+def test_scorer_agrupa_ventanas_contiguas(stub_api):
+    api = stub_api()
+    client = RulesClient(api.url)
+    start = datetime(2025, 2, 1)
+    windows = [(start + timedelta(hours=h), start + timedelta(hours=h + 1), 10) for h in range(7)]
+    scorer = WindowScorer(client, "task1", windows_per_call=3)
+    try:
+        # Llegan desordenadas; cada tramo de 3 ventanas contiguas se envia apenas se completa
+        scorer.add_windows([windows[0], windows[1], windows[4]])
+        scorer.add_windows([windows[2]])
+        scorer.add_windows([windows[5], windows[6]])
+        scorer.add_windows([windows[3]])
+        scorer.flush()
+        assert scorer.wait() == {"calls": 3, "ok": 3, "failed": 0}
+    finally:
+        client.close()
+    assert sorted((p["fecha_inicio"], p["fecha_fin"]) for p in api.payloads) == [
+        ("2025-02-01 00:00:00", "2025-02-01 03:00:00"),
+        ("2025-02-01 03:00:00", "2025-02-01 04:00:00"),
+        ("2025-02-01 04:00:00", "2025-02-01 07:00:00"),
+    ]
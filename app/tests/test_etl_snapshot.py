@@ -0,0 +1,49 @@
+# app/tests/test_etl_snapshot.py
+import csv
+import gzip
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.core.etl_snapshot import SnapshotWriter
+
+ROWS = [
+    {"id_lic": "L1", "fecha_emision": datetime(2025, 2, 14, 8, 0), "edad_trabajador": Decimal("40"), "periodo": None},
+    {"id_lic": "L2", "fecha_emision": datetime(2025, 2, 14, 9, 0), "edad_trabajador": Decimal("31.5"), "periodo": "2025-02"},
+]
+
+
+def test_csv_gzip_mantiene_un_solo_archivo_con_encabezado(tmp_path):
+    with SnapshotWriter(str(tmp_path / "registros_x"), "csv.gz") as writer:
+        writer.write_row(ROWS[0])
+        writer.write_rows(ROWS[1:])
+
+    assert writer.path.endswith("registros_x.csv.gz")
+    with gzip.open(writer.path, "rt", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["id_lic"] for row in rows] == ["L1", "L2"]
+    assert writer.rows_written == 2
+
+
+def test_sin_filas_no_crea_archivo(tmp_path):
+    writer = SnapshotWriter(str(tmp_path / "registros_x"), "csv")
+    writer.close()
+    assert not (tmp_path / "registros_x.csv").exists()
+
+
+def test_formato_desconocido():
+    with pytest.raises(ValueError):
+        SnapshotWriter("registros_x", "xlsx")
+
+
+def test_parquet_por_row_group(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with SnapshotWriter(str(tmp_path / "registros_x"), "parquet", row_group_size=1) as writer:
+        writer.write_rows(ROWS)
+
+    parquet_file = pq.ParquetFile(writer.path)
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.column("edad_trabajador").to_pylist() == [40.0, 31.5]
+    assert table.column("periodo").to_pylist() == [None, "2025-02"]
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.core.etl_progress import hourly_windows
+from app.core.etl_windows import adaptive_windows, probe_hour_counts
+
+START = datetime(2025, 2, 14, 0, 0, 0)
+
+
+def hour(h):
+    return START + timedelta(hours=h)
+
+
+def test_une_horas_tranquilas_y_divide_las_cargadas():
+    windows = hourly_windows(START, hour(6))
+    counts = {hour(0): 10, hour(1): 0, hour(2): 30, hour(3): 250, hour(4): 40, hour(5): 70}
+
+    result = adaptive_windows(windows, counts, target_rows=100)
+    assert result == [
+        (hour(0), hour(3)),
+        (hour(3), hour(3) + timedelta(minutes=20)),
+        (hour(3) + timedelta(minutes=20), hour(3) + timedelta(minutes=40)),
+        (hour(3) + timedelta(minutes=40), hour(4)),
+        (hour(4), hour(5)),
+        (hour(5), hour(6)),
+    ]
+
+
+def test_no_une_ventanas_separadas_por_horas_con_checkpoint():
+    # La hora 1 ya se cargo antes de reanudar
+    windows = [(hour(0), hour(1)), (hour(2), hour(3))]
+    assert adaptive_windows(windows, {}, target_rows=100) == windows
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params):
+        self.executed.append(params)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursor_obj = FakeCursor(rows)
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_probe_cuenta_por_hora_en_una_consulta():
+    conn = FakeConnection([(hour(0), 5), (hour(2), 7)])
+    assert probe_hour_counts(conn, hour(0), hour(3)) == {hour(0): 5, hour(2): 7}
+    assert conn.cursor_obj.executed == [(hour(0), hour(3))]
+    assert conn.commits == 1
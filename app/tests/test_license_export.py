@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+from datetime import date
+
+from app.core.license_export import (
+    CSV_MEDIA_TYPE, LICENSE_COLUMNS, NDJSON_MEDIA_TYPE, encode_licenses, stream_media_type,
+)
+from app.models.response_models import LicenseDetail
+
+
+def licencia(id_lic):
+    return LicenseDetail(id_lic=id_lic, folio=f"F{id_lic}", fecha_emision=date(2025, 2, 1), causa_rechazo_pronunciamiento='con, "comillas"')
+
+
+def test_stream_media_type_segun_accept():
+    assert stream_media_type("application/x-ndjson") == NDJSON_MEDIA_TYPE
+    assert stream_media_type("text/csv;q=0.9, application/json") == CSV_MEDIA_TYPE
+    assert stream_media_type("application/json") is None
+    assert stream_media_type("*/*") is None
+    assert stream_media_type(None) is None
+
+
+def test_ndjson_una_licencia_por_linea():
+    chunks = list(encode_licenses(NDJSON_MEDIA_TYPE, [[licencia("1"), licencia("2")], [], [licencia("3")]]))
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)["id_lic"] for line in lines] == ["1", "2", "3"]
+    assert json.loads(lines[0])["fecha_emision"] == "2025-02-01"
+
+
+def test_csv_con_encabezado_y_un_bloque_por_lote():
+    chunks = list(encode_licenses(CSV_MEDIA_TYPE, [[licencia("1")], [licencia("2")]]))
+    assert len(chunks) == 2
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert list(rows[0]) == LICENSE_COLUMNS
+    assert [row["id_lic"] for row in rows] == ["1", "2"]
+    assert rows[0]["causa_rechazo_pronunciamiento"] == 'con, "comillas"'
+    assert rows[0]["ccaf"] == ""
+
+
+def test_csv_sin_filas_retorna_solo_el_encabezado():
+    chunks = list(encode_licenses(CSV_MEDIA_TYPE, []))
+    assert b"".join(chunks).decode().strip().split(",") == LICENSE_COLUMNS
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.pagination import (
+    API_MAX_PAGE_SIZE, API_PAGE_SIZE, NO_FECHA_EMISION, decode_cursor, encode_cursor, page_params, split_page,
+)
+from app.core.query_catalog import QueryCatalog
+
+
+def fila(dia, id_lic, especialidad="a"):
+    return {"fecha_emision": datetime(2025, 2, dia, 10, 30), "id_lic": id_lic, "especialidad": especialidad}
+
+
+def test_cursor_opaco_ida_y_vuelta():
+    cursor = encode_cursor(datetime(2025, 2, 1, 16, 13, 22), "20250201000000888")
+    assert "2025" not in cursor
+    assert decode_cursor(cursor) == (datetime(2025, 2, 1, 16, 13, 22), "20250201000000888")
+    with pytest.raises(ValueError, match="Cursor"):
+        decode_cursor("no-es-un-cursor")
+
+
+def test_page_params_pide_una_licencia_mas():
+    assert page_params(None, 10) == {"cursor_fecha_emision": None, "cursor_id_lic": None, "limit": 11}
+    cursor = encode_cursor(datetime(2025, 2, 1), "1")
+    assert page_params(cursor, 10)["cursor_id_lic"] == "1"
+    assert page_params(cursor)["limit"] == API_PAGE_SIZE + 1
+    for limit in (0, API_MAX_PAGE_SIZE + 1):
+        with pytest.raises(ValueError, match="limit"):
+            page_params(None, limit)
+
+
+def test_split_page_cuenta_licencias_y_no_filas():
+    # La licencia 2 tiene dos filas (dos especialidades del medico)
+    rows = [fila(1, "1"), fila(2, "2", "a"), fila(2, "2", "b"), fila(3, "3")]
+    page, next_cursor = split_page(rows, 2)
+    assert [row["id_lic"] for row in page] == ["1", "2", "2"]
+    assert decode_cursor(next_cursor) == (datetime(2025, 2, 2, 10, 30), "2")
+
+    page, next_cursor = split_page(rows, 3)
+    assert page == rows and next_cursor is None
+
+
+def test_sin_cursor_ni_limit_retorna_todas():
+    # Clientes que no conocen next_cursor siguen recibiendo todas las licencias
+    assert page_params() == {"cursor_fecha_emision": None, "cursor_id_lic": None, "limit": None}
+    rows = [fila(dia, str(dia)) for dia in range(1, 4)]
+    assert split_page(rows, None) == (rows, None)
+
+
+def test_pagina_con_licencia_sin_fecha_emision():
+    # Las licencias sin fecha_emision van primero (COALESCE a -infinity) y su cursor sigue la busqueda
+    sin_fecha = {"fecha_emision": None, "id_lic": "0", "especialidad": "a"}
+    rows = [sin_fecha, fila(1, "1"), fila(2, "2")]
+    page, next_cursor = split_page(rows, 1)
+    assert page == [sin_fecha]
+    assert decode_cursor(next_cursor) == (NO_FECHA_EMISION, "0")
+    params = page_params(next_cursor, 1)
+    assert params["cursor_fecha_emision"] == "-infinity" and params["cursor_id_lic"] == "0"
+
+    page, next_cursor = split_page(rows[1:], 1)
+    assert page == [rows[1]] and decode_cursor(next_cursor) == (datetime(2025, 2, 1, 10, 30), "1")
+
+
+def test_consultas_paginadas_ordenan_fecha_emision_nula():
+    # Sin COALESCE una licencia sin fecha_emision no tendria clave comparable y la busqueda la saltaria
+    catalog = QueryCatalog.load()
+    paginadas = [name for name in catalog.names() if "cursor_fecha_emision" in catalog.get(name).params]
+    assert sorted(paginadas) == ["licencias_2", "licencias_3", "licencias_8", "licencias_9"]
+    for name in paginadas:
+        sql = catalog.get(name).sql
+        assert "IS NOT NULL" not in sql, name
+        assert "(COALESCE(lic.fecha_emision, '-infinity'), lic.id_lic) >" in sql, name
+        assert "order by COALESCE(lic.fecha_emision, '-infinity'), lic.id_lic" in sql, name
+        assert "COALESCE(l.fecha_emision, '-infinity'),\n\tl.id_lic;" in sql, name
@@ -0,0 +1,76 @@
+import pytest
+
+from app.core.query_catalog import QueryCatalog, QueryStats
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows=(), error=None):
+        self.rows = list(rows)
+        self.error = error
+        self.calls = []
+
+    def execute(self, statement, params):
+        self.calls.append((statement, params))
+        if self.error is not None:
+            raise self.error
+        return FakeResult(self.rows)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    (tmp_path / "por_medico.sql").write_text(
+        "-- consulta de prueba\nSELECT * FROM ml.licencias WHERE rut_medico = :rut_medico\n"
+        "AND fecha_emision BETWEEN :fecha_inicio AND :fecha_fin"
+    )
+    (tmp_path / "por_folio.sql").write_text("SELECT * FROM ml.licencias WHERE folio = :folio")
+    (tmp_path / "notas.txt").write_text("no es una consulta")
+    return QueryCatalog.load(str(tmp_path))
+
+
+def test_carga_las_consultas_por_nombre_con_sus_parametros(catalog):
+    assert sorted(catalog.names()) == ["por_folio", "por_medico"]
+    assert catalog.get("por_medico").params == {"rut_medico", "fecha_inicio", "fecha_fin"}
+    with pytest.raises(ValueError, match="no registrada"):
+        catalog.get("licencias_99")
+
+
+def test_valida_parametros_y_reutiliza_la_sentencia(catalog):
+    session = FakeSession(rows=[(1,), (2,)])
+    with pytest.raises(ValueError, match="fecha_fin"):
+        catalog.execute(session, "por_medico", {"rut_medico": "1-9", "fecha_inicio": "2025-01-01"})
+    assert session.calls == []
+
+    for _ in range(2):
+        rows = catalog.execute(session, "por_folio", {"folio": "123", "fecha_inicio": "2025-01-01"})
+    assert rows == [(1,), (2,)]
+    # Los parametros que la consulta no usa no se envian, y la sentencia compilada es la misma
+    assert session.calls[0][1] == {"folio": "123"}
+    assert session.calls[0][0] is session.calls[1][0]
+
+
+def test_estadisticas_por_consulta(catalog):
+    catalog.execute(FakeSession(rows=[(1,)] * 3), "por_folio", {"folio": "1"})
+    with pytest.raises(RuntimeError):
+        catalog.execute(FakeSession(error=RuntimeError("caida")), "por_folio", {"folio": "2"})
+    stats = catalog.stats()
+    assert stats["por_folio"]["calls"] == 2
+    assert stats["por_folio"]["errors"] == 1
+    assert stats["por_folio"]["rows"] == 3
+    assert stats["por_medico"]["calls"] == 0
+
+
+def test_percentiles_de_latencia():
+    stats = QueryStats(samples=100)
+    for ms in range(1, 101):
+        stats.record(ms / 1000, 1)
+    latency = stats.detail()["latency_ms"]
+    assert (latency["p50"], latency["p95"], latency["p99"], latency["max"]) == (50.0, 95.0, 99.0, 100.0)
+    assert stats.detail()["avg_rows"] == 1.0
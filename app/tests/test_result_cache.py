@@ -0,0 +1,123 @@
+from datetime import date
+
+from app.core import result_cache as result_cache_module
+from app.core.result_cache import MemoryCacheBackend, PostgresCacheBackend, ResultCache, cache_key
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"resultado": self.calls}
+
+
+def test_cache_key_normaliza_parametros():
+    assert cache_key("licencias_2", {"rut_medico": " 1-9 ", "fecha_inicio": date(2025, 1, 1)}) == \
+        cache_key("licencias_2", {"fecha_inicio": "2025-01-01", "rut_medico": "1-9"})
+    assert cache_key("licencias_2", {"rut_medico": "1-9"}) != cache_key("licencias_8", {"rut_medico": "1-9"})
+
+
+def test_get_or_load_cuenta_aciertos_y_fallos():
+    cache = ResultCache(MemoryCacheBackend(10), ttl_seconds=60)
+    loader = Loader()
+    assert cache.get_or_load("licencias_7", {"folio": "1"}, loader) == {"resultado": 1}
+    assert cache.get_or_load("licencias_7", {"folio": "1"}, loader) == {"resultado": 1}
+    assert cache.get_or_load("licencias_7", {"folio": "2"}, loader) == {"resultado": 2}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["queries"]["licencias_7"]["hit_rate"] == round(1 / 3, 4)
+
+
+def test_un_resultado_none_tambien_queda_en_cache():
+    cache = ResultCache(MemoryCacheBackend(10), ttl_seconds=60)
+    calls = []
+    for _ in range(2):
+        assert cache.get_or_load("licencias_7", {"folio": "x"}, lambda: calls.append(1)) is None
+    assert len(calls) == 1
+
+
+def test_lru_acotado_y_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "time", lambda: now[0])
+    backend = MemoryCacheBackend(2)
+    backend.set("a", 1, 10, 0)
+    backend.set("b", 2, 10, 0)
+    assert backend.get("a") == (True, 1)  # a pasa a ser la mas usada
+    backend.set("c", 3, 10, 0)
+    assert backend.get("b") == (False, None)
+    assert backend.get("a") == (True, 1)
+    now[0] += 11
+    assert backend.get("c") == (False, None)
+    assert len(backend) == 1
+
+
+def test_invalidate_descarta_todo():
+    cache = ResultCache(MemoryCacheBackend(10), ttl_seconds=60)
+    loader = Loader()
+    cache.get_or_load("licencias_2", {"rut_medico": "1-9"}, loader)
+    cache.invalidate()
+    assert cache.get_or_load("licencias_2", {"rut_medico": "1-9"}, loader) == {"resultado": 2}
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_invalidate_durante_la_carga_no_guarda_el_resultado():
+    cache = ResultCache(MemoryCacheBackend(10), ttl_seconds=60)
+    loader = Loader()
+
+    def load_and_invalidate():
+        # La tarea ETL termina mientras la consulta aun lee ml.*
+        value = loader()
+        cache.invalidate()
+        return value
+
+    assert cache.get_or_load("licencias_2", {"rut_medico": "1-9"}, load_and_invalidate) == {"resultado": 1}
+    assert cache.stats()["entries"] == 0
+    assert cache.get_or_load("licencias_2", {"rut_medico": "1-9"}, loader) == {"resultado": 2}
+    assert cache.get_or_load("licencias_2", {"rut_medico": "1-9"}, loader) == {"resultado": 2}
+
+
+def test_error_del_backend_no_impide_la_consulta():
+    class BrokenBackend:
+        def get(self, key):
+            raise ConnectionError("sin conexion")
+
+        def generation(self):
+            raise ConnectionError("sin conexion")
+
+        def set(self, key, value, ttl_seconds, generation):
+            raise ConnectionError("sin conexion")
+
+    cache = ResultCache(BrokenBackend(), ttl_seconds=60)
+    assert cache.get_or_load("licencias_7", {"folio": "1"}, Loader()) == {"resultado": 1}
+    assert cache.stats()["misses"] == 1
+
+
+def test_backend_postgres_crea_las_tablas_en_el_primer_uso():
+    statements = []
+
+    class FakeResult:
+        def fetchall(self):
+            return []
+
+    class FakeSession:
+        def execute(self, statement, params=None):
+            statements.append(" ".join(str(statement).split()))
+            return FakeResult()
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    backend = PostgresCacheBackend(10, session_factory=FakeSession)
+    assert statements == []
+
+    assert backend.get("k") == (False, None)
+    assert backend.get("k") == (False, None)
+    ddl = [statement for statement in statements if statement.startswith("CREATE")]
+    assert len(ddl) == 2
+    assert ddl[0].startswith("CREATE UNLOGGED TABLE IF NOT EXISTS ml.api_result_cache ")
+    assert sum(statement.startswith("UPDATE ml.api_result_cache ") for statement in statements) == 2
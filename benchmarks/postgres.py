@@ -0,0 +1,65 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg2
+
+### Instancia PostgreSQL desechable en un directorio temporal, para el benchmark del ETL. ###
+
+
+class TemporaryPostgres:
+    """Levanta un servidor con initdb/pg_ctl en un directorio temporal y lo elimina al salir.
+
+    Usa un puerto libre y el socket en el mismo directorio; PostgreSQL no permite ejecutarlo como root.
+    """
+
+    def __init__(self, bin_dir: str = None, dbname: str = "etl_bench", user: str = "postgres"):
+        self.bin_dir = bin_dir
+        self.dbname = dbname
+        self.user = user
+        self.port = None
+        self.data_dir = None
+
+    def _bin(self, name: str) -> str:
+        path = os.path.join(self.bin_dir, name) if self.bin_dir else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"No se encontro {name}, indique el directorio con --pg-bin")
+        return path
+
+    def __enter__(self) -> "TemporaryPostgres":
+        self.data_dir = tempfile.mkdtemp(prefix="etl_bench_pg_")
+        self.port = _free_port()
+        subprocess.run(
+            [self._bin("initdb"), "-D", self.data_dir, "-U", self.user, "--auth=trust", "--no-sync"],
+            check=True, capture_output=True,
+        )
+        # Sin fsync: el benchmark mide el ETL, no la durabilidad del disco
+        subprocess.run(
+            [self._bin("pg_ctl"), "-D", self.data_dir, "-w", "-l", os.path.join(self.data_dir, "server.log"),
+             "-o", f"-p {self.port} -k {self.data_dir} -c listen_addresses=127.0.0.1 -c fsync=off", "start"],
+            check=True, capture_output=True,
+        )
+        conn = psycopg2.connect(host="127.0.0.1", port=self.port, dbname="postgres", user=self.user)
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f"CREATE DATABASE {self.dbname}")
+        finally:
+            conn.close()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        subprocess.run([self._bin("pg_ctl"), "-D", self.data_dir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def environ(self) -> dict:
+        """Variables DB_ML_* y DB_ETL_* apuntando a la base temporal (origen y destino en la misma)."""
+        values = {"HOST": "127.0.0.1", "PORT": str(self.port), "NAME": self.dbname, "USER": self.user, "PASS": ""}
+        return {f"DB_{prefix}_{key}": value for prefix in ("ML", "ETL") for key, value in values.items()}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
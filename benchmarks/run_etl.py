@@ -0,0 +1,208 @@
+"""Benchmark offline del ETL contra una base PostgreSQL local.
+
+Genera el set sintetico en lme.*, vacia ml.* y ejecuta ETLService.run_etl_task en un proceso
+hijo por corrida (memoria pico aislada). Imprime un JSON por corrida y el resumen (mediana),
+con el commit de git para comparar numeros antes y despues de un cambio.
+
+La base se toma de las variables DB_ML_* y DB_ETL_* (ambas pueden apuntar a la misma base), o
+se levanta una temporal con --tmp-postgres (requiere initdb/pg_ctl, no corre como root):
+
+    python -m benchmarks.run_etl --rows 200000 --etl '{"load_mode": "batch"}' --runs 3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+import psycopg2
+
+from benchmarks.postgres import TemporaryPostgres
+from benchmarks.synthetic import SyntheticConfig, load_source
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+ML_TABLES = [
+    "ml.licencias", "ml.especialidad_profesional", "ml.profesionalidad", "ml.medicos",
+    "ml.especialidad_profesional_medicos", "ml.profesionalidad_medicos", "ml.licencia_diagnostico_especialidad",
+]
+
+
+def source_connection():
+    return psycopg2.connect(
+        host=os.environ["DB_ETL_HOST"], port=os.environ["DB_ETL_PORT"], dbname=os.environ["DB_ETL_NAME"],
+        user=os.environ["DB_ETL_USER"], password=os.environ.get("DB_ETL_PASS", ""),
+    )
+
+
+def ml_connection():
+    return psycopg2.connect(
+        host=os.environ["DB_ML_HOST"], port=os.environ["DB_ML_PORT"], dbname=os.environ["DB_ML_NAME"],
+        user=os.environ["DB_ML_USER"], password=os.environ.get("DB_ML_PASS", ""),
+    )
+
+
+def apply_schema() -> None:
+    with open(SCHEMA_PATH, encoding="utf-8") as schema_file:
+        schema = schema_file.read()
+    for connect in (source_connection, ml_connection):
+        conn = connect()
+        try:
+            conn.cursor().execute(schema)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def reset_target() -> None:
+    conn = ml_connection()
+    try:
+        conn.cursor().execute(f"TRUNCATE {', '.join(ML_TABLES)} RESTART IDENTITY")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def target_counts() -> dict:
+    conn = ml_connection()
+    try:
+        cursor = conn.cursor()
+        counts = {}
+        for table in ML_TABLES:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+        return counts
+    finally:
+        conn.close()
+
+
+def _run_once(etl_kwargs: dict, start_date: str, end_date: str, workdir: str) -> dict:
+    """Corre en el proceso hijo: importa el servicio despues de fijar el directorio de trabajo."""
+    os.chdir(workdir)
+    from dataclasses import replace
+
+    from app.core.etl_config import EtlConfig
+    from app.core.etl_services import ETLService, generate_task_id
+    from app.core.ports.adapters import InMemoryTaskRepository
+    from app.models.request_models import ETLRequest
+
+    class BenchmarkETLService(ETLService):
+        # Sin llamada a la API de reglas, solo se mide el ETL
+        async def execute_rn_api_call(self, start_date: str, end_date: str, task_id: str) -> None:
+            return None
+
+    repository = InMemoryTaskRepository(os.path.join(workdir, "benchmark_etl.log"))
+    # Las variables ETL_* del entorno, con los campos de --etl encima
+    service = BenchmarkETLService(repository, config=replace(EtlConfig.from_env(), **etl_kwargs))
+    request = ETLRequest(start_date=start_date, end_date=end_date)
+    task_id = generate_task_id(request)
+    start = time.perf_counter()
+    service.run_etl_task(request, task_id)
+    elapsed = time.perf_counter() - start
+    status = repository.get_task_status(task_id)
+    return {
+        "status": status["Status"],
+        "elapsed_seconds": round(elapsed, 3),
+        "detail": status["detail"],
+        # ru_maxrss viene en KB en Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_benchmark(config: SyntheticConfig, etl_kwargs: dict, runs: int, generate: bool = True) -> dict:
+    apply_schema()
+    if generate:
+        conn = source_connection()
+        try:
+            generate_start = time.perf_counter()
+            rows = load_source(conn, config)
+            print(f"Set sintetico: {rows} filas en {time.perf_counter() - generate_start:.1f}s", file=sys.stderr)
+        finally:
+            conn.close()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for run in range(runs):
+        reset_target()
+        with tempfile.TemporaryDirectory(prefix="etl_bench_") as workdir:
+            with context.Pool(1) as pool:
+                result = pool.apply(_run_once, (etl_kwargs, str(config.start_date), str(config.end_date), workdir))
+        if result["status"] != "finish":
+            raise RuntimeError(f"La corrida {run + 1} termino con estado {result['status']}: {result['detail']}")
+        result["rows_per_sec"] = round(config.rows / result["elapsed_seconds"], 1)
+        result["round_trips"] = result["detail"].get("metrics", {}).get("round_trips")
+        result["target_counts"] = target_counts()
+        print(json.dumps({"run": run + 1, **{k: v for k, v in result.items() if k != "detail"}}), file=sys.stderr)
+        results.append(result)
+
+    return {
+        "commit": _git_commit(),
+        "synthetic": {**vars(config), "start_date": str(config.start_date)},
+        "etl": etl_kwargs,
+        "runs": runs,
+        "rows_per_sec": statistics.median(result["rows_per_sec"] for result in results),
+        "elapsed_seconds": statistics.median(result["elapsed_seconds"] for result in results),
+        "peak_rss_mb": max(result["peak_rss_mb"] for result in results),
+        "round_trips": results[-1]["round_trips"],
+        "target_counts": results[-1]["target_counts"],
+        "metrics": results[-1]["detail"].get("metrics"),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del ETL con datos sinteticos")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--especialidades", type=int, default=40, help="especialidades distintas")
+    parser.add_argument("--medicos", type=int, default=5000, help="medicos distintos")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="fraccion de id_lic repetidos")
+    parser.add_argument("--date-skew", type=float, default=0.0, help="0 = parejo, >0 concentra filas en pocas horas")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2025, 2, 1))
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--etl", type=json.loads, default={}, help="campos de EtlConfig en JSON")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--skip-generate", action="store_true", help="reutilizar los datos ya cargados en lme.*")
+    parser.add_argument("--output", help="archivo JSONL donde agregar el resumen")
+    parser.add_argument("--tmp-postgres", action="store_true", help="levantar una base temporal con initdb")
+    parser.add_argument("--pg-bin", help="directorio con initdb y pg_ctl (por defecto se buscan en el PATH)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    config = SyntheticConfig(
+        rows=args.rows, especialidades=args.especialidades, medicos=args.medicos,
+        duplicate_rate=args.duplicate_rate, date_skew=args.date_skew, start_date=args.start_date,
+        days=args.days, seed=args.seed,
+    )
+    if args.tmp_postgres:
+        with TemporaryPostgres(args.pg_bin) as postgres:
+            os.environ.update(postgres.environ())
+            summary = run_benchmark(config, args.etl, args.runs)
+    else:
+        summary = run_benchmark(config, args.etl, args.runs, generate=not args.skip_generate)
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as output:
+            output.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+-- Esquema minimo de origen (lme) y destino (ml) para correr el ETL en una base local de benchmark.
+-- Replica las columnas que usan EXTRACTION_QUERY y las cargas de ETLService, no el esquema completo.
+CREATE SCHEMA IF NOT EXISTS lme;
+CREATE SCHEMA IF NOT EXISTS ml;
+
+CREATE TABLE IF NOT EXISTS lme.sabana_fiscalizador_lme (
+    id_lic text, operador text, ccaf text, entidad_pagadora text, folio text,
+    fecha_emision timestamp, empleador_adscrito text, codigo_interno_prestador integer,
+    comuna_prestador text, fecha_ultimo_estado date, ultimo_estado integer,
+    rut_trabajador text, sexo_trabajador text, edad_trabajador numeric, tipo_reposo text,
+    dias_reposo integer, fecha_inicio_reposo date, comuna_reposo text, tipo_licencia integer,
+    rut_medico text, especialidad_profesional text, tipo_profesional text,
+    zbtipo_licencia_entidad numeric, zbcodigo_continuacion numeric, zbdias_autorizados numeric,
+    zbcodigo_diagnostico text, zbcodigo_autorizacion numeric, zbcausa_rechazo text,
+    zbtipo_reposo text, zbderecho_a_subsidio text, rut_empleador text, calidad_trabajador text,
+    actividad_laboral_trabajador integer, ocupacion integer, entidad_pagadora2 text,
+    fecha_recepcion_empleador date, regimen_previsional integer, entidad_pagadora_subsidio text,
+    comuna_laboral text, comuna_uso_compin text, cantidad_de_pronunciamientos integer,
+    cantidad_de_zonas_d integer, secuencia_estados text, cod_diagnostico_principal text,
+    cod_diagnostico_secundario text, periodo text
+);
+CREATE INDEX IF NOT EXISTS sabana_fiscalizador_lme_fecha_emision_idx ON lme.sabana_fiscalizador_lme (fecha_emision);
+
+CREATE TABLE IF NOT EXISTS lme.sabana_complementaria (
+    folio text, rut_trabajador text, marca_otorgamiento text
+);
+CREATE INDEX IF NOT EXISTS sabana_complementaria_folio_idx ON lme.sabana_complementaria (folio, rut_trabajador);
+
+CREATE TABLE IF NOT EXISTS ml.licencias (
+    id_lic text PRIMARY KEY, operador text, ccaf text, entidad_pagadora text, folio text,
+    fecha_emision timestamp, empleador_adscrito integer, codigo_interno_prestador integer,
+    comuna_prestador text, fecha_ultimo_estado date, ultimo_estado integer,
+    rut_trabajador text, sexo_trabajador text, edad_trabajador numeric, tipo_reposo text,
+    dias_reposo integer, fecha_inicio_reposo date, comuna_reposo text, tipo_licencia integer,
+    rut_medico text, tipo_licencia_pronunciamiento numeric, codigo_continuacion_pronunciamiento numeric,
+    dias_autorizados_pronunciamiento numeric, codigo_diagnostico_pronunciamiento text,
+    codigo_autorizacion_pronunciamiento numeric, causa_rechazo_pronunciamiento text,
+    tipo_reposo_pronunciamiento text, derecho_a_subsidio_pronunciamiento text, rut_empleador text,
+    calidad_trabajador text, actividad_laboral_trabajador integer, ocupacion integer,
+    entidad_pagadora_zona_c text, fecha_recepcion_empleador date, regimen_previsional integer,
+    entidad_pagadora_subsidio text, comuna_laboral text, comuna_uso_compin text,
+    cantidad_de_pronunciamientos integer, cantidad_de_zonas_d integer, secuencia_estados text,
+    cod_diagnostico_principal text, cod_diagnostico_secundario text, periodo text, marca_otorgamiento text
+);
+CREATE TABLE IF NOT EXISTS ml.especialidad_profesional (
+    id_especialidad_profesional serial PRIMARY KEY, descripcion_especialidad_profesional text UNIQUE
+);
+CREATE TABLE IF NOT EXISTS ml.profesionalidad (
+    id_profesionalidad serial PRIMARY KEY, descripcion_profesionalidad text UNIQUE
+);
+CREATE TABLE IF NOT EXISTS ml.medicos (rut_medico text PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS ml.especialidad_profesional_medicos (
+    id_especialidad_profesional integer, rut_medico text, PRIMARY KEY (id_especialidad_profesional, rut_medico)
+);
+CREATE TABLE IF NOT EXISTS ml.profesionalidad_medicos (
+    id_profesionalidad integer, rut_medico text, PRIMARY KEY (id_profesionalidad, rut_medico)
+);
+CREATE TABLE IF NOT EXISTS ml.licencia_diagnostico_especialidad (
+    id_licencia text, cod_diagnostico text, especialidad_medico text
+);
+CREATE INDEX IF NOT EXISTS licencia_diagnostico_especialidad_id_licencia_idx
+    ON ml.licencia_diagnostico_especialidad (id_licencia);
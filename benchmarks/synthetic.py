@@ -0,0 +1,204 @@
+import io
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from app.core.etl_loader import copy_value
+
+### Generador de filas sinteticas de lme.sabana_fiscalizador_lme y lme.sabana_complementaria. ###
+
+SABANA_COLUMNS = [
+    "id_lic", "operador", "ccaf", "entidad_pagadora", "folio", "fecha_emision", "empleador_adscrito",
+    "codigo_interno_prestador", "comuna_prestador", "fecha_ultimo_estado", "ultimo_estado",
+    "rut_trabajador", "sexo_trabajador", "edad_trabajador", "tipo_reposo", "dias_reposo",
+    "fecha_inicio_reposo", "comuna_reposo", "tipo_licencia", "rut_medico", "especialidad_profesional",
+    "tipo_profesional", "zbtipo_licencia_entidad", "zbcodigo_continuacion", "zbdias_autorizados",
+    "zbcodigo_diagnostico", "zbcodigo_autorizacion", "zbcausa_rechazo", "zbtipo_reposo",
+    "zbderecho_a_subsidio", "rut_empleador", "calidad_trabajador", "actividad_laboral_trabajador",
+    "ocupacion", "entidad_pagadora2", "fecha_recepcion_empleador", "regimen_previsional",
+    "entidad_pagadora_subsidio", "comuna_laboral", "comuna_uso_compin", "cantidad_de_pronunciamientos",
+    "cantidad_de_zonas_d", "secuencia_estados", "cod_diagnostico_principal", "cod_diagnostico_secundario",
+    "periodo",
+]
+COMPLEMENTARIA_COLUMNS = ["folio", "rut_trabajador", "marca_otorgamiento"]
+
+_OPERADORES = ["IMED", "MEDIPASS"]
+_ENTIDADES = ["ISAPRE", "FONASA", "CCAF"]
+_COMUNAS = ["SANTIAGO", "PROVIDENCIA", "MAIPU", "LA FLORIDA", "VALPARAISO", "CONCEPCION", "TEMUCO", "ANTOFAGASTA"]
+_TIPOS_PROFESIONAL = ["1", "2", "3", "4", "-", None]
+_CAUSAS_RECHAZO = [None, None, None, "REPOSO INJUSTIFICADO", "FUERA DE PLAZO", "rechazo, \"con comillas\""]
+_RECENT_ROWS = 10000
+_DIAGNOSTICOS = [f"{letra}{numero:02d}" for letra in "FJKMS" for numero in range(0, 100, 7)]
+
+
+@dataclass
+class SyntheticConfig:
+    """Parametros del set sintetico; con la misma semilla se generan exactamente las mismas filas.
+
+    - rows: filas de la sabana.
+    - especialidades: cantidad de especialidades distintas (ademas de '-' y NULL).
+    - medicos: cantidad de medicos distintos; cada uno emite con 1 a 3 especialidades.
+    - duplicate_rate: fraccion de filas que repiten un id_lic ya generado (nuevo estado de la licencia).
+    - date_skew: 0 reparte las filas parejo entre las horas del rango; valores mayores concentran
+      las filas en pocas horas (peso de cada hora = 1 / rango ** date_skew).
+    """
+    rows: int = 100000
+    especialidades: int = 40
+    medicos: int = 5000
+    duplicate_rate: float = 0.05
+    date_skew: float = 0.0
+    start_date: date = date(2025, 2, 1)
+    days: int = 7
+    seed: int = 42
+
+    @property
+    def end_date(self) -> date:
+        return self.start_date + timedelta(days=self.days - 1)
+
+
+def _rut(rng: random.Random, low: int, high: int) -> str:
+    return f"{rng.randint(low, high)}-{rng.choice('0123456789K')}"
+
+
+def generate_rows(config: SyntheticConfig):
+    """Genera las filas de la sabana (dicts con SABANA_COLUMNS) en orden de generacion."""
+    rng = random.Random(config.seed)
+    especialidades = [f"especialidad {i:03d}" for i in range(config.especialidades)]
+    medicos = [
+        (f"{10000000 + i}-{i % 10}", rng.sample(especialidades, k=min(len(especialidades), rng.randint(1, 3))))
+        for i in range(config.medicos)
+    ]
+    start = datetime.combine(config.start_date, datetime.min.time())
+    hours = config.days * 24
+    # Cada hora recibe un rango al azar; con date_skew > 0 las de rango bajo concentran las filas
+    ranks = list(range(1, hours + 1))
+    rng.shuffle(ranks)
+    cum_weights = list(itertools.accumulate(1.0 / rank ** config.date_skew for rank in ranks))
+
+    # Los duplicados repiten una de las ultimas _RECENT_ROWS licencias, la memoria queda acotada
+    recent = []
+    for i in range(config.rows):
+        if recent and rng.random() < config.duplicate_rate:
+            # Misma licencia (folio y trabajador) con otro estado, emitida poco despues
+            base = rng.choice(recent)
+            row = dict(base)
+            row["fecha_emision"] = min(
+                base["fecha_emision"] + timedelta(minutes=rng.randint(0, 120)),
+                start + timedelta(hours=hours) - timedelta(seconds=1),
+            )
+            row["ultimo_estado"] = rng.randint(1, 9)
+            row["secuencia_estados"] = f"{base['secuencia_estados']}-{row['ultimo_estado']}"
+            yield row
+            continue
+
+        hour = rng.choices(range(hours), cum_weights=cum_weights)[0]
+        fecha_emision = start + timedelta(hours=hour, seconds=rng.randint(0, 3599))
+        rut_medico, especialidades_medico = rng.choice(medicos)
+        especialidad = rng.choice(especialidades_medico) if rng.random() > 0.02 else rng.choice(["-", None])
+        dias = rng.randint(1, 30)
+        row = {
+            "id_lic": f"{fecha_emision:%Y%m%d}{i:09d}",
+            "operador": rng.choice(_OPERADORES),
+            "ccaf": rng.choice(["LOS ANDES", "LA ARAUCANA", None]),
+            "entidad_pagadora": rng.choice(_ENTIDADES),
+            "folio": str(30000000 + i),
+            "fecha_emision": fecha_emision,
+            "empleador_adscrito": rng.choice(["Si", "No"]),
+            "codigo_interno_prestador": rng.randint(1, 5000),
+            "comuna_prestador": rng.choice(_COMUNAS),
+            "fecha_ultimo_estado": (fecha_emision + timedelta(days=rng.randint(0, 10))).date(),
+            "ultimo_estado": rng.randint(1, 9),
+            "rut_trabajador": _rut(rng, 5000000, 25000000),
+            "sexo_trabajador": rng.choice(["M", "F"]),
+            "edad_trabajador": rng.randint(18, 75),
+            "tipo_reposo": rng.choice(["TOTAL", "PARCIAL"]),
+            "dias_reposo": dias,
+            "fecha_inicio_reposo": fecha_emision.date(),
+            "comuna_reposo": rng.choice(_COMUNAS),
+            "tipo_licencia": rng.randint(1, 7),
+            "rut_medico": rut_medico,
+            "especialidad_profesional": especialidad,
+            "tipo_profesional": rng.choice(_TIPOS_PROFESIONAL),
+            "zbtipo_licencia_entidad": rng.randint(1, 7),
+            "zbcodigo_continuacion": rng.randint(0, 1),
+            "zbdias_autorizados": rng.randint(0, dias),
+            "zbcodigo_diagnostico": rng.choice(_DIAGNOSTICOS),
+            "zbcodigo_autorizacion": rng.randint(1, 4),
+            "zbcausa_rechazo": rng.choice(_CAUSAS_RECHAZO),
+            "zbtipo_reposo": rng.choice(["T", "P"]),
+            "zbderecho_a_subsidio": rng.choice(["S", "N"]),
+            "rut_empleador": _rut(rng, 60000000, 99999999),
+            "calidad_trabajador": rng.choice(["DEPENDIENTE", "INDEPENDIENTE"]),
+            "actividad_laboral_trabajador": rng.randint(1, 20),
+            "ocupacion": rng.randint(1, 99),
+            "entidad_pagadora2": rng.choice(_ENTIDADES),
+            "fecha_recepcion_empleador": (fecha_emision + timedelta(days=rng.randint(0, 3))).date(),
+            "regimen_previsional": rng.randint(1, 3),
+            "entidad_pagadora_subsidio": rng.choice(_ENTIDADES),
+            "comuna_laboral": rng.choice(_COMUNAS),
+            "comuna_uso_compin": rng.choice(_COMUNAS),
+            "cantidad_de_pronunciamientos": rng.randint(1, 3),
+            "cantidad_de_zonas_d": rng.randint(0, 2),
+            "secuencia_estados": str(rng.randint(1, 9)),
+            "cod_diagnostico_principal": rng.choice(_DIAGNOSTICOS),
+            "cod_diagnostico_secundario": rng.choice(_DIAGNOSTICOS + [None]),
+            "periodo": f"{fecha_emision:%Y-%m}",
+        }
+        if len(recent) < _RECENT_ROWS:
+            recent.append(row)
+        else:
+            recent[i % _RECENT_ROWS] = row
+        yield row
+
+
+def _copy_buffer(rows, columns) -> io.StringIO:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_value(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def load_source(conn, config: SyntheticConfig, chunk_size: int = 50000) -> int:
+    """Reemplaza el contenido de las tablas lme.* por el set sintetico, con COPY por bloques."""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE lme.sabana_fiscalizador_lme, lme.sabana_complementaria")
+    rng = random.Random(config.seed + 1)
+    total = 0
+    chunk = []
+    complementaria = {}
+
+    def flush():
+        cursor.copy_expert(
+            f"COPY lme.sabana_fiscalizador_lme ({', '.join(SABANA_COLUMNS)}) FROM STDIN",
+            _copy_buffer(chunk, SABANA_COLUMNS),
+        )
+
+    for row in generate_rows(config):
+        chunk.append(row)
+        # Un registro complementario por licencia, algunas sin marca de otorgamiento
+        if rng.random() < 0.9:
+            complementaria[(row["folio"], row["rut_trabajador"])] = rng.choice(["S", "N"])
+        if len(chunk) >= chunk_size:
+            flush()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        flush()
+        total += len(chunk)
+
+    cursor.copy_expert(
+        f"COPY lme.sabana_complementaria ({', '.join(COMPLEMENTARIA_COLUMNS)}) FROM STDIN",
+        _copy_buffer(
+            ({"folio": folio, "rut_trabajador": rut, "marca_otorgamiento": marca}
+             for (folio, rut), marca in complementaria.items()),
+            COMPLEMENTARIA_COLUMNS,
+        ),
+    )
+    cursor.execute("ANALYZE lme.sabana_fiscalizador_lme")
+    cursor.execute("ANALYZE lme.sabana_complementaria")
+    conn.commit()
+    cursor.close()
+    return total
@@ -59,7 +59,32 @@ select
 	ps.ml,
 	ps.score
 from
-	ml.licencias l,
+	(
+		-- Pagina de licencias: busqueda por (fecha_emision, id_lic) desde el cursor, sin OFFSET.
+		-- Sin fecha_emision la clave es -infinity: esas licencias van primero y tambien tienen cursor.
+		-- Los EXISTS dejan solo licencias con fila en los joins de abajo, para que la pagina no quede corta
+		select lic.* from ml.licencias lic
+		where
+			 lic.rut_medico = :rut_medico
+			 and lic.fecha_emision BETWEEN :fecha_inicio AND :fecha_fin
+			 and (
+				CAST(:cursor_fecha_emision AS timestamp) IS NULL
+				or (COALESCE(lic.fecha_emision, '-infinity'), lic.id_lic) > (CAST(:cursor_fecha_emision AS timestamp), CAST(:cursor_id_lic AS text))
+			 )
+			 and exists (select 1 from ml.propensity_score ps where ps.id_lic = lic.id_lic)
+			 and exists (
+				select 1 from ml.especialidad_profesional_medicos epm
+				join ml.especialidad_profesional ep on ep.id_especialidad_profesional = epm.id_especialidad_profesional
+				where epm.rut_medico = lic.rut_medico
+			 )
+			 and exists (
+				select 1 from ml.profesionalidad_medicos prome
+				join ml.profesionalidad pro on pro.id_profesionalidad = prome.id_profesionalidad
+				where prome.rut_medico = lic.rut_medico
+			 )
+		order by COALESCE(lic.fecha_emision, '-infinity'), lic.id_lic
+		limit :limit
+	) l,
 	ml.especialidad_profesional_medicos epm ,
 	ml.especialidad_profesional ep,
 	ml.propensity_score ps,
@@ -67,10 +92,11 @@ from
 	ml.profesionalidad_medicos prome
 where
 	 1=1
-	 and l.rut_medico = :rut_medico
 	 and epm.rut_medico = l.rut_medico 
 	 and ep.id_especialidad_profesional = epm.id_especialidad_profesional
 	 and ps.id_lic=l.id_lic
 	 and pro.id_profesionalidad = prome.id_profesionalidad
 	 and prome.rut_medico = l.rut_medico 
-	 AND l.fecha_emision BETWEEN :fecha_inicio AND :fecha_fin;
+order by
+	COALESCE(l.fecha_emision, '-infinity'),
+	l.id_lic;